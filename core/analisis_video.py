@@ -0,0 +1,203 @@
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .misiones import registrar_evento
+from .modelos_ia import modelo_compilado
+from .models import DeteccionPostura, TrabajoAnalisisVideo
+from .posturas import a_arreglo, desempaquetar_puntos, empaquetar_puntos, puntos_a_json, puntuar_postura
+from .retroalimentacion import generar_retroalimentacion
+
+logger = logging.getLogger(__name__)
+
+# Cada ventana de frames consecutivos se guarda como una detección
+FRAMES_POR_VENTANA = 30
+EXTENSIONES_VIDEO = {'.npy', '.pst', '.json'}
+MAXIMO_BYTES_VIDEO = 50 * 1024 * 1024
+
+
+def leer_frames(ruta):
+    """Lee los puntos clave por frame de un archivo local como arreglo (frames, 17, 3).
+
+    Formatos: .npy (arreglo frames x 17 x 2|3), .pst (formato binario de core.posturas) o .json.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == '.npy':
+        datos = np.load(ruta, mmap_mode='r', allow_pickle=False)
+    elif extension == '.pst':
+        with open(ruta, 'rb') as archivo:
+            datos = desempaquetar_puntos(archivo.read())
+    elif extension == '.json':
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+    else:
+        raise ValueError(f"Formato de video no soportado: {extension}")
+    return a_arreglo(datos)
+
+
+def extraer_ventanas(frames, tamano=FRAMES_POR_VENTANA, maximo_ventanas=DeteccionPostura.TAMANO_MAXIMO_LOTE):
+    """Divide el video en ventanas de `tamano` frames.
+
+    Los videos largos se submuestrean (un frame de cada `paso`) para no superar
+    `maximo_ventanas`. Retorna (ventanas, paso); cada ventana es (frame_inicio, frames).
+    """
+    paso = max(1, math.ceil(len(frames) / (tamano * maximo_ventanas)))
+    muestreados = frames[::paso]
+    ventanas = [
+        (inicio * paso, muestreados[inicio:inicio + tamano])
+        for inicio in range(0, len(muestreados), tamano)
+    ]
+    # Una ventana final muy corta no representa una repetición completa
+    if len(ventanas) > 1 and len(ventanas[-1][1]) < tamano // 2:
+        ventanas.pop()
+    return ventanas, paso
+
+
+def analizar_archivo(ruta, objetivos, umbral_precision, tipo_binario='float32'):
+    """Extrae y puntúa las ventanas de un video. Se ejecuta en los procesos del pool: sin base de datos.
+
+    Retorna {'ventanas': [(frame_inicio, puntos empaquetados, resultado)], 'frames', 'paso', 'segundos'}
+    o {'error': mensaje}.
+    """
+    inicio = time.perf_counter()
+    try:
+        frames = leer_frames(ruta)
+        ventanas, paso = extraer_ventanas(frames)
+        analizadas = []
+        for frame_inicio, ventana in ventanas:
+            ventana = np.ascontiguousarray(ventana)
+            analizadas.append((
+                frame_inicio,
+                empaquetar_puntos({'frames': ventana}, tipo_binario),
+                puntuar_postura(ventana, objetivos, umbral_precision),
+            ))
+    except Exception as e:  # Un archivo dañado no debe tumbar el proceso del pool
+        return {'error': f"{type(e).__name__}: {e}"}
+    return {
+        'ventanas': analizadas,
+        'frames': len(frames),
+        'paso': paso,
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+def guardar_resultado(trabajo, analisis):
+    """Guarda en bloque las detecciones y la retroalimentación de un video analizado.
+
+    Retorna False si el trabajo ya no pertenece a este worker (fue reclamado de nuevo).
+    """
+    tipo_binario = getattr(settings, 'PUNTOS_POSTURA_TIPO_BINARIO', None)
+    ahora = timezone.now()
+    segundos_ventana = Decimal(str(round(analisis['segundos'] / max(len(analisis['ventanas']), 1), 2)))
+    detecciones = [
+        DeteccionPostura(
+            ejercicio_id=trabajo.ejercicio_id,
+            modelo_ia_id=trabajo.modelo_ia_id,
+            fecha_deteccion=ahora,
+            puntos_binarios=datos if tipo_binario else None,
+            puntos_corporales_detectados=[] if tipo_binario else puntos_a_json(datos),
+            puntuacion_tecnica=resultado['puntuacion_tecnica'],
+            precision_deteccion=Decimal(str(resultado['precision_deteccion'])),
+            duracion_analisis_segundos=min(segundos_ventana, Decimal('999.99')),
+            metadata_analisis={
+                'frames': resultado['frames'],
+                'angulos': resultado['angulos'],
+                'trabajo_video': trabajo.pk,
+                'frame_inicio': frame_inicio,
+            },
+        )
+        for frame_inicio, datos, resultado in analisis['ventanas']
+    ]
+
+    with transaction.atomic():
+        vigente = TrabajoAnalisisVideo.objects.select_for_update().filter(
+            pk=trabajo.pk, estado='procesando', trabajador=trabajo.trabajador, intentos=trabajo.intentos
+        ).exists()
+        if not vigente:
+            return False
+        _, puntos, cristales = DeteccionPostura.registrar_lote(trabajo.usuario, detecciones, evaluar=False)
+        retroalimentaciones = generar_retroalimentacion(detecciones)
+        TrabajoAnalisisVideo.objects.filter(pk=trabajo.pk).update(
+            estado='completado',
+            error=None,
+            fecha_fin=ahora,
+            analisis_segundos=Decimal(str(round(analisis['segundos'], 3))),
+            resultado={
+                'detecciones': [deteccion.pk for deteccion in detecciones],
+                'frames': analisis['frames'],
+                'paso_muestreo': analisis['paso'],
+                'puntuacion_media': round(
+                    sum(deteccion.puntuacion_tecnica for deteccion in detecciones) / len(detecciones), 1
+                ),
+                'retroalimentaciones': len(retroalimentaciones),
+                'puntos_ganados': puntos,
+                'cristales_ganados': cristales,
+            },
+        )
+    registrar_evento(trabajo.usuario, 'deteccion', detecciones=detecciones)
+    return True
+
+
+def enviar_analisis(pool, argumentos):
+    """Lanza el análisis de un trabajo; retorna una función que entrega su resultado (o lanza su error)"""
+    if pool is None:
+        return lambda: analizar_archivo(*argumentos)
+    try:
+        return pool.submit(analizar_archivo, *argumentos).result
+    except BrokenProcessPool as e:
+        def fallar():
+            raise e
+        return fallar
+
+
+def procesar_pendientes(trabajador, cantidad, pool=None):
+    """Reclama hasta `cantidad` trabajos, los analiza (en el pool si se indica) y guarda los resultados.
+
+    Retorna una lista de (trabajo, estado final). Si un proceso del pool muere, los trabajos afectados
+    se registran como fallidos y al final se lanza BrokenProcessPool para que el llamador recree el pool.
+    """
+    trabajos = TrabajoAnalisisVideo.reclamar(trabajador, cantidad)
+    if not trabajos:
+        return []
+
+    tipo_binario = getattr(settings, 'PUNTOS_POSTURA_TIPO_BINARIO', None) or 'float32'
+    resultados = []
+    for trabajo in trabajos:
+        modelo = modelo_compilado(trabajo.modelo_ia_id)
+        if modelo and modelo.objetivos:
+            objetivos, umbral = modelo.objetivos, modelo.umbral_precision
+        else:
+            objetivos, umbral = trabajo.modelo_ia.angulos_ideales, float(trabajo.modelo_ia.umbral_precision)
+        # Un futuro por trabajo: el error de uno (incluso un proceso hijo caído) no afecta a los demás
+        resultados.append(enviar_analisis(pool, (trabajo.archivo.path, objetivos, umbral, tipo_binario)))
+
+    procesados = []
+    pool_roto = None
+    for trabajo, resultado in zip(trabajos, resultados):
+        try:
+            resultado = resultado()
+            if 'error' in resultado:
+                raise ValueError(resultado['error'])
+            if not guardar_resultado(trabajo, resultado):
+                procesados.append((trabajo, 'descartado'))
+                continue
+        except Exception as e:  # Un trabajo con error no debe impedir guardar los demás
+            logger.exception("Falló el trabajo de análisis de video %s (intento %s)", trabajo.pk, trabajo.intentos)
+            if isinstance(e, BrokenProcessPool):
+                pool_roto = e
+            trabajo.marcar_fallido(e if isinstance(e, ValueError) else f"{type(e).__name__}: {e}")
+            procesados.append((trabajo, trabajo.estado))
+            continue
+        procesados.append((trabajo, 'completado'))
+    if pool_roto:
+        raise pool_roto
+    return procesados
@@ -0,0 +1,34 @@
+from django.core.cache import cache
+
+from .models import ColeccionCarta
+from .versiones import invalidar_version, version_actual
+
+# Se incrementa cuando cambia el catálogo de cartas: invalida los resúmenes de todos los usuarios
+CLAVE_VERSION_RESUMENES = 'colecciones:version_resumenes'
+
+DURACION_CACHE_RESUMEN = 60 * 60
+
+
+def clave_resumen(usuario_id):
+    """Clave de caché del resumen de colección de un usuario"""
+    return f"colecciones:resumen:{version_actual(CLAVE_VERSION_RESUMENES)}:{usuario_id}"
+
+
+def resumen_coleccion(usuario):
+    """Retorna el resumen de la colección del usuario, calculándolo solo si no está en caché"""
+    clave = clave_resumen(usuario.pk)
+    resumen = cache.get(clave)
+    if resumen is None:
+        resumen = ColeccionCarta.calcular_resumen(usuario)
+        cache.set(clave, resumen, DURACION_CACHE_RESUMEN)
+    return resumen
+
+
+def invalidar_resumen(usuario_id):
+    """Descarta el resumen cacheado de un usuario"""
+    cache.delete(clave_resumen(usuario_id))
+
+
+def invalidar_resumenes():
+    """Descarta los resúmenes de todos los usuarios (cambió el catálogo de cartas)"""
+    invalidar_version(CLAVE_VERSION_RESUMENES)
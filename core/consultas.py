@@ -0,0 +1,66 @@
+from django.db import connections, router
+from django.db.models import Max, Min
+
+
+def insertar_desde_seleccion(modelo, campos, seleccion):
+    """Ejecuta INSERT INTO <tabla> (campos) <seleccion> y retorna las filas insertadas.
+
+    `seleccion` es un values_list cuyas columnas siguen el mismo orden que `campos`.
+    """
+    connection = connections[seleccion.db]
+    columnas = ', '.join(
+        connection.ops.quote_name(modelo._meta.get_field(campo).column) for campo in campos
+    )
+    sql, params = seleccion.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(modelo._meta.db_table)} ({columnas}) {sql}",
+            params
+        )
+        return cursor.rowcount
+
+
+def rangos_de_ids(queryset, tamano_lote):
+    """Genera intervalos (desde, hasta] de pk que cubren el queryset en lotes"""
+    limites = queryset.order_by().aggregate(minimo=Min('pk'), maximo=Max('pk'))
+    if limites['minimo'] is None:
+        return
+    desde = limites['minimo'] - 1
+    while desde < limites['maximo']:
+        yield desde, desde + tamano_lote
+        desde += tamano_lote
+
+
+def insertar_acumulando(modelo, campos, filas, conflicto, acumular, reemplazar=()):
+    """INSERT ... ON CONFLICT (conflicto) DO UPDATE que suma los campos `acumular`.
+
+    `filas` son tuplas en el orden de `campos`; los campos de `reemplazar` toman el valor
+    nuevo. Retorna las filas afectadas.
+    """
+    if not filas:
+        return 0
+    connection = connections[router.db_for_write(modelo)]
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    campos_modelo = [modelo._meta.get_field(campo) for campo in campos]
+    columna = {campo: connection.ops.quote_name(modelo._meta.get_field(campo).column) for campo in campos}
+
+    marcadores = '(' + ', '.join(['%s'] * len(campos)) + ')'
+    params = [
+        campo.get_db_prep_save(valor, connection)
+        for fila in filas
+        for campo, valor in zip(campos_modelo, fila)
+    ]
+    actualizaciones = [
+        f"{columna[campo]} = {tabla}.{columna[campo]} + EXCLUDED.{columna[campo]}" for campo in acumular
+    ] + [
+        f"{columna[campo]} = EXCLUDED.{columna[campo]}" for campo in reemplazar
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabla} ({', '.join(columna[campo] for campo in campos)}) "
+            f"VALUES {', '.join([marcadores] * len(filas))} "
+            f"ON CONFLICT ({', '.join(columna[campo] for campo in conflicto)}) "
+            f"DO UPDATE SET {', '.join(actualizaciones)}",
+            params
+        )
+        return cursor.rowcount
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import Ranking
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el ranking general y las ligas (rango + nivel físico) del período vigente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo', choices=[tipo for tipo, _ in Ranking.TIPO_RANKING_CHOICES], action='append',
+            help='Tipo de ranking a recalcular (por defecto todos)'
+        )
+        parser.add_argument('--tamano-lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        hoy = timezone.now().date()
+        for tipo_ranking in options['tipo'] or [tipo for tipo, _ in Ranking.TIPO_RANKING_CHOICES]:
+            periodo = Ranking.periodo_vigente(tipo_ranking, hoy)
+            Ranking.actualizar_ranking(tipo_ranking, periodo, tamano_lote=options['tamano_lote'])
+            total = Ranking.objects.filter(tipo_ranking=tipo_ranking, periodo=periodo).count()
+            self.stdout.write(f"{tipo_ranking} {periodo}: {total} posiciones")
+
+        self.stdout.write(self.style.SUCCESS('Rankings actualizados'))
@@ -0,0 +1,82 @@
+import math
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from core.posturas import (
+    ANGULOS, CONFIANZA_MINIMA, PUNTOS_CLAVE, RANGO_PENALIZACION, ObjetivosPostura, normalizar_ideales,
+    puntuar_postura
+)
+
+
+def puntuar_postura_python(frames, angulos_ideales):
+    """Implementación de referencia en Python puro (mismas reglas que core.posturas)"""
+    ideales = normalizar_ideales(angulos_ideales)
+    indice = {nombre: i for i, nombre in enumerate(PUNTOS_CLAVE)}
+    mejor = 0.0
+    for frame in frames:
+        # Todos los ángulos se puntúan en el mismo frame; uno no visible puntúa 0
+        puntuaciones = []
+        for nombre, (ideal, tolerancia) in ideales.items():
+            suma, peso_total = 0.0, 0.0
+            for extremo_a, vertice, extremo_c in ANGULOS[nombre]:
+                a, b, c = frame[indice[extremo_a]], frame[indice[vertice]], frame[indice[extremo_c]]
+                ax, ay = a[0] - b[0], a[1] - b[1]
+                cx, cy = c[0] - b[0], c[1] - b[1]
+                normas = math.hypot(ax, ay) * math.hypot(cx, cy)
+                confianza = min(a[2], b[2], c[2]) if normas > 1e-6 else 0
+                if confianza < CONFIANZA_MINIMA:
+                    continue
+                coseno = max(-1.0, min(1.0, (ax * cx + ay * cy) / normas))
+                suma += math.degrees(math.acos(coseno)) * confianza
+                peso_total += confianza
+            if not peso_total:
+                puntuaciones.append(0.0)
+                continue
+            error = abs(suma / peso_total - ideal)
+            puntuaciones.append(max(0.0, min(1.0, 1 - max(error - tolerancia, 0) / RANGO_PENALIZACION)))
+        mejor = max(mejor, sum(puntuaciones) / len(puntuaciones))
+    return int(round(100 * mejor))
+
+
+class Command(BaseCommand):
+    help = 'Mide el motor de puntuación de posturas (NumPy) frente a una implementación en Python puro'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', type=int, default=30)
+        parser.add_argument('--repeticiones', type=int, default=500)
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['semilla'])
+        # Una postura base con ruido por frame, como una ráfaga real de la cámara
+        base = rng.uniform(100, 540, size=(1, len(PUNTOS_CLAVE), 2))
+        frames = np.concatenate([
+            base + rng.normal(0, 15, size=(options['frames'], len(PUNTOS_CLAVE), 2)),
+            rng.uniform(0.2, 1.0, size=(options['frames'], len(PUNTOS_CLAVE), 1)),
+        ], axis=2).round(2).tolist()
+        arreglo = np.asarray(frames, dtype=np.float32)
+        ideales = {nombre: float(rng.uniform(60, 170)) for nombre in ANGULOS}
+        objetivos = ObjetivosPostura(ideales)
+
+        resultados = {}
+        for etiqueta, funcion in [
+            ('numpy', lambda: puntuar_postura(frames, ideales)['puntuacion_tecnica']),
+            # Como en el servidor: puntos ya decodificados del binario y objetivos del registro de modelos
+            ('numpy*', lambda: puntuar_postura(arreglo, objetivos)['puntuacion_tecnica']),
+            ('python', lambda: puntuar_postura_python(frames, ideales)),
+        ]:
+            funcion()  # calentamiento
+            inicio = time.perf_counter()
+            for _ in range(options['repeticiones']):
+                puntuacion = funcion()
+            promedio = (time.perf_counter() - inicio) / options['repeticiones'] * 1000
+            resultados[etiqueta] = (promedio, puntuacion)
+            self.stdout.write(f"{etiqueta:<7} {promedio:.3f} ms por ráfaga de {options['frames']} frames (puntuación {puntuacion})")
+
+        if len({puntuacion for _, puntuacion in resultados.values()}) > 1:
+            self.stdout.write(self.style.ERROR('Las implementaciones no coinciden'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Aceleración frente a Python: x{resultados['python'][0] / resultados['numpy'][0]:.1f} "
+            f"(x{resultados['python'][0] / resultados['numpy*'][0]:.1f} precompilado)"
+        ))
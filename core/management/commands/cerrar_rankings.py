@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.models import Ranking, RankingHistorico
+
+
+class Command(BaseCommand):
+    help = (
+        'Congela los períodos de ranking cerrados (semanal, mensual y anual) en snapshots '
+        'con top N e histograma, y borra por lotes el detalle fuera de la ventana de retención.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=RankingHistorico.TOP_POR_DEFECTO)
+        parser.add_argument(
+            '--dias-retencion', type=int, default=90,
+            help='Días que se conserva el detalle de un período ya congelado'
+        )
+        parser.add_argument('--tamano-lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        hoy = timezone.now().date()
+        limite_retencion = hoy - timedelta(days=options['dias_retencion'])
+
+        for tipo_ranking in ['semanal', 'mensual', 'anual']:
+            congelados = RankingHistorico.objects.filter(tipo_ranking=tipo_ranking).values_list(
+                'periodo', flat=True
+            )
+            pendientes = sorted(set(Ranking.periodos_cerrados(tipo_ranking, hoy)) - set(congelados))
+            for periodo in pendientes:
+                # Recalcular antes de congelar: el detalle puede ser de la última ejecución del cron
+                # y no incluir las sesiones tardías del período
+                with transaction.atomic():
+                    Ranking.actualizar_ranking(tipo_ranking, periodo, tamano_lote=options['tamano_lote'])
+                    snapshot = RankingHistorico.congelar(tipo_ranking, periodo, top_n=options['top'])
+                self.stdout.write(
+                    f"{tipo_ranking} {periodo}: congelado ({snapshot.total_participantes} participantes)"
+                )
+
+            borrados = Ranking.compactar(
+                tipo_ranking, limite_retencion, tamano_lote=options['tamano_lote']
+            )
+            self.stdout.write(f"{tipo_ranking}: {borrados} filas de detalle borradas")
+
+        self.stdout.write(self.style.SUCCESS('Cierre de rankings completado'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.models import InventarioUsuario
+
+
+class Command(BaseCommand):
+    help = 'Desactiva y desequipa los items del inventario cuya fecha de expiración ya pasó'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano-lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        desactivados = InventarioUsuario.desactivar_expirados(tamano_lote=options['tamano_lote'])
+        self.stdout.write(self.style.SUCCESS(f"Items expirados desactivados: {desactivados}"))
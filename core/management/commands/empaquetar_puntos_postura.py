@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.models import DeteccionPostura, ModeloIA
+from core.posturas import CODIGOS_TIPO, empaquetar_puntos
+
+
+class Command(BaseCommand):
+    help = 'Convierte por lotes los puntos corporales guardados en JSON al formato binario empaquetado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=list(CODIGOS_TIPO), default='float32')
+        parser.add_argument('--tamano-lote', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        modelos = 0
+        for modelo in ModeloIA.objects.filter(puntos_referencia_binarios__isnull=True):
+            try:
+                datos = empaquetar_puntos(modelo.puntos_referencia, options['tipo'])
+            except ValueError:
+                continue
+            modelos += ModeloIA.objects.filter(pk=modelo.pk, puntos_referencia_binarios__isnull=True).update(
+                puntos_referencia_binarios=datos, puntos_referencia=[]
+            )
+
+        convertidas, bytes_json, bytes_binarios = DeteccionPostura.empaquetar_existentes(
+            tipo=options['tipo'], tamano_lote=options['tamano_lote']
+        )
+        self.stdout.write(f"Modelos de IA convertidos: {modelos}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Detecciones convertidas: {convertidas} "
+            f"({bytes_json / 1024:.1f} KB en JSON -> {bytes_binarios / 1024:.1f} KB empaquetados)"
+        ))
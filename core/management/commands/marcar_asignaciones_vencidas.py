@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.models import AsignacionRutina
+
+
+class Command(BaseCommand):
+    help = 'Marca como vencidas las asignaciones de rutina pendientes cuya fecha de vencimiento ya pasó'
+
+    def handle(self, *args, **kwargs):
+        vencidas = AsignacionRutina.marcar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"Asignaciones marcadas como vencidas: {vencidas}"))
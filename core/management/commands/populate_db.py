@@ -213,30 +213,22 @@ class Command(BaseCommand):
             {
                 'nombre': 'Rutina Principiante Full Body',
                 'nivel': 'principiante',
-                'tipo': 'completo',
-                'duracion': 30,
-                'calorias': 180
+                'tipo': 'completo'
             },
             {
                 'nombre': 'Rutina Intermedia Fuerza',
                 'nivel': 'intermedio', 
-                'tipo': 'fuerza',
-                'duracion': 45,
-                'calorias': 250
+                'tipo': 'fuerza'
             },
             {
                 'nombre': 'Rutina Avanzada Cardio',
                 'nivel': 'avanzado',
-                'tipo': 'cardio',
-                'duracion': 40,
-                'calorias': 320
+                'tipo': 'cardio'
             },
             {
                 'nombre': 'Rutina Flexibilidad Diaria',
                 'nivel': 'principiante',
-                'tipo': 'flexibilidad',
-                'duracion': 20,
-                'calorias': 80
+                'tipo': 'flexibilidad'
             }
         ]
 
@@ -246,9 +238,7 @@ class Command(BaseCommand):
                 defaults={
                     'descripcion': f'Rutina de {rutina_data["tipo"]} para nivel {rutina_data["nivel"]}',
                     'nivel_dificultad': rutina_data['nivel'],
-                    'duracion_minutos': rutina_data['duracion'],
                     'tipo_ejercicio': rutina_data['tipo'],
-                    'calorias_estimadas': rutina_data['calorias'],
                     'creador': random.choice(administradores),
                     'es_publica': True
                 }
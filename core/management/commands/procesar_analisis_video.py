@@ -0,0 +1,69 @@
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.analisis_video import procesar_pendientes
+from core.models import TrabajoAnalisisVideo
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de análisis de video: reclama trabajos pendientes (FOR UPDATE SKIP LOCKED), los '
+        'analiza en un pool de procesos y guarda detecciones y retroalimentación en bloque'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--lote', type=int, help='Trabajos reclamados por vuelta (por defecto 2 por proceso)')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+        parser.add_argument('--metricas', action='store_true', help='Muestra las métricas de la cola y termina')
+
+    def crear_pool(self, procesos):
+        # Los procesos hijos no usan la base de datos: no deben heredar conexiones abiertas
+        connections.close_all()
+        return ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+
+    def handle(self, *args, **options):
+        if options['metricas']:
+            for clave, valor in TrabajoAnalisisVideo.metricas().items():
+                self.stdout.write(f"{clave}: {valor}")
+            return
+
+        trabajador = f"{socket.gethostname()}:{os.getpid()}"
+        lote = options['lote'] or 2 * options['procesos']
+        pool = self.crear_pool(options['procesos'])
+        self.stdout.write(f"Worker {trabajador} ({options['procesos']} procesos, lotes de {lote})")
+        try:
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    procesados = procesar_pendientes(trabajador, lote, pool)
+                except BrokenProcessPool:
+                    # Un proceso hijo murió (memoria, señal): sus trabajos ya se registraron como fallidos
+                    self.stderr.write('El pool de procesos se rompió; se crea uno nuevo')
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.crear_pool(options['procesos'])
+                    continue
+                if procesados:
+                    estados = {}
+                    for _, estado in procesados:
+                        estados[estado] = estados.get(estado, 0) + 1
+                    self.stdout.write(
+                        f"{len(procesados)} trabajos en {time.perf_counter() - inicio:.2f}s: "
+                        + ', '.join(f"{estado} {total}" for estado, total in sorted(estados.items()))
+                    )
+                elif options['una_vez']:
+                    break
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Deteniendo el worker')
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+        self.stdout.write(self.style.SUCCESS('Worker detenido'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.models import TendenciaTecnica
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las tendencias de técnica de todos los usuarios a partir de sus detecciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano-lote', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        creadas = TendenciaTecnica.reconstruir(tamano_lote=options['tamano_lote'])
+        self.stdout.write(self.style.SUCCESS(f"Tendencias recalculadas: {creadas}"))
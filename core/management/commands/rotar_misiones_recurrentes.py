@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import Mision, ProgresoMision, Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Abre el período vigente de las misiones recurrentes (diarias, semanales y mensuales) '
+        'creando el progreso de los usuarios activos. El progreso de períodos anteriores '
+        'queda como histórico sin modificarse.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', type=str, help='Fecha de referencia YYYY-MM-DD (por defecto hoy)')
+        parser.add_argument(
+            '--dias-actividad', type=int, default=30,
+            help='Solo usuarios con acceso en los últimos N días (0 = todos)'
+        )
+        parser.add_argument('--tamano-lote', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        fecha = timezone.now().date()
+        if options['fecha']:
+            fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date()
+
+        usuarios = Usuario.objects.filter(
+            tipo_usuario='usuario_final', is_active=True, esta_activo=True
+        )
+        if options['dias_actividad']:
+            usuarios = usuarios.filter(
+                ultimo_acceso__gte=timezone.now() - timedelta(days=options['dias_actividad'])
+            )
+
+        misiones = Mision.objects.filter(
+            esta_activa=True, es_recurrente=True, frecuencia_recurrencia__isnull=False
+        ).exclude(fecha_inicio__gt=fecha).exclude(fecha_fin__lt=fecha)
+
+        total = 0
+        for mision in misiones:
+            creados = ProgresoMision.abrir_periodo(
+                mision, usuarios, fecha=fecha, tamano_lote=options['tamano_lote']
+            )
+            total += creados
+            self.stdout.write(
+                f"{mision.titulo} ({mision.frecuencia_recurrencia}, período {mision.periodo_actual(fecha)}): {creados}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Progresos de misión creados: {total}"))
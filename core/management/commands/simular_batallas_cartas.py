@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from core.simulacion import (
+    RAREZAS, cargar_cartas, cartas_sinteticas, detectar_atipicos, matriz_victorias,
+    simular_mazos, tasa_media
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula todos los duelos entre cartas activas (y mazos aleatorios) para balancear sus '
+        'atributos. Muestra la tasa de victoria por rareza y las cartas atípicas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ensayos', type=int, default=16, help='Duelos simulados por pareja')
+        parser.add_argument('--mazos', type=int, default=20000, help='Partidas de mazos aleatorios (0 = omitir)')
+        parser.add_argument('--tamano-mazo', type=int, default=5)
+        parser.add_argument('--procesos', type=int, default=1, help='Procesos para simular en paralelo')
+        parser.add_argument('--tamano-bloque', type=int, default=256, help='Filas de la matriz por lote')
+        parser.add_argument('--umbral', type=float, default=2.0, help='Desviaciones para marcar una carta atípica')
+        parser.add_argument('--semilla', type=int)
+        parser.add_argument('--salida', type=str, help='Guarda la matriz de victorias y los ids en un .npz')
+        parser.add_argument(
+            '--sinteticas', type=int, default=0,
+            help='Usa N cartas aleatorias en lugar de la base de datos (medición de rendimiento)'
+        )
+
+    def handle(self, *args, **options):
+        if options['sinteticas']:
+            cartas = cartas_sinteticas(options['sinteticas'], options['semilla'])
+        else:
+            cartas = cargar_cartas()
+        n = len(cartas['ids'])
+        if n < 2:
+            self.stdout.write(self.style.WARNING('Se necesitan al menos dos cartas activas'))
+            return
+
+        inicio = time.perf_counter()
+        matriz = matriz_victorias(
+            cartas, ensayos=options['ensayos'], tamano_bloque=options['tamano_bloque'],
+            procesos=options['procesos'], semilla=options['semilla']
+        )
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            f"{n} x {n} duelos ({options['ensayos']} ensayos c/u) en {duracion:.1f}s "
+            f"({n * n * options['ensayos'] / duracion / 1e6:.0f} M duelos/s)"
+        )
+
+        tasas = tasa_media(matriz)
+        self.stdout.write('Tasa de victoria media por rareza:')
+        for nivel, rareza in enumerate(RAREZAS):
+            valores = tasas[cartas['rareza'] == nivel]
+            if len(valores):
+                self.stdout.write(
+                    f"  {rareza:<11} {len(valores):>6} cartas  media {valores.mean():.3f}  "
+                    f"min {valores.min():.3f}  max {valores.max():.3f}"
+                )
+
+        if options['mazos']:
+            tasas_mazo = simular_mazos(
+                matriz, options['mazos'], options['tamano_mazo'], options['semilla']
+            )
+            self.stdout.write(
+                f"Mazos: {options['mazos']} partidas de {options['tamano_mazo']} cartas; "
+                f"tasa media de los mazos por carta entre {np.nanmin(tasas_mazo):.3f} y {np.nanmax(tasas_mazo):.3f}"
+            )
+
+        atipicos = detectar_atipicos(tasas, cartas['rareza'], options['umbral'])
+        self.stdout.write(f"Cartas atípicas dentro de su rareza (|z| > {options['umbral']}): {len(atipicos)}")
+        for indice, z in sorted(atipicos, key=lambda atipico: -abs(atipico[1]))[:50]:
+            self.stdout.write(
+                f"  [{RAREZAS[cartas['rareza'][indice]]}] {cartas['nombres'][indice]} (id {cartas['ids'][indice]}): "
+                f"tasa {tasas[indice]:.3f}, z {z:+.2f} -> {'fuerte' if z > 0 else 'débil'}"
+            )
+
+        if options['salida']:
+            np.savez_compressed(options['salida'], ids=cartas['ids'], matriz=matriz, tasas=tasas)
+            self.stdout.write(f"Matriz guardada en {options['salida']}")
+
+        self.stdout.write(self.style.SUCCESS('Simulación completada'))
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:22
+
+from django.db import migrations, models
+
+
+GRUPOS_MUSCULARES = [
+    'pecho', 'espalda', 'hombros', 'piernas', 'brazos',
+    'abdomen', 'gluteos', 'full_body', 'cardiovascular',
+]
+
+
+def calcular_totales(apps, schema_editor):
+    Rutina = apps.get_model('core', 'Rutina')
+    RutinaEjercicio = apps.get_model('core', 'RutinaEjercicio')
+
+    totales = {}
+    filas = RutinaEjercicio.objects.values_list(
+        'rutina_id', 'series', 'descanso_segundos',
+        'ejercicio__calorias_estimadas_por_minuto', 'ejercicio__grupo_muscular'
+    )
+    for rutina_id, series, descanso, calorias_minuto, grupo in filas.iterator():
+        duracion = series * 0.5 + ((series - 1) * descanso / 60 if series > 1 else 0)
+        total = totales.setdefault(rutina_id, [0.0, 0.0, 0, 0])
+        total[0] += duracion
+        total[1] += duracion * float(calorias_minuto)
+        total[2] += 1
+        if grupo in GRUPOS_MUSCULARES:
+            total[3] |= 1 << GRUPOS_MUSCULARES.index(grupo)
+
+    rutinas = list(Rutina.objects.filter(pk__in=totales))
+    for rutina in rutinas:
+        duracion, calorias, cantidad, mascara = totales[rutina.pk]
+        rutina.duracion_minutos = round(duracion)
+        rutina.calorias_estimadas = round(calorias)
+        rutina.total_ejercicios = cantidad
+        rutina.mascara_grupos_musculares = mascara
+    Rutina.objects.bulk_update(
+        rutinas,
+        ['duracion_minutos', 'calorias_estimadas', 'total_ejercicios', 'mascara_grupos_musculares'],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rutina',
+            name='mascara_grupos_musculares',
+            field=models.IntegerField(default=0, help_text='Bit i activo si la rutina trabaja el grupo i de Ejercicio.GRUPO_MUSCULAR_CHOICES'),
+        ),
+        migrations.AddField(
+            model_name='rutina',
+            name='total_ejercicios',
+            field=models.IntegerField(default=0, help_text='Número de ejercicios en la rutina'),
+        ),
+        migrations.AlterField(
+            model_name='rutina',
+            name='calorias_estimadas',
+            field=models.IntegerField(default=0, help_text='Calorías totales estimadas'),
+        ),
+        migrations.AlterField(
+            model_name='rutina',
+            name='duracion_minutos',
+            field=models.IntegerField(default=0, help_text='Duración total estimada en minutos'),
+        ),
+        migrations.AddIndex(
+            model_name='rutina',
+            index=models.Index(fields=['esta_activa', 'duracion_minutos'], name='rutinas_activa_duracion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rutina',
+            index=models.Index(fields=['esta_activa', 'calorias_estimadas'], name='rutinas_activa_calorias_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rutina',
+            index=models.Index(fields=['esta_activa', 'total_ejercicios'], name='rutinas_activa_total_ej_idx'),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
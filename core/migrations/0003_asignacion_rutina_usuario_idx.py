@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_rutina_totales_derivados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asignacionrutina',
+            index=models.Index(fields=['rutina', 'usuario'], name='asig_rutina_usuario_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def calcular_estado(apps, schema_editor):
+    AsignacionRutina = apps.get_model('core', 'AsignacionRutina')
+    AsignacionRutina.objects.filter(completada=True).update(estado='completada')
+    AsignacionRutina.objects.filter(
+        completada=False, fecha_vencimiento__lt=django.utils.timezone.now().date()
+    ).update(estado='vencida')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_asignacion_rutina_usuario_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asignacionrutina',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('completada', 'Completada'), ('vencida', 'Vencida')], default='pendiente', help_text='Se mantiene en save() y con el comando marcar_asignaciones_vencidas', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='asignacionrutina',
+            index=models.Index(fields=['usuario', 'estado'], name='asig_usuario_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asignacionrutina',
+            index=models.Index(condition=models.Q(('estado', 'pendiente')), fields=['fecha_vencimiento'], name='asig_pendientes_venc_idx'),
+        ),
+        migrations.RunPython(calcular_estado, migrations.RunPython.noop),
+    ]
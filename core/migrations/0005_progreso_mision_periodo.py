@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:29
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+TAMANO_LOTE = 1000
+
+
+def asignar_periodos(apps, schema_editor):
+    ProgresoMision = apps.get_model('core', 'ProgresoMision')
+    progresos = ProgresoMision.objects.filter(
+        mision__es_recurrente=True, mision__frecuencia_recurrencia__in=['diaria', 'semanal', 'mensual']
+    ).select_related('mision').only('pk', 'fecha_asignacion', 'mision__frecuencia_recurrencia')
+    lote = []
+    for progreso in progresos.iterator(chunk_size=TAMANO_LOTE):
+        fecha = progreso.fecha_asignacion
+        frecuencia = progreso.mision.frecuencia_recurrencia
+        if frecuencia == 'semanal':
+            fecha -= timedelta(days=fecha.weekday())
+        elif frecuencia == 'mensual':
+            fecha = fecha.replace(day=1)
+        progreso.periodo = fecha
+        lote.append(progreso)
+        if len(lote) >= TAMANO_LOTE:
+            ProgresoMision.objects.bulk_update(lote, ['periodo'])
+            lote = []
+    if lote:
+        ProgresoMision.objects.bulk_update(lote, ['periodo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_asignacion_rutina_estado'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='progresomision',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='progresomision',
+            name='periodo',
+            field=models.DateField(blank=True, help_text='Inicio del período para misiones recurrentes (null = misión única)', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='progresomision',
+            constraint=models.UniqueConstraint(condition=models.Q(('periodo__isnull', True)), fields=('usuario', 'mision'), name='progreso_mision_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='progresomision',
+            constraint=models.UniqueConstraint(fields=('usuario', 'mision', 'periodo'), name='progreso_mision_periodo_unico'),
+        ),
+        migrations.RunPython(asignar_periodos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_progreso_mision_periodo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolicitudIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacion', models.CharField(max_length=100)),
+                ('clave', models.CharField(max_length=100)),
+                ('resultado', models.JSONField(default=dict)),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='solicitudes_idempotentes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Solicitud Idempotente',
+                'verbose_name_plural': 'Solicitudes Idempotentes',
+                'db_table': 'solicitudes_idempotentes',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'operacion', 'clave'), name='solicitud_idempotente_unica')],
+            },
+        ),
+    ]
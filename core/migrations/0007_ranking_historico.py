@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_solicitud_idempotente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_ranking', models.CharField(choices=[('semanal', 'Semanal'), ('mensual', 'Mensual'), ('anual', 'Anual'), ('global', 'Global')], max_length=100)),
+                ('periodo', models.DateField(help_text='Fecha de inicio del período cerrado')),
+                ('total_participantes', models.IntegerField(default=0)),
+                ('puntuacion_maxima', models.IntegerField(default=0)),
+                ('puntuacion_media', models.FloatField(default=0)),
+                ('top', models.JSONField(default=list, help_text='[{posicion, usuario, usuario_nombre, puntuacion}] ordenado por posición')),
+                ('histograma', models.JSONField(default=dict, help_text='{limites: [...], conteos: [...]} de las puntuaciones del período')),
+                ('fecha_cierre', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Ranking Histórico',
+                'verbose_name_plural': 'Rankings Históricos',
+                'db_table': 'rankings_historicos',
+                'ordering': ['tipo_ranking', '-periodo'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ranking',
+            index=models.Index(fields=['tipo_ranking', 'periodo', 'posicion'], name='ranking_tablero_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rankinghistorico',
+            constraint=models.UniqueConstraint(fields=('tipo_ranking', 'periodo'), name='ranking_historico_unico'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def asignar_ligas(apps, schema_editor):
+    Ranking = apps.get_model('core', 'Ranking')
+    ultima_liga, posicion_liga, cambios = None, 0, []
+    filas = Ranking.objects.select_related('usuario').order_by(
+        'tipo_ranking', 'periodo', 'usuario__rango_actual', 'usuario__nivel_fisico_actual', 'posicion'
+    )
+    for ranking in filas.iterator():
+        liga = (
+            ranking.tipo_ranking, ranking.periodo,
+            ranking.usuario.rango_actual_id, ranking.usuario.nivel_fisico_actual
+        )
+        posicion_liga = posicion_liga + 1 if liga == ultima_liga else 1
+        ultima_liga = liga
+        ranking.rango_id = ranking.usuario.rango_actual_id
+        ranking.nivel_fisico = ranking.usuario.nivel_fisico_actual
+        ranking.posicion_liga = posicion_liga
+        cambios.append(ranking)
+    Ranking.objects.bulk_update(cambios, ['rango', 'nivel_fisico', 'posicion_liga'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_ranking_historico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ranking',
+            name='nivel_fisico',
+            field=models.CharField(choices=[('principiante', 'Principiante'), ('intermedio', 'Intermedio'), ('avanzado', 'Avanzado'), ('experto', 'Experto')], default='principiante', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='ranking',
+            name='posicion_liga',
+            field=models.IntegerField(default=0, help_text='Posición dentro de la liga (rango + nivel físico)'),
+        ),
+        migrations.AddField(
+            model_name='ranking',
+            name='rango',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rankings', to='core.rango'),
+        ),
+        migrations.AddIndex(
+            model_name='ranking',
+            index=models.Index(fields=['tipo_ranking', 'periodo', 'rango', 'nivel_fisico', 'posicion_liga'], name='ranking_liga_idx'),
+        ),
+        migrations.RunPython(asignar_ligas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_ranking_ligas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventariousuario',
+            index=models.Index(condition=models.Q(('esta_activo', True), ('fecha_expiracion__isnull', False)), fields=['fecha_expiracion'], name='inv_activos_expiracion_idx'),
+        ),
+    ]
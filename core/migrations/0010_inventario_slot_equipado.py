@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:45
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_tipo_item(apps, schema_editor):
+    InventarioUsuario = apps.get_model('core', 'InventarioUsuario')
+    ItemColeccionable = apps.get_model('core', 'ItemColeccionable')
+    InventarioUsuario.objects.update(
+        tipo_item=Subquery(ItemColeccionable.objects.filter(pk=OuterRef('item_id')).values('tipo_item')[:1])
+    )
+    # Si una carrera anterior dejó varios items equipados en un slot, conservar el más reciente
+    vistos = set()
+    duplicados = []
+    equipados = InventarioUsuario.objects.filter(esta_equipado=True).order_by('-pk').values_list(
+        'pk', 'usuario_id', 'tipo_item'
+    )
+    for pk, usuario_id, tipo_item in equipados.iterator():
+        if (usuario_id, tipo_item) in vistos:
+            duplicados.append(pk)
+        vistos.add((usuario_id, tipo_item))
+    InventarioUsuario.objects.filter(pk__in=duplicados).update(esta_equipado=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_inventario_expiracion_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventariousuario',
+            name='tipo_item',
+            field=models.CharField(choices=[('avatar', 'Avatar'), ('marco', 'Marco de Perfil'), ('fondo', 'Fondo de Perfil'), ('badge', 'Insignia'), ('efecto', 'Efecto Especial'), ('tema', 'Tema de UI'), ('consumible', 'Consumible')], default='', help_text='Copia de item.tipo_item: define el slot de equipamiento', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copiar_tipo_item, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='inventariousuario',
+            constraint=models.UniqueConstraint(condition=models.Q(('esta_equipado', True)), fields=('usuario', 'tipo_item'), name='inventario_slot_equipado_unico'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:44
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_inventario_slot_equipado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartaejercicio',
+            name='poder_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('atributo_fuerza'), '+', models.F('atributo_resistencia')), '+', models.F('atributo_flexibilidad')), help_text='Suma de los atributos, calculada por la base de datos', output_field=models.IntegerField()),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_carta_poder_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deteccionpostura',
+            name='puntos_binarios',
+            field=models.BinaryField(blank=True, help_text='Puntos corporales empaquetados (ver core.posturas)', null=True),
+        ),
+        migrations.AddField(
+            model_name='modeloia',
+            name='puntos_referencia_binarios',
+            field=models.BinaryField(blank=True, help_text='Puntos de referencia empaquetados (ver core.posturas)', null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_puntos_binarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoAnalisisVideo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.FileField(help_text='Puntos clave por frame del video (.npy, .pst o .json)', upload_to='analisis_video/%Y/%m/')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('intentos', models.IntegerField(default=0)),
+                ('max_intentos', models.IntegerField(default=3)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('trabajador', models.CharField(blank=True, max_length=100, null=True)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now, help_text='No se reclama antes (reintentos)')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('espera_segundos', models.DecimalField(blank=True, decimal_places=3, help_text='Tiempo en cola antes del último intento', max_digits=10, null=True)),
+                ('analisis_segundos', models.DecimalField(blank=True, decimal_places=3, help_text='Duración del análisis del último intento', max_digits=10, null=True)),
+                ('ejercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_analisis_video', to='core.ejercicio')),
+                ('modelo_ia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_analisis_video', to='core.modeloia')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_analisis_video', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Análisis de Video',
+                'verbose_name_plural': 'Trabajos de Análisis de Video',
+                'db_table': 'trabajos_analisis_video',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(condition=models.Q(('estado__in', ['pendiente', 'procesando'])), fields=['disponible_desde'], name='trabajo_video_cola_idx')],
+            },
+        ),
+    ]
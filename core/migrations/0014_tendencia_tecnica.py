@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_trabajo_analisis_video'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TendenciaTecnica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_detecciones', models.IntegerField(default=0)),
+                ('suma_puntuaciones', models.BigIntegerField(default=0)),
+                ('mejor_puntuacion', models.IntegerField(default=0)),
+                ('ultima_puntuacion', models.IntegerField(default=0)),
+                ('media_movil_corta', models.FloatField(default=0)),
+                ('media_movil_larga', models.FloatField(default=0)),
+                ('ultimas', models.JSONField(default=list, help_text='[[fecha, puntuacion, media_movil_corta]] de las últimas detecciones, de la más antigua a la más reciente')),
+                ('histograma', models.JSONField(default=list, help_text='Conteo de las últimas puntuaciones por tramos de 10 puntos (0-9, 10-19, ..., 90-100)')),
+                ('fecha_primera', models.DateTimeField(blank=True, null=True)),
+                ('fecha_ultima', models.DateTimeField(blank=True, null=True)),
+                ('ejercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tendencias_tecnica', to='core.ejercicio')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tendencias_tecnica', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tendencia de Técnica',
+                'verbose_name_plural': 'Tendencias de Técnica',
+                'db_table': 'tendencias_tecnica',
+                'ordering': ['-fecha_ultima'],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'ejercicio'), name='tendencia_tecnica_unica')],
+            },
+        ),
+    ]
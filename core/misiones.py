@@ -0,0 +1,205 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import LogActividad, Mision, ProgresoMision, Usuario
+from .versiones import CacheProceso, version_actual
+
+CLAVE_VERSION_MISIONES = 'misiones:version_catalogo'
+
+
+def detecciones_confiables(ctx):
+    """Solo las detecciones confiables avanzan misiones (contexto 'deteccion' o 'detecciones')"""
+    detecciones = ctx['detecciones'] if 'detecciones' in ctx else [ctx['deteccion']]
+    return sum(1 for deteccion in detecciones if deteccion.es_confiable)
+
+
+# Evento de dominio -> [(tipo_mision, unidad_objetivo, cantidad(contexto))]
+REGLAS_EVENTOS = {
+    'deteccion': [
+        ('ejercicio', 'ejercicios', detecciones_confiables),
+        ('ejercicio', 'veces', detecciones_confiables),
+        ('logro', 'ejercicios', detecciones_confiables),
+    ],
+    'rutina_completada': [
+        ('rutina', 'rutinas', lambda ctx: 1),
+        ('rutina', 'veces', lambda ctx: 1),
+        ('rutina', 'minutos', lambda ctx: ctx['rutina'].duracion_minutos),
+        ('ejercicio', 'ejercicios', lambda ctx: ctx['rutina'].total_ejercicios),
+        ('ejercicio', 'minutos', lambda ctx: ctx['rutina'].duracion_minutos),
+        ('consistencia', 'rutinas', lambda ctx: 1),
+        ('logro', 'rutinas', lambda ctx: 1),
+    ],
+    'login': [
+        ('consistencia', 'dias', lambda ctx: 1),
+        ('consistencia', 'veces', lambda ctx: 1),
+    ],
+}
+
+# Unidades que avanzan como máximo una vez por día
+UNIDADES_DIARIAS = {'dias'}
+
+# Las misiones disponibles por usuario se cachean hasta el cambio de día
+DURACION_CACHE_DISPONIBLES = 60 * 60 * 24
+
+
+def construir_indice_misiones():
+    """Indexa las misiones activas por (tipo_mision, unidad_objetivo)"""
+    indice = defaultdict(list)
+    misiones = Mision.objects.filter(esta_activa=True).values(
+        'id', 'titulo', 'tipo_mision', 'unidad_objetivo', 'objetivo',
+        'recompensa_xp', 'recompensa_cristales', 'fecha_inicio', 'fecha_fin',
+        'es_recurrente', 'frecuencia_recurrencia'
+    )
+    for mision in misiones:
+        indice[(mision['tipo_mision'], mision['unidad_objetivo'])].append(mision)
+    return dict(indice)
+
+
+_indice = CacheProceso(CLAVE_VERSION_MISIONES, construir_indice_misiones)
+
+
+def invalidar_indice_misiones():
+    """Fuerza la reconstrucción del índice de misiones activas en todos los procesos"""
+    _indice.invalidar()
+
+
+def misiones_para_evento(evento, **contexto):
+    """Retorna {mision_id: (mision, incremento)} de las misiones vigentes que avanza un evento"""
+    hoy = timezone.now().date()
+    indice = _indice.obtener()
+    resultado = {}
+    for tipo_mision, unidad, cantidad in REGLAS_EVENTOS.get(evento, []):
+        for mision in indice.get((tipo_mision, unidad), []):
+            if mision['fecha_inicio'] and hoy < mision['fecha_inicio']:
+                continue
+            if mision['fecha_fin'] and hoy > mision['fecha_fin']:
+                continue
+            incremento = int(cantidad(contexto) or 0)
+            if incremento > 0:
+                resultado[mision['id']] = (mision, incremento)
+    return resultado
+
+
+def misiones_disponibles(usuario, fecha=None):
+    """Misiones activas y vigentes que el usuario no ha completado en el período actual"""
+    fecha = fecha or timezone.now().date()
+    completadas = ProgresoMision.objects.filter(
+        ProgresoMision.filtro_periodo_actual(fecha),
+        usuario=usuario, mision=OuterRef('pk'), completada=True
+    )
+    return Mision.objects.filter(
+        Q(fecha_inicio__isnull=True) | Q(fecha_inicio__lte=fecha),
+        Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=fecha),
+        esta_activa=True
+    ).exclude(Exists(completadas))
+
+
+def clave_disponibles(usuario_id, fecha=None):
+    """Clave de caché de las misiones disponibles; cambia con el catálogo y con el día"""
+    fecha = fecha or timezone.now().date()
+    return f"misiones:disponibles:{version_actual(CLAVE_VERSION_MISIONES)}:{fecha.isoformat()}:{usuario_id}"
+
+
+def invalidar_disponibles(usuario_id):
+    """Descarta las misiones disponibles cacheadas de un usuario"""
+    cache.delete(clave_disponibles(usuario_id))
+
+
+def registrar_evento(usuario, evento, **contexto):
+    """Avanza las misiones del usuario que coinciden con un evento y otorga las completadas.
+
+    Retorna la lista de ids de misiones completadas por este evento.
+    """
+    candidatas = misiones_para_evento(evento, **contexto)
+    if not candidatas:
+        return []
+
+    ahora = timezone.now()
+    inicio_dia = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # Las misiones recurrentes avanzan el progreso de su período vigente
+    periodos = {
+        mision_id: (
+            Mision.calcular_periodo(mision['frecuencia_recurrencia'], ahora.date())
+            if mision['es_recurrente'] else None
+        )
+        for mision_id, (mision, _) in candidatas.items()
+    }
+    filtro = Q()
+    for mision_id, periodo in periodos.items():
+        filtro |= Q(mision_id=mision_id, periodo=periodo) if periodo else Q(mision_id=mision_id, periodo__isnull=True)
+
+    with transaction.atomic():
+        # Inscribir al usuario en las misiones que aún no tiene
+        ProgresoMision.objects.bulk_create(
+            [
+                ProgresoMision(usuario=usuario, mision_id=mision_id, periodo=periodo)
+                for mision_id, periodo in periodos.items()
+            ],
+            ignore_conflicts=True
+        )
+        filas = ProgresoMision.objects.select_for_update().filter(
+            filtro, usuario=usuario, completada=False
+        ).values_list('pk', 'mision_id', 'progreso_actual', 'fecha_actualizacion')
+
+        pks, incrementos, completadas = [], {}, []
+        for pk, mision_id, progreso, actualizacion in filas:
+            mision, incremento = candidatas[mision_id]
+            if mision['unidad_objetivo'] in UNIDADES_DIARIAS and progreso and actualizacion >= inicio_dia:
+                continue
+            pks.append(pk)
+            incrementos[mision_id] = incremento
+            if progreso + incremento >= mision['objetivo']:
+                completadas.append(mision)
+
+        if not incrementos:
+            return []
+
+        def por_mision(valores, default):
+            return Case(
+                *[When(mision_id=mision_id, then=Value(valor)) for mision_id, valor in valores.items()],
+                default=default
+            )
+
+        ids_completadas = {mision['id'] for mision in completadas}
+        objetivos = {mision_id: candidatas[mision_id][0]['objetivo'] for mision_id in incrementos}
+        ProgresoMision.objects.filter(pk__in=pks, completada=False).update(
+            progreso_actual=Least(
+                F('progreso_actual') + por_mision(incrementos, Value(0)),
+                por_mision(objetivos, F('progreso_actual'))
+            ),
+            completada=Case(When(mision_id__in=ids_completadas, then=Value(True)), default=Value(False)),
+            fecha_completacion=Case(
+                When(mision_id__in=ids_completadas, then=Value(ahora)), default=F('fecha_completacion')
+            ),
+            fecha_actualizacion=ahora,
+        )
+
+        if completadas:
+            xp = sum(mision['recompensa_xp'] for mision in completadas)
+            cristales = sum(mision['recompensa_cristales'] for mision in completadas)
+            Usuario.objects.filter(pk=usuario.pk).update(
+                puntos_experiencia=F('puntos_experiencia') + xp,
+                cristales_magicos=F('cristales_magicos') + cristales
+            )
+            usuario.puntos_experiencia += xp
+            usuario.cristales_magicos += cristales
+
+            LogActividad.objects.bulk_create([
+                LogActividad(
+                    usuario=usuario,
+                    tipo_actividad='mision_completada',
+                    descripcion=f"Completó misión: {mision['titulo']}",
+                    puntos_ganados=mision['recompensa_xp'],
+                    cristales_ganados=mision['recompensa_cristales']
+                )
+                for mision in completadas
+            ])
+            transaction.on_commit(lambda: invalidar_disponibles(usuario.pk))
+
+    return sorted(ids_completadas)
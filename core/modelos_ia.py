@@ -0,0 +1,83 @@
+import re
+
+from .models import ModeloIA
+from .posturas import ObjetivosPostura
+from .versiones import CacheProceso
+
+CLAVE_VERSION_MODELOS = 'modelos_ia:version_registro'
+
+
+def clave_version(version):
+    """Clave para ordenar versiones semánticamente: '1.10' > '1.9.2' > '1.9.2-beta' (admite prefijo 'v')"""
+    version = str(version).strip().lstrip('vV').split('+', 1)[0]
+    principal, _, previa = version.partition('-')
+    numeros = []
+    for parte in principal.split('.'):
+        digitos = re.match(r'\d+', parte)
+        numeros.append(int(digitos.group()) if digitos else 0)
+    numeros += [0] * (3 - len(numeros))
+    # Una versión previa va antes que la estable con los mismos números
+    return tuple(numeros), (0, previa) if previa else (1, '')
+
+
+class ModeloCompilado:
+    """Datos de un ModeloIA listos para puntuar: objetivos como arreglos y umbral como float"""
+
+    def __init__(self, fila):
+        self.id = fila['id']
+        self.nombre_modelo = fila['nombre_modelo']
+        self.tipo_ejercicio = fila['tipo_ejercicio']
+        self.version = fila['version']
+        self.esta_activo = fila['esta_activo']
+        self.umbral_precision = float(fila['umbral_precision'])
+        try:
+            self.objetivos = ObjetivosPostura(fila['angulos_ideales'])
+        except (TypeError, ValueError, KeyError):
+            self.objetivos = None  # El modelo no puede puntuar (ángulos ideales inválidos)
+
+
+class RegistroModelos:
+    """Modelos de IA compilados por id y el modelo activo más reciente por tipo de ejercicio"""
+
+    def __init__(self):
+        filas = ModeloIA.objects.values(
+            'id', 'nombre_modelo', 'tipo_ejercicio', 'version', 'angulos_ideales',
+            'umbral_precision', 'esta_activo'
+        )
+        self.modelos = {fila['id']: ModeloCompilado(fila) for fila in filas}
+        self.activos = {}
+        for modelo in self.modelos.values():
+            if not modelo.esta_activo:
+                continue
+            actual = self.activos.get(modelo.tipo_ejercicio)
+            if actual is None or clave_version(modelo.version) > clave_version(actual.version):
+                self.activos[modelo.tipo_ejercicio] = modelo
+
+
+_registro = CacheProceso(CLAVE_VERSION_MODELOS, RegistroModelos)
+
+
+def obtener_registro():
+    """Retorna el registro del proceso, recargándolo si algún modelo cambió"""
+    return _registro.obtener()
+
+
+def modelo_activo(tipo_ejercicio):
+    """Modelo compilado activo de mayor versión para un tipo de ejercicio (o None)"""
+    return obtener_registro().activos.get(tipo_ejercicio)
+
+
+def es_modelo_vigente(modelo):
+    """Indica si `modelo` (ModeloIA o compilado) es el activo de mayor versión de su tipo de ejercicio"""
+    activo = modelo_activo(modelo.tipo_ejercicio)
+    return activo is not None and activo.id == modelo.id
+
+
+def modelo_compilado(modelo_id):
+    """Modelo compilado por id (o None si aún no está en el registro)"""
+    return obtener_registro().modelos.get(modelo_id)
+
+
+def invalidar_registro_modelos():
+    """Fuerza la recarga del registro de modelos en todos los procesos"""
+    _registro.invalidar()
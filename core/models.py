@@ -1,9 +1,22 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Cast, Coalesce, Round, RowNumber
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from collections import defaultdict
+from datetime import datetime, timedelta
 from decimal import Decimal
 
+import json
+
+import numpy as np
+
+from .consultas import insertar_desde_seleccion, rangos_de_ids
+from .posturas import (
+    a_arreglo, empaquetar_puntos, empaquetar_si_corresponde, puntos_a_json, puntuar_postura
+)
+
 class UsuarioManager(BaseUserManager):
     def create_user(self, email, nombre_usuario, password=None, **extra_fields):
         if not email:
@@ -300,6 +313,42 @@ class LogActividad(models.Model):
             cristales_ganados=cristales
         )
 
+class SolicitudIdempotente(models.Model):
+    """Resultado de una operación identificada por una clave de idempotencia del cliente"""
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='solicitudes_idempotentes'
+    )
+    operacion = models.CharField(max_length=100)
+    clave = models.CharField(max_length=100)
+    resultado = models.JSONField(default=dict)
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'solicitudes_idempotentes'
+        verbose_name = 'Solicitud Idempotente'
+        verbose_name_plural = 'Solicitudes Idempotentes'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'operacion', 'clave'],
+                name='solicitud_idempotente_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.operacion} - {self.usuario_id} - {self.clave}"
+
+    @classmethod
+    def reservar(cls, usuario, operacion, clave):
+        """Registra la clave dentro de la transacción actual; retorna (solicitud, es_nueva).
+
+        Una solicitud concurrente con la misma clave espera a que la primera confirme
+        y recibe la solicitud ya registrada con su resultado.
+        """
+        return cls.objects.get_or_create(usuario=usuario, operacion=operacion, clave=clave)
+
+
 class Ejercicio(models.Model):
     TIPO_EJERCICIO_CHOICES = [
         ('fuerza', 'Fuerza'),
@@ -348,6 +397,16 @@ class Ejercicio(models.Model):
 
     def __str__(self):
         return self.nombre
+
+    def save(self, *args, **kwargs):
+        # Las calorías y grupos musculares de las rutinas dependen de este ejercicio
+        es_nuevo = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not es_nuevo:
+                Rutina.recalcular_totales(
+                    Rutina.objects.filter(rutina_ejercicios__ejercicio=self)
+                )
     
     @property
     def dificultad_estimada(self):
@@ -383,12 +442,12 @@ class Rutina(models.Model):
         max_length=50, 
         choices=NIVEL_DIFICULTAD_CHOICES
     )
-    duracion_minutos = models.IntegerField(help_text="Duración total estimada en minutos")
+    duracion_minutos = models.IntegerField(default=0, help_text="Duración total estimada en minutos")
     tipo_ejercicio = models.CharField(
         max_length=100, 
         choices=TIPO_EJERCICIO_CHOICES
     )
-    calorias_estimadas = models.IntegerField(help_text="Calorías totales estimadas")
+    calorias_estimadas = models.IntegerField(default=0, help_text="Calorías totales estimadas")
     es_publica = models.BooleanField(default=True)
     creador = models.ForeignKey(
         Usuario, 
@@ -399,26 +458,139 @@ class Rutina(models.Model):
     fecha_creacion = models.DateTimeField(default=timezone.now)
     esta_activa = models.BooleanField(default=True)
 
+    # duracion_minutos, calorias_estimadas y estos campos se derivan de
+    # RutinaEjercicio (ver recalcular_totales)
+    total_ejercicios = models.IntegerField(default=0, help_text="Número de ejercicios en la rutina")
+    mascara_grupos_musculares = models.IntegerField(
+        default=0,
+        help_text="Bit i activo si la rutina trabaja el grupo i de Ejercicio.GRUPO_MUSCULAR_CHOICES"
+    )
+
     class Meta:
         db_table = 'rutinas'
         verbose_name = 'Rutina'
         verbose_name_plural = 'Rutinas'
         ordering = ['nivel_dificultad', 'nombre']
+        indexes = [
+            models.Index(fields=['esta_activa', 'duracion_minutos'], name='rutinas_activa_duracion_idx'),
+            models.Index(fields=['esta_activa', 'calorias_estimadas'], name='rutinas_activa_calorias_idx'),
+            models.Index(fields=['esta_activa', 'total_ejercicios'], name='rutinas_activa_total_ej_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} ({self.nivel_dificultad})"
     
-    @property
-    def total_ejercicios(self):
-        """Retorna el número total de ejercicios en la rutina"""
-        return self.rutina_ejercicios.count()
-    
     @property
     def grupos_musculares(self):
         """Retorna los grupos musculares únicos trabajados en la rutina"""
-        ejercicios = self.rutina_ejercicios.select_related('ejercicio').all()
-        grupos = set(ej.gercicio.grupo_muscular for ej in ejercicios if ej.ejercicio.grupo_muscular)
-        return list(grupos)
+        return [
+            grupo for i, (grupo, _) in enumerate(Ejercicio.GRUPO_MUSCULAR_CHOICES)
+            if self.mascara_grupos_musculares & (1 << i)
+        ]
+
+    @staticmethod
+    def bit_grupo_muscular(grupo):
+        """Retorna el bit de la máscara correspondiente a un grupo muscular"""
+        grupos = [clave for clave, _ in Ejercicio.GRUPO_MUSCULAR_CHOICES]
+        return 1 << grupos.index(grupo)
+
+    @classmethod
+    def recalcular_totales(cls, rutinas):
+        """Recalcula los totales derivados de un queryset o lista de ids de rutinas"""
+        if not isinstance(rutinas, models.QuerySet):
+            rutinas = cls.objects.filter(pk__in=rutinas)
+
+        duracion_fila = (
+            F('series') * Value(0.5)
+            + Case(
+                When(series__gt=1, then=(F('series') - 1) * F('descanso_segundos') / Value(60.0)),
+                default=Value(0.0),
+                output_field=models.FloatField()
+            )
+        )
+        calorias_fila = duracion_fila * Cast(
+            'ejercicio__calorias_estimadas_por_minuto', models.FloatField()
+        )
+        bit_grupo = Case(
+            *[
+                When(ejercicio__grupo_muscular=grupo, then=Value(1 << i))
+                for i, (grupo, _) in enumerate(Ejercicio.GRUPO_MUSCULAR_CHOICES)
+            ],
+            default=Value(0),
+            output_field=models.IntegerField()
+        )
+
+        filas = RutinaEjercicio.objects.filter(rutina=OuterRef('pk')).order_by().values('rutina')
+
+        def total(expresion):
+            subconsulta = Subquery(filas.annotate(total=expresion).values('total')[:1])
+            return Coalesce(subconsulta, Value(0), output_field=models.IntegerField())
+
+        with transaction.atomic():
+            # Bloquear las rutinas serializa los recálculos concurrentes
+            ids = list(
+                rutinas.select_for_update().order_by('pk').values_list('pk', flat=True)
+            )
+            return cls.objects.filter(pk__in=ids).update(
+                duracion_minutos=total(Cast(Round(Sum(duracion_fila)), models.IntegerField())),
+                calorias_estimadas=total(Cast(Round(Sum(calorias_fila)), models.IntegerField())),
+                total_ejercicios=total(models.Count('pk')),
+                mascara_grupos_musculares=total(Sum(bit_grupo, distinct=True)),
+            )
+
+    def sincronizar_ejercicios(self, ejercicios):
+        """Reemplaza los ejercicios de la rutina por la lista dada (el orden es la posición).
+
+        Cada elemento es un dict con los campos de RutinaEjercicio; los que traen
+        'id' actualizan la fila existente, los demás se insertan y las filas que
+        no aparecen se eliminan. Usa un número constante de consultas.
+        """
+        campos = ['ejercicio_id', 'series', 'repeticiones', 'descanso_segundos', 'peso_sugerido', 'notas']
+
+        with transaction.atomic():
+            existentes = {
+                fila.pk: fila
+                for fila in RutinaEjercicio.objects.select_for_update().filter(rutina=self)
+            }
+            filas_enviadas = [datos['id'] for datos in ejercicios if datos.get('id')]
+            ids_enviados = set(filas_enviadas)
+            if len(ids_enviados) != len(filas_enviadas):
+                raise ValueError("Una misma fila aparece más de una vez en la lista")
+            ajenos = ids_enviados - existentes.keys()
+            if ajenos:
+                raise ValueError(f"Ejercicios que no pertenecen a la rutina: {sorted(ajenos)}")
+
+            eliminados = existentes.keys() - ids_enviados
+            if eliminados:
+                RutinaEjercicio.objects.filter(pk__in=eliminados).delete()
+
+            # Fase 1: llevar los órdenes conservados a negativos para liberar 1..N
+            if ids_enviados:
+                RutinaEjercicio.objects.filter(pk__in=ids_enviados).update(orden=-F('orden'))
+
+            # Fase 2: asignar el orden final y los campos en bloque
+            actualizados, nuevos = [], []
+            for orden, datos in enumerate(ejercicios, 1):
+                fila = existentes[datos['id']] if datos.get('id') else RutinaEjercicio(rutina=self)
+                for campo in campos:
+                    if campo in datos:
+                        setattr(fila, campo, datos[campo])
+                fila.orden = orden
+                (actualizados if fila.pk else nuevos).append(fila)
+
+            if actualizados:
+                RutinaEjercicio.objects.bulk_update(actualizados, campos + ['orden'])
+            if nuevos:
+                RutinaEjercicio.objects.bulk_create(nuevos)
+
+            Rutina.recalcular_totales([self.pk])
+
+        # bulk_update/bulk_create no emiten señales
+        from .recomendaciones import invalidar_matriz_rutinas  # Importación local para evitar import circular
+        invalidar_matriz_rutinas()
+        self.refresh_from_db(fields=[
+            'duracion_minutos', 'calorias_estimadas', 'total_ejercicios', 'mascara_grupos_musculares'
+        ])
 
 class RutinaEjercicio(models.Model):
     rutina = models.ForeignKey(
@@ -459,6 +631,18 @@ class RutinaEjercicio(models.Model):
 
     def __str__(self):
         return f"{self.rutina.nombre} - {self.ejercicio.nombre} (Orden: {self.orden})"
+
+    def save(self, *args, **kwargs):
+        # Mantener los totales de la rutina en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Rutina.recalcular_totales([self.rutina_id])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            Rutina.recalcular_totales([self.rutina_id])
+        return resultado
     
     @property
     def duracion_estimada_minutos(self):
@@ -476,6 +660,12 @@ class AsignacionRutina(models.Model):
         (5, 'Muy Difícil'),
     ]
 
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('completada', 'Completada'),
+        ('vencida', 'Vencida'),
+    ]
+
     usuario = models.ForeignKey(
         Usuario, 
         on_delete=models.CASCADE, 
@@ -489,6 +679,12 @@ class AsignacionRutina(models.Model):
     fecha_asignacion = models.DateField(default=timezone.now)
     fecha_vencimiento = models.DateField(blank=True, null=True)
     completada = models.BooleanField(default=False)
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        help_text="Se mantiene en save() y con el comando marcar_asignaciones_vencidas"
+    )
     fecha_completacion = models.DateTimeField(blank=True, null=True)
     calificacion_dificultad = models.IntegerField(
         choices=CALIFICACION_CHOICES, 
@@ -503,12 +699,40 @@ class AsignacionRutina(models.Model):
         verbose_name = 'Asignación de Rutina'
         verbose_name_plural = 'Asignaciones de Rutina'
         ordering = ['-fecha_asignacion']
+        indexes = [
+            models.Index(fields=['rutina', 'usuario'], name='asig_rutina_usuario_idx'),
+            models.Index(fields=['usuario', 'estado'], name='asig_usuario_estado_idx'),
+            models.Index(
+                fields=['fecha_vencimiento'],
+                condition=Q(estado='pendiente'),
+                name='asig_pendientes_venc_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.usuario.nombre_usuario} - {self.rutina.nombre} - {self.fecha_asignacion}"
+
+    def save(self, *args, **kwargs):
+        # Mantener el estado persistido coherente con completada y la fecha de vencimiento
+        if self.completada:
+            self.estado = 'completada'
+        elif self.fecha_vencimiento and timezone.now().date() > self.fecha_vencimiento:
+            self.estado = 'vencida'
+        else:
+            self.estado = 'pendiente'
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def marcar_vencidas(cls, fecha=None):
+        """Marca como vencidas las asignaciones pendientes con fecha de vencimiento pasada"""
+        fecha = fecha or timezone.now().date()
+        return cls.objects.filter(
+            estado='pendiente', fecha_vencimiento__lt=fecha
+        ).update(estado='vencida')
     
     def marcar_completada(self, calificacion=None, notas=""):
         """Método para marcar la rutina como completada"""
+        ya_completada = self.completada
         self.completada = True
         self.fecha_completacion = timezone.now()
         if calificacion:
@@ -525,12 +749,47 @@ class AsignacionRutina(models.Model):
             puntos=50,  # Puntos base por completar rutina
             cristales=10  # Cristales base por completar rutina
         )
+
+        # Avanzar misiones de rutina solo la primera vez que se completa
+        if not ya_completada:
+            from core.misiones import registrar_evento  # Importación local para evitar import circular
+            registrar_evento(self.usuario, 'rutina_completada', rutina=self.rutina)
     
+    @classmethod
+    def asignar_a_segmento(cls, rutina, usuarios, fecha_vencimiento=None, tamano_lote=10000):
+        """Asigna una rutina a todos los usuarios de un queryset con INSERT ... SELECT por lotes"""
+        usuarios = usuarios.order_by()
+        resultado = {'usuarios_en_segmento': usuarios.count(), 'asignaciones_creadas': 0}
+        campos = ['usuario', 'rutina', 'fecha_asignacion', 'fecha_vencimiento', 'completada', 'estado']
+
+        # Lotes por rango de id: cada lote es un único INSERT ... SELECT con anti-join
+        for desde, hasta in rangos_de_ids(usuarios, tamano_lote):
+            seleccion = usuarios.filter(pk__gt=desde, pk__lte=hasta).exclude(
+                asignaciones_rutina__rutina=rutina
+            ).annotate(
+                asignacion_rutina=Value(rutina.pk),
+                asignacion_fecha=Value(timezone.now().date()),
+                asignacion_vencimiento=Value(fecha_vencimiento, output_field=models.DateField()),
+                asignacion_completada=Value(False),
+                asignacion_estado=Value('pendiente'),
+            ).values_list(
+                'pk', 'asignacion_rutina', 'asignacion_fecha',
+                'asignacion_vencimiento', 'asignacion_completada', 'asignacion_estado'
+            )
+            with transaction.atomic():
+                resultado['asignaciones_creadas'] += insertar_desde_seleccion(cls, campos, seleccion)
+
+        resultado['ya_asignados'] = resultado['usuarios_en_segmento'] - resultado['asignaciones_creadas']
+        return resultado
+
     @property
     def esta_vencida(self):
         """Verifica si la asignación está vencida"""
+        if self.estado == 'vencida':
+            return True
+        # Pendiente que venció después de la última ejecución del comando
         if self.fecha_vencimiento and timezone.now().date() > self.fecha_vencimiento:
-            return not self.completada
+            return self.estado == 'pendiente'
         return False
 
 class Rango(models.Model):
@@ -636,6 +895,24 @@ class Mision(models.Model):
         """Retorna una descripción completa del objetivo"""
         return f"{self.objetivo} {self.get_unidad_objetivo_display()}"
 
+    @staticmethod
+    def calcular_periodo(frecuencia, fecha=None):
+        """Retorna el inicio del período de recurrencia que contiene la fecha (None si no aplica)"""
+        fecha = fecha or timezone.now().date()
+        if frecuencia == 'diaria':
+            return fecha
+        if frecuencia == 'semanal':
+            return fecha - timedelta(days=fecha.weekday())
+        if frecuencia == 'mensual':
+            return fecha.replace(day=1)
+        return None
+
+    def periodo_actual(self, fecha=None):
+        """Retorna el período vigente de la misión (None para misiones no recurrentes)"""
+        if not self.es_recurrente:
+            return None
+        return Mision.calcular_periodo(self.frecuencia_recurrencia, fecha)
+
 class ProgresoMision(models.Model):
     usuario = models.ForeignKey(
         Usuario, 
@@ -652,15 +929,78 @@ class ProgresoMision(models.Model):
     fecha_completacion = models.DateTimeField(blank=True, null=True)
     fecha_asignacion = models.DateField(default=timezone.now)
     fecha_actualizacion = models.DateTimeField(default=timezone.now)
+    periodo = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Inicio del período para misiones recurrentes (null = misión única)"
+    )
 
     class Meta:
         db_table = 'progreso_misiones'
         verbose_name = 'Progreso de Misión'
         verbose_name_plural = 'Progresos de Misiones'
-        unique_together = ['usuario', 'mision']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'mision'],
+                condition=Q(periodo__isnull=True),
+                name='progreso_mision_unica'
+            ),
+            models.UniqueConstraint(
+                fields=['usuario', 'mision', 'periodo'],
+                name='progreso_mision_periodo_unico'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.usuario.nombre_usuario} - {self.mision.titulo} ({self.progreso_actual}/{self.mision.objetivo})"
+
+    def save(self, *args, **kwargs):
+        # Las misiones recurrentes llevan progreso por período
+        if self.periodo is None and self.mision.es_recurrente:
+            self.periodo = self.mision.periodo_actual()
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def filtro_periodo_actual(fecha=None):
+        """Q que selecciona el progreso de misiones únicas y del período vigente de las recurrentes"""
+        filtro = Q(periodo__isnull=True)
+        for frecuencia, _ in Mision._meta.get_field('frecuencia_recurrencia').choices:
+            filtro |= Q(
+                mision__frecuencia_recurrencia=frecuencia,
+                periodo=Mision.calcular_periodo(frecuencia, fecha)
+            )
+        return filtro
+
+    @classmethod
+    def abrir_periodo(cls, mision, usuarios, fecha=None, tamano_lote=10000):
+        """Crea por lotes el progreso del período vigente de una misión recurrente"""
+        periodo = mision.periodo_actual(fecha)
+        if periodo is None:
+            return 0
+        ahora = timezone.now()
+        campos = [
+            'usuario', 'mision', 'periodo', 'progreso_actual', 'completada',
+            'fecha_asignacion', 'fecha_actualizacion'
+        ]
+        usuarios = usuarios.order_by()
+        creados = 0
+        for desde, hasta in rangos_de_ids(usuarios, tamano_lote):
+            seleccion = usuarios.filter(pk__gt=desde, pk__lte=hasta).exclude(
+                Exists(cls.objects.filter(usuario=OuterRef('pk'), mision=mision, periodo=periodo))
+            ).annotate(
+                progreso_mision=Value(mision.pk),
+                progreso_periodo=Value(periodo),
+                progreso_inicial=Value(0),
+                progreso_completada=Value(False),
+                progreso_asignacion=Value(ahora.date()),
+                progreso_actualizacion=Value(ahora),
+            ).values_list(
+                'pk', 'progreso_mision', 'progreso_periodo', 'progreso_inicial',
+                'progreso_completada', 'progreso_asignacion', 'progreso_actualizacion'
+            )
+            with transaction.atomic():
+                creados += insertar_desde_seleccion(cls, campos, seleccion)
+        return creados
     
     @property
     def porcentaje_completado(self):
@@ -669,33 +1009,70 @@ class ProgresoMision(models.Model):
             return 0
         return min(100, int((self.progreso_actual / self.mision.objetivo) * 100))
     
-    def actualizar_progreso(self, incremento=1):
-        """Actualiza el progreso de la misión"""
-        if not self.completada:
-            self.progreso_actual += incremento
-            self.fecha_actualizacion = timezone.now()
-            
-            # Verificar si se completó la misión
-            if self.progreso_actual >= self.mision.objetivo:
-                self.completada = True
-                self.fecha_completacion = timezone.now()
-                self.progreso_actual = self.mision.objetivo  # No exceder el objetivo
-                
+    def actualizar_progreso(self, incremento=1, clave_idempotencia=None):
+        """Incrementa el progreso con UPDATEs condicionales; retorna True si esta llamada completó la misión.
+
+        Con clave_idempotencia, un reintento de la misma solicitud no vuelve a sumar
+        ni a pagar la recompensa y retorna el resultado original.
+        """
+        from core.misiones import invalidar_disponibles  # Importación local para evitar import circular
+
+        if incremento < 1:
+            raise ValueError("El incremento debe ser positivo")
+        mision = self.mision
+        with transaction.atomic():
+            if clave_idempotencia:
+                solicitud, es_nueva = SolicitudIdempotente.reservar(
+                    self.usuario, f'progreso_mision:{self.pk}', clave_idempotencia
+                )
+                if not es_nueva:
+                    self.refresh_from_db()
+                    return solicitud.resultado.get('completada', False)
+
+            pendientes = ProgresoMision.objects.filter(pk=self.pk, completada=False)
+            ahora = timezone.now()
+            completo = False
+            # Si un escritor concurrente cambia el progreso entre ambos UPDATE, se reintenta
+            while pendientes.exists():
+                completo = bool(pendientes.filter(
+                    progreso_actual__gte=mision.objetivo - incremento
+                ).update(
+                    progreso_actual=mision.objetivo,
+                    completada=True,
+                    fecha_completacion=ahora,
+                    fecha_actualizacion=ahora
+                ))
+                if completo or pendientes.filter(
+                    progreso_actual__lt=mision.objetivo - incremento
+                ).update(
+                    progreso_actual=F('progreso_actual') + incremento,
+                    fecha_actualizacion=ahora
+                ):
+                    break
+
+            if completo:
                 # Recompensar al usuario
-                self.usuario.puntos_experiencia += self.mision.recompensa_xp
-                self.usuario.cristales_magicos += self.mision.recompensa_cristales
-                self.usuario.save()
-                
-                # Registrar en logs
+                Usuario.objects.filter(pk=self.usuario_id).update(
+                    puntos_experiencia=F('puntos_experiencia') + mision.recompensa_xp,
+                    cristales_magicos=F('cristales_magicos') + mision.recompensa_cristales
+                )
                 LogActividad.registrar_actividad(
                     usuario=self.usuario,
                     tipo_actividad='mision_completada',
-                    descripcion=f"Completó misión: {self.mision.titulo}",
-                    puntos=self.mision.recompensa_xp,
-                    cristales=self.mision.recompensa_cristales
+                    descripcion=f"Completó misión: {mision.titulo}",
+                    puntos=mision.recompensa_xp,
+                    cristales=mision.recompensa_cristales
                 )
-            
-            self.save()
+                usuario_id = self.usuario_id
+                transaction.on_commit(lambda: invalidar_disponibles(usuario_id))
+
+            if clave_idempotencia:
+                solicitud.resultado = {'completada': completo}
+                solicitud.save(update_fields=['resultado'])
+
+        self.refresh_from_db()
+        return completo
+
 
 class Ranking(models.Model):
     TIPO_RANKING_CHOICES = [
@@ -704,6 +1081,8 @@ class Ranking(models.Model):
         ('anual', 'Anual'),
         ('global', 'Global'),
     ]
+    # El ranking global no tiene períodos: todas sus filas usan esta clave fija
+    PERIODO_GLOBAL = datetime(1970, 1, 1).date()
 
     usuario = models.ForeignKey(
         Usuario, 
@@ -716,37 +1095,233 @@ class Ranking(models.Model):
     periodo = models.DateField(help_text="Fecha de inicio del período del ranking")
     fecha_actualizacion = models.DateTimeField(default=timezone.now)
 
+    # Liga: usuarios del mismo rango y nivel físico al calcular el ranking
+    rango = models.ForeignKey(
+        Rango,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='rankings'
+    )
+    nivel_fisico = models.CharField(max_length=50, choices=Usuario.NIVEL_FISICO_CHOICES, default='principiante')
+    posicion_liga = models.IntegerField(default=0, help_text="Posición dentro de la liga (rango + nivel físico)")
+
     class Meta:
         db_table = 'rankings'
         verbose_name = 'Ranking'
         verbose_name_plural = 'Rankings'
         unique_together = ['usuario', 'tipo_ranking', 'periodo']
         ordering = ['tipo_ranking', 'periodo', 'posicion']
+        indexes = [
+            models.Index(fields=['tipo_ranking', 'periodo', 'posicion'], name='ranking_tablero_idx'),
+            models.Index(
+                fields=['tipo_ranking', 'periodo', 'rango', 'nivel_fisico', 'posicion_liga'],
+                name='ranking_liga_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.usuario.nombre_usuario} - {self.tipo_ranking} - Pos {self.posicion}"
 
+    @staticmethod
+    def calcular_periodo(tipo_ranking, fecha=None):
+        """Retorna el inicio del período del ranking que contiene la fecha (None para el global)"""
+        fecha = fecha or timezone.now().date()
+        if tipo_ranking == 'semanal':
+            return fecha - timedelta(days=fecha.weekday())
+        if tipo_ranking == 'mensual':
+            return fecha.replace(day=1)
+        if tipo_ranking == 'anual':
+            return fecha.replace(month=1, day=1)
+        return None
+
+    @classmethod
+    def periodo_vigente(cls, tipo_ranking, fecha=None):
+        """Clave del período vigente: el inicio del período o PERIODO_GLOBAL para el global"""
+        return cls.calcular_periodo(tipo_ranking, fecha) or cls.PERIODO_GLOBAL
+
+    @classmethod
+    def periodos_cerrados(cls, tipo_ranking, fecha=None):
+        """Períodos con detalle anteriores al vigente, del más antiguo al más reciente"""
+        vigente = cls.calcular_periodo(tipo_ranking, fecha)
+        if vigente is None:
+            return []
+        return list(
+            cls.objects.filter(tipo_ranking=tipo_ranking, periodo__lt=vigente)
+            .order_by('periodo').values_list('periodo', flat=True).distinct()
+        )
+
+    @classmethod
+    def compactar(cls, tipo_ranking, hasta, tamano_lote=5000):
+        """Borra por lotes el detalle de los períodos anteriores a `hasta` que ya tienen snapshot"""
+        detalle = cls.objects.filter(
+            tipo_ranking=tipo_ranking, periodo__lt=hasta
+        ).filter(
+            Exists(RankingHistorico.objects.filter(
+                tipo_ranking=OuterRef('tipo_ranking'), periodo=OuterRef('periodo')
+            ))
+        )
+        borrados = 0
+        for desde, hasta_id in rangos_de_ids(detalle, tamano_lote):
+            with transaction.atomic():
+                borrados += detalle.filter(pk__gt=desde, pk__lte=hasta_id).delete()[0]
+        return borrados
+
+    @staticmethod
+    def fin_periodo(tipo_ranking, periodo):
+        """Retorna el inicio del período siguiente (None para el global)"""
+        if tipo_ranking == 'semanal':
+            return periodo + timedelta(days=7)
+        if tipo_ranking == 'mensual':
+            return (periodo.replace(day=28) + timedelta(days=4)).replace(day=1)
+        if tipo_ranking == 'anual':
+            return periodo.replace(year=periodo.year + 1)
+        return None
+
     @classmethod
-    def actualizar_ranking(cls, tipo_ranking, periodo):
-        """Actualiza las posiciones del ranking para un período específico"""
-        # Obtener todos los usuarios con sus puntuaciones
+    def actualizar_ranking(cls, tipo_ranking, periodo, tamano_lote=5000):
+        """Recalcula en una sola consulta el ranking general y el de cada liga de un período.
+
+        Las posiciones se obtienen con funciones de ventana: ROW_NUMBER() sobre todos los
+        usuarios y ROW_NUMBER() PARTITION BY (rango_actual, nivel_fisico_actual) para las ligas.
+        """
+        filtro_logs = None
+        fin = cls.fin_periodo(tipo_ranking, periodo)
+        if fin is not None:
+            filtro_logs = Q(
+                logs_actividad__fecha_actividad__gte=timezone.make_aware(datetime.combine(periodo, datetime.min.time())),
+                logs_actividad__fecha_actividad__lt=timezone.make_aware(datetime.combine(fin, datetime.min.time()))
+            )
+        orden = [F('puntuacion_total').desc(), F('pk').asc()]
         usuarios = Usuario.objects.filter(tipo_usuario='usuario_final').annotate(
-            puntuacion_total=models.Sum('logs_actividad__puntos_ganados')
-        ).order_by('-puntuacion_total')
-        
-        # Actualizar o crear registros de ranking
-        for posicion, usuario in enumerate(usuarios, 1):
-            if usuario.puntuacion_total:  # Solo usuarios con puntuación
-                cls.objects.update_or_create(
-                    usuario=usuario,
-                    tipo_ranking=tipo_ranking,
-                    periodo=periodo,
-                    defaults={
-                        'posicion': posicion,
-                        'puntuacion': usuario.puntuacion_total or 0
-                    }
+            puntuacion_total=Sum('logs_actividad__puntos_ganados', filter=filtro_logs)
+        ).filter(
+            puntuacion_total__gt=0  # Solo usuarios con puntuación
+        ).annotate(
+            posicion=Window(RowNumber(), order_by=orden),
+            posicion_liga=Window(
+                RowNumber(), partition_by=[F('rango_actual'), F('nivel_fisico_actual')], order_by=orden
+            ),
+        ).values_list(
+            'pk', 'rango_actual_id', 'nivel_fisico_actual', 'puntuacion_total', 'posicion', 'posicion_liga'
+        )
+
+        ahora = timezone.now()
+        campos_actualizables = [
+            'posicion', 'puntuacion', 'rango', 'nivel_fisico', 'posicion_liga', 'fecha_actualizacion'
+        ]
+        with transaction.atomic():
+            lote = []
+            for usuario_id, rango_id, nivel, puntuacion, posicion, posicion_liga in usuarios.iterator(tamano_lote):
+                lote.append(cls(
+                    usuario_id=usuario_id, tipo_ranking=tipo_ranking, periodo=periodo,
+                    posicion=posicion, puntuacion=puntuacion, rango_id=rango_id,
+                    nivel_fisico=nivel, posicion_liga=posicion_liga, fecha_actualizacion=ahora
+                ))
+                if len(lote) >= tamano_lote:
+                    cls.objects.bulk_create(
+                        lote, update_conflicts=True, update_fields=campos_actualizables,
+                        unique_fields=['usuario', 'tipo_ranking', 'periodo']
+                    )
+                    lote = []
+            if lote:
+                cls.objects.bulk_create(
+                    lote, update_conflicts=True, update_fields=campos_actualizables,
+                    unique_fields=['usuario', 'tipo_ranking', 'periodo']
                 )
 
+            # Quitar a quienes ya no puntúan; en el global también las filas de claves de período antiguas
+            obsoletos = cls.objects.filter(tipo_ranking=tipo_ranking, fecha_actualizacion__lt=ahora)
+            if fin is not None:
+                obsoletos = obsoletos.filter(periodo=periodo)
+            obsoletos.delete()
+
+class RankingHistorico(models.Model):
+    """Snapshot compacto de un período de ranking cerrado: top N e histograma de puntuaciones"""
+    TOP_POR_DEFECTO = 100
+    CUBETAS_HISTOGRAMA = 20
+
+    tipo_ranking = models.CharField(max_length=100, choices=Ranking.TIPO_RANKING_CHOICES)
+    periodo = models.DateField(help_text="Fecha de inicio del período cerrado")
+    total_participantes = models.IntegerField(default=0)
+    puntuacion_maxima = models.IntegerField(default=0)
+    puntuacion_media = models.FloatField(default=0)
+    top = models.JSONField(
+        default=list,
+        help_text="[{posicion, usuario, usuario_nombre, puntuacion}] ordenado por posición"
+    )
+    histograma = models.JSONField(
+        default=dict,
+        help_text="{limites: [...], conteos: [...]} de las puntuaciones del período"
+    )
+    fecha_cierre = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'rankings_historicos'
+        verbose_name = 'Ranking Histórico'
+        verbose_name_plural = 'Rankings Históricos'
+        ordering = ['tipo_ranking', '-periodo']
+        constraints = [
+            models.UniqueConstraint(fields=['tipo_ranking', 'periodo'], name='ranking_historico_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo_ranking} - {self.periodo} ({self.total_participantes} participantes)"
+
+    @classmethod
+    def congelar(cls, tipo_ranking, periodo, top_n=TOP_POR_DEFECTO):
+        """Crea (o reemplaza) el snapshot de un período a partir del detalle de Ranking"""
+        detalle = Ranking.objects.filter(tipo_ranking=tipo_ranking, periodo=periodo)
+        puntuaciones = np.fromiter(detalle.values_list('puntuacion', flat=True), dtype=np.int64)
+        top = [
+            {
+                'posicion': posicion,
+                'usuario': usuario_id,
+                'usuario_nombre': nombre,
+                'puntuacion': puntuacion,
+            }
+            for posicion, usuario_id, nombre, puntuacion in detalle.order_by('posicion').values_list(
+                'posicion', 'usuario_id', 'usuario__nombre_usuario', 'puntuacion'
+            )[:top_n]
+        ]
+        histograma = {'limites': [], 'conteos': []}
+        if len(puntuaciones):
+            conteos, limites = np.histogram(puntuaciones, bins=cls.CUBETAS_HISTOGRAMA)
+            histograma = {'limites': limites.round(2).tolist(), 'conteos': conteos.tolist()}
+
+        snapshot, _ = cls.objects.update_or_create(
+            tipo_ranking=tipo_ranking,
+            periodo=periodo,
+            defaults={
+                'total_participantes': len(puntuaciones),
+                'puntuacion_maxima': int(puntuaciones.max()) if len(puntuaciones) else 0,
+                'puntuacion_media': float(puntuaciones.mean()) if len(puntuaciones) else 0,
+                'top': top,
+                'histograma': histograma,
+                'fecha_cierre': timezone.now(),
+            }
+        )
+        return snapshot
+
+    def pagina(self, desde=0, limite=20):
+        """Retorna una página del tablero congelado"""
+        return self.top[desde:desde + limite]
+
+    def percentil(self, puntuacion):
+        """Estima el percentil de una puntuación a partir del histograma"""
+        limites, conteos = self.histograma.get('limites'), self.histograma.get('conteos')
+        if not conteos or not self.total_participantes:
+            return None
+        por_debajo = 0
+        for i, conteo in enumerate(conteos):
+            inferior, superior = limites[i], limites[i + 1]
+            if puntuacion >= superior:
+                por_debajo += conteo
+            elif puntuacion > inferior:
+                por_debajo += conteo * (puntuacion - inferior) / (superior - inferior)
+        return round(100 * por_debajo / self.total_participantes, 1)
+
+
 class CartaEjercicio(models.Model):
     RAREZA_CHOICES = [
         ('comun', 'Común'),
@@ -771,6 +1346,12 @@ class CartaEjercicio(models.Model):
     precio_cristales = models.IntegerField(help_text="Precio en cristales mágicos")
     esta_activa = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(default=timezone.now)
+    poder_total = models.GeneratedField(
+        expression=F('atributo_fuerza') + F('atributo_resistencia') + F('atributo_flexibilidad'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+        help_text="Suma de los atributos, calculada por la base de datos"
+    )
 
     class Meta:
         db_table = 'cartas_ejercicio'
@@ -780,11 +1361,6 @@ class CartaEjercicio(models.Model):
     def __str__(self):
         return f"{self.nombre} ({self.get_rareza_display()})"
     
-    @property
-    def poder_total(self):
-        """Calcula el poder total de la carta"""
-        return self.atributo_fuerza + self.atributo_resistencia + self.atributo_flexibilidad
-    
     @property
     def color_rareza(self):
         """Retorna el color asociado a la rareza"""
@@ -827,6 +1403,47 @@ class ColeccionCarta(models.Model):
         self.cantidad += cantidad
         self.save()
     
+    @classmethod
+    def calcular_resumen(cls, usuario):
+        """Completitud por rareza, duplicados y poder total de la colección con dos consultas agrupadas"""
+        totales = dict(
+            CartaEjercicio.objects.filter(esta_activa=True).values('rareza')
+            .annotate(total=models.Count('id')).values_list('rareza', 'total')
+        )
+        propias = {
+            fila['carta__rareza']: fila
+            for fila in cls.objects.filter(usuario=usuario).values('carta__rareza').annotate(
+                distintas=models.Count('id'),
+                obtenidas=models.Count('id', filter=Q(carta__esta_activa=True)),
+                copias=Coalesce(Sum('cantidad'), 0),
+                poder=Coalesce(Sum('carta__poder_total'), 0),
+            )
+        }
+
+        por_rareza = []
+        for rareza, _ in CartaEjercicio.RAREZA_CHOICES:
+            total = totales.get(rareza, 0)
+            fila = propias.get(rareza, {'distintas': 0, 'obtenidas': 0, 'copias': 0, 'poder': 0})
+            por_rareza.append({
+                'rareza': rareza,
+                'total': total,
+                'obtenidas': fila['obtenidas'],
+                'duplicados': fila['copias'] - fila['distintas'],
+                'poder_total': fila['poder'],
+                'porcentaje_completado': round(100 * fila['obtenidas'] / total, 1) if total else 0.0,
+            })
+
+        total = sum(fila['total'] for fila in por_rareza)
+        obtenidas = sum(fila['obtenidas'] for fila in por_rareza)
+        return {
+            'total_cartas': total,
+            'cartas_obtenidas': obtenidas,
+            'porcentaje_completado': round(100 * obtenidas / total, 1) if total else 0.0,
+            'duplicados': sum(fila['duplicados'] for fila in por_rareza),
+            'poder_total': sum(fila['poder_total'] for fila in por_rareza),
+            'por_rareza': por_rareza,
+        }
+
     @classmethod
     def obtener_cartas_usuario(cls, usuario):
         """Obtiene todas las cartas de un usuario con información de la carta"""
@@ -876,6 +1493,14 @@ class ItemColeccionable(models.Model):
     def __str__(self):
         return f"{self.nombre} ({self.get_tipo_item_display()})"
     
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # El tipo está denormalizado en el inventario; al cambiar de slot se desequipa
+            self.en_inventarios.exclude(tipo_item=self.tipo_item).update(
+                tipo_item=self.tipo_item, esta_equipado=False
+            )
+
     @property
     def es_permanente(self):
         """Verifica si el item es permanente"""
@@ -897,6 +1522,11 @@ class InventarioUsuario(models.Model):
         on_delete=models.CASCADE,
         related_name='en_inventarios'
     )
+    tipo_item = models.CharField(
+        max_length=100,
+        choices=ItemColeccionable.TIPO_ITEM_CHOICES,
+        help_text="Copia de item.tipo_item: define el slot de equipamiento"
+    )
     fecha_obtencion = models.DateTimeField(default=timezone.now)
     fecha_expiracion = models.DateTimeField(blank=True, null=True)
     esta_equipado = models.BooleanField(default=False)
@@ -911,9 +1541,29 @@ class InventarioUsuario(models.Model):
         verbose_name = 'Inventario de Usuario'
         verbose_name_plural = "Inventarios de Usuario"
         unique_together = ['usuario', 'item']
+        indexes = [
+            models.Index(
+                fields=['fecha_expiracion'],
+                condition=Q(esta_activo=True, fecha_expiracion__isnull=False),
+                name='inv_activos_expiracion_idx'
+            ),
+        ]
+        constraints = [
+            # Un solo item equipado por slot (tipo de item)
+            models.UniqueConstraint(
+                fields=['usuario', 'tipo_item'],
+                condition=Q(esta_equipado=True),
+                name='inventario_slot_equipado_unico'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.usuario.nombre_usuario} - {self.item.nombre}"
+
+    def save(self, *args, **kwargs):
+        if not self.tipo_item:
+            self.tipo_item = self.item.tipo_item
+        super().save(*args, **kwargs)
     
     @property
     def ha_expirado(self):
@@ -928,25 +1578,50 @@ class InventarioUsuario(models.Model):
         return self.esta_activo and not self.ha_expirado and self.usos_restantes > 0
     
     def equipar(self):
-        """Equipa el item para el usuario"""
-        # Desequipar otros items del mismo tipo
-        items_mismo_tipo = InventarioUsuario.objects.filter(
-            usuario=self.usuario,
-            item__tipo_item=self.item.tipo_item,
-            esta_equipado=True
-        ).exclude(id=self.id)
-        
-        items_mismo_tipo.update(esta_equipado=False)
-        
-        # Equipar este item
-        self.esta_equipado = True
-        self.save()
-    
+        """Equipa el item para el usuario, desequipando el que ocupaba su slot"""
+        InventarioUsuario.equipar_conjunto(self.usuario, [self.pk])
+        self.refresh_from_db()
+
     def desequipar(self):
         """Desequipa el item"""
+        InventarioUsuario.objects.filter(pk=self.pk).update(esta_equipado=False)
         self.esta_equipado = False
-        self.save()
-    
+
+    @classmethod
+    def equipar_conjunto(cls, usuario, inventario_ids):
+        """Equipa varios items a la vez (uno por slot) con un número fijo de consultas.
+
+        Bloquea los slots afectados del usuario, desequipa lo que los ocupaba y equipa
+        los nuevos en dos UPDATE. Lanza ValueError si algún item no es del usuario, no
+        es usable o si dos items comparten slot. Retorna los items equipados.
+        """
+        inventario_ids = set(inventario_ids)
+        ahora = timezone.now()
+        with transaction.atomic():
+            objetivos = list(
+                cls.objects.filter(usuario=usuario, pk__in=inventario_ids).filter(
+                    Q(fecha_expiracion__isnull=True) | Q(fecha_expiracion__gt=ahora),
+                    esta_activo=True, usos_restantes__gt=0
+                ).values_list('pk', 'tipo_item')
+            )
+            if len(objetivos) != len(inventario_ids):
+                raise ValueError("Algunos items no existen en tu inventario o no se pueden equipar")
+            slots = [tipo_item for _, tipo_item in objetivos]
+            if len(set(slots)) != len(slots):
+                raise ValueError("Solo se puede equipar un item por tipo")
+
+            # Bloquear los slots en orden fijo para serializar equipamientos concurrentes
+            list(
+                cls.objects.select_for_update().filter(usuario=usuario, tipo_item__in=slots)
+                .order_by('pk').values_list('pk', flat=True)
+            )
+            cls.objects.filter(
+                usuario=usuario, tipo_item__in=slots, esta_equipado=True
+            ).exclude(pk__in=inventario_ids).update(esta_equipado=False)
+            cls.objects.filter(pk__in=inventario_ids, esta_equipado=False).update(esta_equipado=True)
+
+        return cls.objects.filter(pk__in=inventario_ids).select_related('item')
+
     def usar(self):
         """Usa el item (para consumibles)"""
         if self.es_usable and self.item.tipo_item == 'consumible':
@@ -957,6 +1632,94 @@ class InventarioUsuario(models.Model):
             return True
         return False
     
+    @classmethod
+    def comprar(cls, usuario, item, clave_idempotencia=None):
+        """Compra un item en una sola transacción; retorna (inventario, es_nueva).
+
+        Debita los cristales con un UPDATE condicional, crea (o renueva) la fila del
+        inventario y registra el gasto. Un reintento con la misma clave_idempotencia
+        retorna la compra original sin volver a cobrar. Lanza ValueError si el item no
+        está a la venta, ya se posee o el saldo no alcanza.
+        """
+        if not item.puede_comprar:
+            raise ValueError("El item no está disponible para compra")
+
+        with transaction.atomic():
+            if clave_idempotencia:
+                solicitud, es_nueva = SolicitudIdempotente.reservar(
+                    usuario, 'compra_item', clave_idempotencia
+                )
+                if not es_nueva:
+                    return cls.objects.get(pk=solicitud.resultado['inventario']), False
+
+            existente = cls.objects.select_for_update().filter(usuario=usuario, item=item).first()
+            if existente and existente.es_usable and item.tipo_item != 'consumible':
+                raise ValueError("Ya tienes este item")
+
+            # Débito condicional: nunca deja el saldo en negativo
+            debitado = Usuario.objects.filter(
+                pk=usuario.pk, cristales_magicos__gte=item.precio_cristales
+            ).update(cristales_magicos=F('cristales_magicos') - item.precio_cristales)
+            if not debitado:
+                raise ValueError("Cristales insuficientes")
+
+            ahora = timezone.now()
+            fecha_expiracion = ahora + timedelta(days=item.duracion_dias) if item.duracion_dias else None
+            if existente is None:
+                try:
+                    with transaction.atomic():
+                        inventario = cls.objects.create(
+                            usuario=usuario, item=item, tipo_item=item.tipo_item,
+                            fecha_obtencion=ahora, fecha_expiracion=fecha_expiracion
+                        )
+                except IntegrityError:
+                    # Una compra concurrente del mismo item creó la fila primero: un consumible
+                    # suma un uso sobre ella, cualquier otro item ya se posee
+                    if item.tipo_item != 'consumible':
+                        raise ValueError("Ya tienes este item")
+                    existente = cls.objects.select_for_update().get(usuario=usuario, item=item)
+            if existente:
+                # Renovar el item expirado o sumar un uso al consumible
+                if item.tipo_item == 'consumible' and existente.es_usable:
+                    existente.usos_restantes = F('usos_restantes') + 1
+                else:
+                    existente.usos_restantes = 1
+                    existente.fecha_obtencion = ahora
+                existente.fecha_expiracion = fecha_expiracion
+                existente.esta_activo = True
+                existente.save()
+                existente.refresh_from_db()
+                inventario = existente
+
+            LogActividad.objects.create(
+                usuario=usuario,
+                tipo_actividad='otro',
+                descripcion=f"Compró item: {item.nombre}",
+                cristales_ganados=-item.precio_cristales
+            )
+
+            if clave_idempotencia:
+                solicitud.resultado = {'inventario': inventario.pk}
+                solicitud.save(update_fields=['resultado'])
+
+        usuario.cristales_magicos -= item.precio_cristales
+        return inventario, True
+
+    @classmethod
+    def desactivar_expirados(cls, ahora=None, tamano_lote=5000):
+        """Desactiva y desequipa por lotes los items expirados; retorna cuántos se desactivaron"""
+        ahora = ahora or timezone.now()
+        expirados = cls.objects.filter(esta_activo=True, fecha_expiracion__lte=ahora)
+        total = 0
+        while True:
+            with transaction.atomic():
+                lote = cls.objects.filter(
+                    pk__in=Subquery(expirados.order_by('fecha_expiracion').values('pk')[:tamano_lote])
+                ).update(esta_activo=False, esta_equipado=False)
+            total += lote
+            if lote < tamano_lote:
+                return total
+
     @classmethod
     def obtener_items_equipados(cls, usuario):
         """Obtiene todos los items equipados por un usuario"""
@@ -983,6 +1746,12 @@ class ModeloIA(models.Model):
     tipo_ejercicio = models.CharField(max_length=100, choices=TIPO_EJERCICIO_CHOICES)
     version = models.CharField(max_length=50)
     puntos_referencia = models.JSONField(help_text="Puntos corporales de referencia en formato JSON")
+    puntos_referencia_binarios = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Puntos de referencia empaquetados (ver core.posturas)"
+    )
     angulos_ideales = models.JSONField(help_text="Ángulos ideales para la postura en formato JSON")
     umbral_precision = models.DecimalField(
         max_digits=5, 
@@ -1010,6 +1779,22 @@ class ModeloIA(models.Model):
 
     def __str__(self):
         return f"{self.nombre_modelo} v{self.version} - {self.get_tipo_ejercicio_display()}"
+
+    def save(self, *args, **kwargs):
+        # Los puntos nuevos en JSON reemplazan a los empaquetados (y se empaquetan si corresponde)
+        if self.puntos_referencia:
+            self.puntos_referencia_binarios = empaquetar_si_corresponde(self.puntos_referencia)
+            if self.puntos_referencia_binarios is not None:
+                self.puntos_referencia = []
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'puntos_referencia', 'puntos_referencia_binarios'}
+        super().save(*args, **kwargs)
+
+    def obtener_puntos_referencia(self):
+        """Puntos de referencia en su representación JSON, estén o no empaquetados"""
+        if not self.puntos_referencia and self.puntos_referencia_binarios is not None:
+            return puntos_a_json(self.puntos_referencia_binarios)
+        return self.puntos_referencia
     
     @property
     def esta_disponible(self):
@@ -1018,13 +1803,15 @@ class ModeloIA(models.Model):
     
     @classmethod
     def obtener_modelo_activo(cls, tipo_ejercicio):
-        """Obtiene el modelo activo más reciente para un tipo de ejercicio"""
-        return cls.objects.filter(
-            tipo_ejercicio=tipo_ejercicio,
-            esta_activo=True
-        ).order_by('-version').first()
+        """Obtiene el modelo activo más reciente (por versión semántica) para un tipo de ejercicio"""
+        from core.modelos_ia import modelo_activo  # Importación local para evitar import circular
+        compilado = modelo_activo(tipo_ejercicio)
+        return cls.objects.filter(pk=compilado.id).first() if compilado else None
 
 class DeteccionPostura(models.Model):
+    # Máximo de detecciones por lote (ver registrar_lote)
+    TAMANO_MAXIMO_LOTE = 200
+
     ejercicio = models.ForeignKey(
         'Ejercicio',
         on_delete=models.CASCADE,
@@ -1042,6 +1829,12 @@ class DeteccionPostura(models.Model):
     )
     fecha_deteccion = models.DateTimeField(default=timezone.now)
     puntos_corporales_detectados = models.JSONField(help_text="Puntos corporales detectados en formato JSON")
+    puntos_binarios = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Puntos corporales empaquetados (ver core.posturas)"
+    )
     precision_deteccion = models.DecimalField(
         max_digits=5,
         decimal_places=2,
@@ -1084,10 +1877,73 @@ class DeteccionPostura(models.Model):
     def __str__(self):
         return f"{self.usuario.nombre_usuario} - {self.ejercicio.nombre} - {self.fecha_deteccion.strftime('%Y-%m-%d %H:%M')}"
 
+    def save(self, *args, **kwargs):
+        if self.empaquetar_puntos_json() and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'puntos_corporales_detectados', 'puntos_binarios'}
+        super().save(*args, **kwargs)
+
+    def empaquetar_puntos_json(self):
+        """Los puntos nuevos en JSON reemplazan a los empaquetados (y se empaquetan si corresponde)"""
+        if not self.puntos_corporales_detectados:
+            return False
+        self.puntos_binarios = empaquetar_si_corresponde(self.puntos_corporales_detectados)
+        if self.puntos_binarios is not None:
+            self.puntos_corporales_detectados = []
+        return True
+
+    def obtener_puntos(self):
+        """Puntos detectados en su representación JSON, estén o no empaquetados"""
+        if not self.puntos_corporales_detectados and self.puntos_binarios is not None:
+            return puntos_a_json(self.puntos_binarios)
+        return self.puntos_corporales_detectados
+
+    def arreglo_puntos(self):
+        """Puntos detectados como arreglo (frames, 17, 3); el binario float32 se lee sin copiar"""
+        if not self.puntos_corporales_detectados and self.puntos_binarios is not None:
+            return a_arreglo(self.puntos_binarios)
+        return a_arreglo(self.puntos_corporales_detectados)
+
+    @classmethod
+    def empaquetar_existentes(cls, tipo='float32', tamano_lote=1000):
+        """Convierte por lotes los puntos guardados en JSON al formato binario.
+
+        Las filas cuyos puntos no tienen forma de frames se dejan en JSON. Retorna
+        (filas convertidas, bytes en JSON, bytes empaquetados).
+        """
+        pendientes = cls.objects.filter(puntos_binarios__isnull=True)
+        convertidas = bytes_json = bytes_binarios = 0
+        for desde, hasta in rangos_de_ids(pendientes, tamano_lote):
+            with transaction.atomic():
+                filas = pendientes.select_for_update().filter(
+                    pk__gt=desde, pk__lte=hasta
+                ).values_list('pk', 'puntos_corporales_detectados')
+                lote = []
+                for pk, puntos in filas:
+                    try:
+                        datos = empaquetar_puntos(puntos, tipo)
+                    except ValueError:
+                        continue
+                    bytes_json += len(json.dumps(puntos))
+                    bytes_binarios += len(datos)
+                    lote.append(cls(pk=pk, puntos_binarios=datos, puntos_corporales_detectados=[]))
+                cls.objects.bulk_update(lote, ['puntos_binarios', 'puntos_corporales_detectados'])
+            convertidas += len(lote)
+        return convertidas, bytes_json, bytes_binarios
+
+    def modelo_compilado(self):
+        """Modelo compilado del registro, consultado una vez por instancia (o None)"""
+        if getattr(self, '_modelo_compilado_id', None) != self.modelo_ia_id:
+            from core.modelos_ia import modelo_compilado  # Importación local para evitar import circular
+            self._modelo_compilado = modelo_compilado(self.modelo_ia_id)
+            self._modelo_compilado_id = self.modelo_ia_id
+        return self._modelo_compilado
+
     @property
     def es_confiable(self):
         """Verifica si la detección es confiable"""
-        return Decimal(self.precision_deteccion) >= Decimal(self.modelo_ia.umbral_precision)
+        modelo = self.modelo_compilado()
+        umbral = modelo.umbral_precision if modelo else self.modelo_ia.umbral_precision
+        return Decimal(self.precision_deteccion) >= Decimal(str(umbral))
 
     @property
     def nivel_calificacion(self):
@@ -1113,11 +1969,33 @@ class DeteccionPostura(models.Model):
         else:
             return 5  # Recompensa mínima por intento
 
+    def evaluar_postura(self):
+        """Calcula en el servidor la puntuación técnica y la precisión a partir de los puntos detectados"""
+        modelo = self.modelo_compilado()
+        if modelo:
+            objetivos, umbral = modelo.objetivos, modelo.umbral_precision
+        else:
+            objetivos, umbral = self.modelo_ia.angulos_ideales, self.modelo_ia.umbral_precision
+        resultado = puntuar_postura(self.arreglo_puntos(), objetivos, umbral)
+        self.puntuacion_tecnica = resultado['puntuacion_tecnica']
+        self.precision_deteccion = Decimal(str(resultado['precision_deteccion']))
+        self.metadata_analisis = {
+            **(self.metadata_analisis if isinstance(self.metadata_analisis, dict) else {}),
+            'frames': resultado['frames'],
+            'angulos': resultado['angulos'],
+        }
+        return resultado
+
+    @property
+    def recompensa_cristales(self):
+        """Cristales por la detección: 1-5 según la puntuación"""
+        return max(1, self.puntuacion_tecnica // 20)
+
     def procesar_recompensas(self):
         """Procesa las recompensas por la detección exitosa"""
         if self.es_confiable:
             puntos = self.recompensa_puntos
-            cristales = max(1, self.puntuacion_tecnica // 20)  # 1-5 cristales
+            cristales = self.recompensa_cristales
 
             # Actualizar usuario
             self.usuario.puntos_experiencia += puntos
@@ -1137,6 +2015,63 @@ class DeteccionPostura(models.Model):
             return puntos, cristales
         return 0, 0
 
+    @classmethod
+    def registrar_lote(cls, usuario, detecciones, evaluar=True):
+        """Evalúa y guarda varias detecciones de una serie con un solo INSERT.
+
+        Las recompensas de las detecciones confiables se otorgan juntas: una actualización del
+        usuario y un registro de actividad por lote. Con evaluar=False se guardan las puntuaciones
+        ya calculadas. Retorna (detecciones, puntos, cristales); lanza ValueError si alguna
+        detección no se puede evaluar.
+        """
+        if not detecciones:
+            raise ValueError("El lote no contiene detecciones")
+        if len(detecciones) > cls.TAMANO_MAXIMO_LOTE:
+            raise ValueError(f"El lote admite como máximo {cls.TAMANO_MAXIMO_LOTE} detecciones")
+
+        from core.modelos_ia import obtener_registro  # Importación local para evitar import circular
+        # Un solo acceso al registro para todo el lote (cada acceso consulta la versión compartida)
+        modelos = obtener_registro().modelos
+        for numero, deteccion in enumerate(detecciones, start=1):
+            deteccion.usuario = usuario
+            deteccion._modelo_compilado = modelos.get(deteccion.modelo_ia_id)
+            deteccion._modelo_compilado_id = deteccion.modelo_ia_id
+            # Empaquetar primero permite evaluar sobre el binario sin convertir el JSON dos veces
+            deteccion.empaquetar_puntos_json()
+            if not evaluar:
+                continue
+            try:
+                deteccion.evaluar_postura()
+            except ValueError as e:
+                raise ValueError(f"Detección {numero}: {e}")
+
+        confiables = [deteccion for deteccion in detecciones if deteccion.es_confiable]
+        puntos = sum(deteccion.recompensa_puntos for deteccion in confiables)
+        cristales = sum(deteccion.recompensa_cristales for deteccion in confiables)
+
+        with transaction.atomic():
+            cls.objects.bulk_create(detecciones)
+            TendenciaTecnica.registrar(detecciones)
+            if confiables:
+                Usuario.objects.filter(pk=usuario.pk).update(
+                    puntos_experiencia=F('puntos_experiencia') + puntos,
+                    cristales_magicos=F('cristales_magicos') + cristales
+                )
+                usuario.puntos_experiencia += puntos
+                usuario.cristales_magicos += cristales
+                media = sum(deteccion.puntuacion_tecnica for deteccion in confiables) / len(confiables)
+                LogActividad.registrar_actividad(
+                    usuario=usuario,
+                    tipo_actividad='ejercicio',
+                    descripcion=(
+                        f"Serie con IA: {len(detecciones)} detecciones ({len(confiables)} confiables) - "
+                        f"Puntuación media: {media:.0f}"
+                    ),
+                    puntos=puntos,
+                    cristales=cristales
+                )
+        return detecciones, puntos, cristales
+
 class RetroalimentacionEjecucion(models.Model):
     TIPO_CORRECCION_CHOICES = [
         ('postura', 'Postura Corporal'),
@@ -1221,4 +2156,327 @@ class RetroalimentacionEjecucion(models.Model):
                 descripcion=f"Corrigió: {self.tipo_correccion}",
                 puntos=15,
                 cristales=5
-            )
\ No newline at end of file
+            )
+
+class TrabajoAnalisisVideo(models.Model):
+    """Video pendiente de analizar por el worker (ver core.analisis_video)"""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='trabajos_analisis_video'
+    )
+    ejercicio = models.ForeignKey(
+        Ejercicio,
+        on_delete=models.CASCADE,
+        related_name='trabajos_analisis_video'
+    )
+    modelo_ia = models.ForeignKey(
+        ModeloIA,
+        on_delete=models.CASCADE,
+        related_name='trabajos_analisis_video'
+    )
+    archivo = models.FileField(
+        upload_to='analisis_video/%Y/%m/',
+        help_text="Puntos clave por frame del video (.npy, .pst o .json)"
+    )
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.IntegerField(default=0)
+    max_intentos = models.IntegerField(default=3)
+    error = models.TextField(blank=True, null=True)
+    trabajador = models.CharField(max_length=100, blank=True, null=True)
+    resultado = models.JSONField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    disponible_desde = models.DateTimeField(default=timezone.now, help_text="No se reclama antes (reintentos)")
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    espera_segundos = models.DecimalField(
+        max_digits=10,
+        decimal_places=3,
+        blank=True,
+        null=True,
+        help_text="Tiempo en cola antes del último intento"
+    )
+    analisis_segundos = models.DecimalField(
+        max_digits=10,
+        decimal_places=3,
+        blank=True,
+        null=True,
+        help_text="Duración del análisis del último intento"
+    )
+
+    class Meta:
+        db_table = 'trabajos_analisis_video'
+        verbose_name = 'Trabajo de Análisis de Video'
+        verbose_name_plural = 'Trabajos de Análisis de Video'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # Cola: solo los trabajos que el worker puede reclamar
+            models.Index(
+                fields=['disponible_desde'],
+                name='trabajo_video_cola_idx',
+                condition=Q(estado__in=['pendiente', 'procesando'])
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario.nombre_usuario} - {self.ejercicio.nombre} - {self.estado}"
+
+    @classmethod
+    def reclamar(cls, trabajador, cantidad=1, tiempo_maximo=timedelta(minutes=15)):
+        """Reclama hasta `cantidad` trabajos con SELECT ... FOR UPDATE SKIP LOCKED.
+
+        Incluye los trabajos 'procesando' de un worker que no terminó en `tiempo_maximo` si les
+        quedan intentos; los que ya no tienen intentos se marcan 'fallido'. Retorna los trabajos
+        reclamados, ya marcados como 'procesando'.
+        """
+        ahora = timezone.now()
+        vencimiento = ahora - tiempo_maximo
+        with transaction.atomic():
+            cls.objects.filter(
+                estado='procesando', fecha_inicio__lt=vencimiento, intentos__gte=F('max_intentos')
+            ).update(
+                estado='fallido',
+                fecha_fin=ahora,
+                error=f"El último intento no terminó en {tiempo_maximo} y no quedan intentos"
+            )
+            trabajos = list(
+                cls.objects.select_for_update(skip_locked=True).filter(
+                    Q(estado='pendiente', disponible_desde__lte=ahora)
+                    | Q(estado='procesando', fecha_inicio__lt=vencimiento, intentos__lt=F('max_intentos'))
+                ).order_by('disponible_desde')[:cantidad]
+            )
+            for trabajo in trabajos:
+                # La espera cuenta desde que el trabajo volvió a estar disponible: al encolarse, al
+                # programarse el reintento o al vencer el intento anterior
+                if trabajo.estado == 'procesando':
+                    disponible = trabajo.fecha_inicio + tiempo_maximo
+                else:
+                    disponible = trabajo.disponible_desde
+                trabajo.estado = 'procesando'
+                trabajo.trabajador = trabajador
+                trabajo.intentos += 1
+                trabajo.espera_segundos = Decimal(str(round(max((ahora - disponible).total_seconds(), 0), 3)))
+                trabajo.fecha_inicio = ahora
+            cls.objects.bulk_update(
+                trabajos, ['estado', 'trabajador', 'intentos', 'espera_segundos', 'fecha_inicio']
+            )
+        return trabajos
+
+    def marcar_fallido(self, error, reintento_base=timedelta(seconds=30)):
+        """Registra un intento fallido; vuelve a la cola con espera exponencial si quedan intentos"""
+        ahora = timezone.now()
+        self.error = str(error)[:2000]
+        self.fecha_fin = ahora
+        if self.intentos < self.max_intentos:
+            self.estado = 'pendiente'
+            self.disponible_desde = ahora + reintento_base * 2 ** (self.intentos - 1)
+        else:
+            self.estado = 'fallido'
+        # Solo si el trabajo sigue siendo de este worker (no fue reclamado de nuevo por vencido)
+        return type(self).objects.filter(
+            pk=self.pk, estado='procesando', trabajador=self.trabajador, intentos=self.intentos
+        ).update(
+            estado=self.estado, error=self.error, fecha_fin=ahora, disponible_desde=self.disponible_desde
+        )
+
+    @classmethod
+    def metricas(cls, desde=None):
+        """Métricas de la cola: trabajos por estado, espera y duración del análisis"""
+        desde = desde or timezone.now() - timedelta(hours=24)
+        por_estado = dict(cls.objects.values_list('estado').annotate(total=models.Count('id')).order_by())
+        terminados = cls.objects.filter(fecha_fin__gte=desde)
+        tiempos = terminados.filter(estado='completado').aggregate(
+            completados=models.Count('id'),
+            espera_media=models.Avg('espera_segundos'),
+            espera_maxima=models.Max('espera_segundos'),
+            analisis_medio=models.Avg('analisis_segundos'),
+            analisis_maximo=models.Max('analisis_segundos'),
+        )
+        mas_antiguo = cls.objects.filter(estado='pendiente').order_by('disponible_desde').values_list(
+            'disponible_desde', flat=True
+        ).first()
+        return {
+            'por_estado': {estado: por_estado.get(estado, 0) for estado, _ in cls.ESTADO_CHOICES},
+            'desde': desde,
+            'completados': tiempos['completados'],
+            'fallidos': terminados.filter(estado='fallido').count(),
+            'espera_media_segundos': float(tiempos['espera_media'] or 0),
+            'espera_maxima_segundos': float(tiempos['espera_maxima'] or 0),
+            'analisis_medio_segundos': float(tiempos['analisis_medio'] or 0),
+            'analisis_maximo_segundos': float(tiempos['analisis_maximo'] or 0),
+            'pendiente_mas_antiguo_segundos': (
+                max((timezone.now() - mas_antiguo).total_seconds(), 0) if mas_antiguo else 0
+            ),
+        }
+
+
+class TendenciaTecnica(models.Model):
+    """Serie agregada de la técnica de un usuario en un ejercicio, actualizada en O(1) por detección"""
+    # Suavizado de las medias móviles exponenciales (corta reacciona rápido, larga marca la tendencia)
+    ALFA_CORTA = 0.3
+    ALFA_LARGA = 0.05
+    ULTIMAS_GUARDADAS = 30
+    CUBETAS_HISTOGRAMA = 10
+    CAMPOS_ACUMULADOS = [
+        'total_detecciones', 'suma_puntuaciones', 'mejor_puntuacion', 'ultima_puntuacion',
+        'media_movil_corta', 'media_movil_larga', 'ultimas', 'histograma', 'fecha_primera', 'fecha_ultima'
+    ]
+
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='tendencias_tecnica'
+    )
+    ejercicio = models.ForeignKey(
+        Ejercicio,
+        on_delete=models.CASCADE,
+        related_name='tendencias_tecnica'
+    )
+    total_detecciones = models.IntegerField(default=0)
+    suma_puntuaciones = models.BigIntegerField(default=0)
+    mejor_puntuacion = models.IntegerField(default=0)
+    ultima_puntuacion = models.IntegerField(default=0)
+    media_movil_corta = models.FloatField(default=0)
+    media_movil_larga = models.FloatField(default=0)
+    ultimas = models.JSONField(
+        default=list,
+        help_text="[[fecha, puntuacion, media_movil_corta]] de las últimas detecciones, de la más antigua a la más reciente"
+    )
+    histograma = models.JSONField(
+        default=list,
+        help_text="Conteo de las últimas puntuaciones por tramos de 10 puntos (0-9, 10-19, ..., 90-100)"
+    )
+    fecha_primera = models.DateTimeField(blank=True, null=True)
+    fecha_ultima = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'tendencias_tecnica'
+        verbose_name = 'Tendencia de Técnica'
+        verbose_name_plural = 'Tendencias de Técnica'
+        ordering = ['-fecha_ultima']
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'ejercicio'], name='tendencia_tecnica_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario.nombre_usuario} - {self.ejercicio.nombre} ({self.total_detecciones})"
+
+    @property
+    def media(self):
+        """Puntuación media histórica"""
+        return self.suma_puntuaciones / self.total_detecciones if self.total_detecciones else 0
+
+    @property
+    def mejorando(self):
+        """La media reciente supera a la de largo plazo"""
+        return self.total_detecciones > 1 and self.media_movil_corta > self.media_movil_larga
+
+    @classmethod
+    def cubeta(cls, puntuacion):
+        """Índice del tramo del histograma al que pertenece una puntuación"""
+        return min(int(puntuacion) * cls.CUBETAS_HISTOGRAMA // 100, cls.CUBETAS_HISTOGRAMA - 1)
+
+    def agregar(self, puntuacion, fecha):
+        """Incorpora una puntuación en tiempo constante"""
+        if self.total_detecciones:
+            self.media_movil_corta += self.ALFA_CORTA * (puntuacion - self.media_movil_corta)
+            self.media_movil_larga += self.ALFA_LARGA * (puntuacion - self.media_movil_larga)
+        else:
+            self.media_movil_corta = self.media_movil_larga = float(puntuacion)
+            self.fecha_primera = fecha
+        self.total_detecciones += 1
+        self.suma_puntuaciones += puntuacion
+        self.mejor_puntuacion = max(self.mejor_puntuacion, puntuacion)
+        self.ultima_puntuacion = puntuacion
+        self.fecha_ultima = fecha
+
+        # Las últimas N puntuaciones y su histograma se mantienen como una ventana deslizante
+        if len(self.histograma) != self.CUBETAS_HISTOGRAMA:
+            self.histograma = [0] * self.CUBETAS_HISTOGRAMA
+            for _, anterior, _ in self.ultimas:
+                self.histograma[self.cubeta(anterior)] += 1
+        self.ultimas.append([fecha.isoformat(), puntuacion, round(self.media_movil_corta, 2)])
+        self.histograma[self.cubeta(puntuacion)] += 1
+        while len(self.ultimas) > self.ULTIMAS_GUARDADAS:
+            _, descartada, _ = self.ultimas.pop(0)
+            self.histograma[self.cubeta(descartada)] -= 1
+
+    @classmethod
+    def registrar(cls, detecciones):
+        """Actualiza las tendencias con nuevas detecciones confiables.
+
+        Sin importar cuántas detecciones o pares (usuario, ejercicio) haya, usa un INSERT para
+        crear las tendencias que faltan, una lectura con bloqueo y un UPDATE en bloque.
+        """
+        grupos = defaultdict(list)
+        for deteccion in sorted(detecciones, key=lambda deteccion: deteccion.fecha_deteccion):
+            if deteccion.es_confiable:
+                grupos[(deteccion.usuario_id, deteccion.ejercicio_id)].append(deteccion)
+        if not grupos:
+            return []
+
+        filtro = Q()
+        for usuario_id, ejercicio_id in grupos:
+            filtro |= Q(usuario_id=usuario_id, ejercicio_id=ejercicio_id)
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                [cls(usuario_id=usuario_id, ejercicio_id=ejercicio_id) for usuario_id, ejercicio_id in grupos],
+                ignore_conflicts=True
+            )
+            tendencias = list(cls.objects.select_for_update().filter(filtro))
+            for tendencia in tendencias:
+                for deteccion in grupos[(tendencia.usuario_id, tendencia.ejercicio_id)]:
+                    tendencia.agregar(deteccion.puntuacion_tecnica, deteccion.fecha_deteccion)
+            cls.objects.bulk_update(tendencias, cls.CAMPOS_ACUMULADOS)
+        return tendencias
+
+    @classmethod
+    def reconstruir(cls, tamano_lote=2000):
+        """Recalcula todas las tendencias desde las detecciones (carga inicial o reparación).
+
+        Recorre las detecciones una sola vez, ordenadas por usuario, ejercicio y fecha.
+        Retorna cuántas tendencias se crearon.
+        """
+        from core.modelos_ia import obtener_registro  # Importación local para evitar import circular
+        # Umbrales leídos una sola vez; mismo criterio que DeteccionPostura.es_confiable
+        umbrales = {
+            pk: Decimal(str(modelo.umbral_precision)) for pk, modelo in obtener_registro().modelos.items()
+        }
+        detecciones = DeteccionPostura.objects.order_by(
+            'usuario_id', 'ejercicio_id', 'fecha_deteccion', 'id'
+        ).values_list(
+            'usuario_id', 'ejercicio_id', 'modelo_ia_id', 'fecha_deteccion', 'puntuacion_tecnica',
+            'precision_deteccion'
+        )
+
+        creadas = 0
+        with transaction.atomic():
+            cls.objects.all().delete()
+            pendientes, actual = [], None
+            for usuario_id, ejercicio_id, modelo_ia_id, fecha, puntuacion, precision in detecciones.iterator(
+                chunk_size=tamano_lote
+            ):
+                if modelo_ia_id not in umbrales:
+                    # Modelo que aún no está en el registro: se usa el umbral guardado
+                    umbrales[modelo_ia_id] = ModeloIA.objects.get(pk=modelo_ia_id).umbral_precision
+                if Decimal(precision) < umbrales[modelo_ia_id]:
+                    continue
+                if actual is None or (actual.usuario_id, actual.ejercicio_id) != (usuario_id, ejercicio_id):
+                    actual = cls(usuario_id=usuario_id, ejercicio_id=ejercicio_id)
+                    pendientes.append(actual)
+                actual.agregar(puntuacion, fecha)
+                if len(pendientes) > tamano_lote:
+                    cls.objects.bulk_create(pendientes[:-1])
+                    creadas += len(pendientes) - 1
+                    pendientes = pendientes[-1:]
+            cls.objects.bulk_create(pendientes)
+            creadas += len(pendientes)
+        return creadas
+
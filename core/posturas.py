@@ -0,0 +1,304 @@
+import struct
+
+import numpy as np
+from django.conf import settings
+
+# Orden de los puntos clave (formato COCO de 17 puntos)
+PUNTOS_CLAVE = [
+    'nariz', 'ojo_izquierdo', 'ojo_derecho', 'oreja_izquierda', 'oreja_derecha',
+    'hombro_izquierdo', 'hombro_derecho', 'codo_izquierdo', 'codo_derecho',
+    'muneca_izquierda', 'muneca_derecha', 'cadera_izquierda', 'cadera_derecha',
+    'rodilla_izquierda', 'rodilla_derecha', 'tobillo_izquierdo', 'tobillo_derecho',
+]
+
+# Ángulo -> (extremo, vértice, extremo) del lado izquierdo y del derecho
+ANGULOS = {
+    'angulo_rodilla': [
+        ('cadera_izquierda', 'rodilla_izquierda', 'tobillo_izquierdo'),
+        ('cadera_derecha', 'rodilla_derecha', 'tobillo_derecho'),
+    ],
+    'angulo_cadera': [
+        ('hombro_izquierdo', 'cadera_izquierda', 'rodilla_izquierda'),
+        ('hombro_derecho', 'cadera_derecha', 'rodilla_derecha'),
+    ],
+    'angulo_codo': [
+        ('hombro_izquierdo', 'codo_izquierdo', 'muneca_izquierda'),
+        ('hombro_derecho', 'codo_derecho', 'muneca_derecha'),
+    ],
+    'angulo_hombro': [
+        ('cadera_izquierda', 'hombro_izquierdo', 'codo_izquierdo'),
+        ('cadera_derecha', 'hombro_derecho', 'codo_derecho'),
+    ],
+}
+
+# Tolerancia (grados) sin penalización y rango en el que la puntuación cae a cero
+TOLERANCIA_ANGULO = 10
+RANGO_PENALIZACION = 45
+# Confianza mínima de un punto para usarlo en un ángulo
+CONFIANZA_MINIMA = 0.3
+
+NOMBRES_ANGULOS = list(ANGULOS)
+# Índices [lado, ángulo] de cada extremo y del vértice
+_EXTREMO_A, _VERTICE, _EXTREMO_C = (
+    np.array([
+        [PUNTOS_CLAVE.index(lados[lado][posicion]) for lados in ANGULOS.values()]
+        for lado in (0, 1)
+    ])
+    for posicion in range(3)
+)
+
+
+# Formato binario: cabecera + arreglo (frames, puntos, canales) en little-endian.
+# Cabecera: firma, tipo, canales, puntos, banderas, frames (12 bytes, alineada a 4)
+CABECERA_BINARIA = struct.Struct('<4sBBBBI')
+FIRMA_BINARIA = b'PST1'
+TIPOS_BINARIOS = {1: np.dtype('<f2'), 2: np.dtype('<f4')}
+CODIGOS_TIPO = {'float16': 1, 'float32': 2}
+# Banderas para reconstruir el JSON original: envuelto en {'frames': [...]} o un solo frame
+BANDERA_FRAMES = 1
+BANDERA_UN_FRAME = 2
+
+
+def empaquetar_puntos(puntos, tipo='float32'):
+    """Empaqueta puntos (un frame o {'frames': [...]}) en el formato binario.
+
+    Solo acepta puntos que se pueden reconstruir sin pérdida de estructura; lanza ValueError
+    en otro caso.
+    """
+    banderas = 0
+    if isinstance(puntos, dict):
+        if set(puntos) != {'frames'}:
+            raise ValueError("Solo se empaquetan puntos con la forma {'frames': [...]}")
+        puntos, banderas = puntos['frames'], BANDERA_FRAMES
+    try:
+        arreglo = np.asarray(puntos, dtype=TIPOS_BINARIOS[CODIGOS_TIPO[tipo]])
+    except (TypeError, ValueError):
+        raise ValueError("Los puntos corporales deben ser listas numéricas [x, y(, confianza)]")
+    if arreglo.ndim == 2 and not banderas:
+        arreglo, banderas = arreglo[None], BANDERA_UN_FRAME
+    if arreglo.ndim != 3 or arreglo.shape[1] != len(PUNTOS_CLAVE) or arreglo.shape[2] not in (2, 3):
+        raise ValueError(f"Se esperan frames de {len(PUNTOS_CLAVE)} puntos [x, y, confianza]")
+    cabecera = CABECERA_BINARIA.pack(
+        FIRMA_BINARIA, CODIGOS_TIPO[tipo], arreglo.shape[2], arreglo.shape[1], banderas, arreglo.shape[0]
+    )
+    return cabecera + arreglo.tobytes()
+
+
+def leer_cabecera(datos):
+    """Retorna (dtype, frames, puntos, canales, banderas) de unos puntos empaquetados"""
+    if len(datos) < CABECERA_BINARIA.size:
+        raise ValueError("Formato binario de puntos desconocido")
+    firma, codigo, canales, puntos, banderas, frames = CABECERA_BINARIA.unpack_from(datos)
+    if firma != FIRMA_BINARIA or codigo not in TIPOS_BINARIOS:
+        raise ValueError("Formato binario de puntos desconocido")
+    return TIPOS_BINARIOS[codigo], frames, puntos, canales, banderas
+
+
+def desempaquetar_puntos(datos):
+    """Arreglo (frames, puntos, canales) de solo lectura sobre el mismo buffer, sin copiar"""
+    datos = memoryview(datos)
+    tipo, frames, puntos, canales, _ = leer_cabecera(datos)
+    if datos.nbytes < CABECERA_BINARIA.size + frames * puntos * canales * tipo.itemsize:
+        raise ValueError("Los puntos empaquetados están incompletos")
+    return np.frombuffer(
+        datos, dtype=tipo, count=frames * puntos * canales, offset=CABECERA_BINARIA.size
+    ).reshape(frames, puntos, canales)
+
+
+def puntos_a_json(datos):
+    """Reconstruye la representación JSON original de unos puntos empaquetados"""
+    banderas = leer_cabecera(datos)[4]
+    frames = desempaquetar_puntos(datos).astype(np.float64).round(4).tolist()
+    if banderas & BANDERA_FRAMES:
+        return {'frames': frames}
+    return frames[0] if banderas & BANDERA_UN_FRAME else frames
+
+
+def empaquetar_si_corresponde(puntos):
+    """Empaqueta los puntos con el tipo de settings.PUNTOS_POSTURA_TIPO_BINARIO.
+
+    Retorna None si el formato binario está desactivado o los puntos no tienen forma de frames.
+    """
+    tipo = getattr(settings, 'PUNTOS_POSTURA_TIPO_BINARIO', None)
+    if not tipo:
+        return None
+    try:
+        return empaquetar_puntos(puntos, tipo)
+    except ValueError:
+        return None
+
+
+def a_arreglo(puntos):
+    """Convierte los puntos detectados (un frame, {'frames': [...]} o binario) en un arreglo (frames, 17, 3)"""
+    if isinstance(puntos, (bytes, bytearray, memoryview)):
+        puntos = desempaquetar_puntos(puntos)
+    elif isinstance(puntos, dict):
+        puntos = puntos.get('frames')
+    try:
+        arreglo = np.asarray(puntos, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError("Los puntos corporales deben ser listas numéricas [x, y(, confianza)]")
+    if arreglo.ndim == 2:
+        arreglo = arreglo[None]
+    if arreglo.ndim != 3 or arreglo.shape[0] == 0 or arreglo.shape[1] != len(PUNTOS_CLAVE) or arreglo.shape[2] not in (2, 3):
+        raise ValueError(
+            f"Se esperan frames de {len(PUNTOS_CLAVE)} puntos [x, y, confianza]"
+        )
+    if not np.isfinite(arreglo).all():
+        raise ValueError("Los puntos corporales deben ser números finitos")
+    if arreglo.shape[2] == 2:
+        arreglo = np.concatenate([arreglo, np.ones(arreglo.shape[:2] + (1,), dtype=np.float32)], axis=2)
+    elif arreglo[:, :, 2].min() < 0 or arreglo[:, :, 2].max() > 1:
+        # La confianza se lleva a [0, 1]: un valor mayor inflaría la precisión de la detección
+        arreglo = arreglo.copy()
+        np.clip(arreglo[:, :, 2], 0, 1, out=arreglo[:, :, 2])
+    return arreglo
+
+
+def calcular_angulos(frames):
+    """Ángulos articulares de todos los frames a la vez.
+
+    Retorna (angulos, confianza) con forma (frames, 2 lados, len(ANGULOS)); los ángulos en grados.
+    """
+    a = frames[:, _EXTREMO_A, :2] - frames[:, _VERTICE, :2]
+    c = frames[:, _EXTREMO_C, :2] - frames[:, _VERTICE, :2]
+    normas = np.linalg.norm(a, axis=-1) * np.linalg.norm(c, axis=-1)
+    coseno = np.einsum('...i,...i->...', a, c) / np.maximum(normas, 1e-6)
+    angulos = np.degrees(np.arccos(np.clip(coseno, -1, 1)))
+    confianza = np.minimum(
+        np.minimum(frames[:, _EXTREMO_A, 2], frames[:, _VERTICE, 2]), frames[:, _EXTREMO_C, 2]
+    )
+    confianza = np.where(normas > 1e-6, confianza, 0)
+    return angulos, confianza
+
+
+def normalizar_ideales(angulos_ideales):
+    """Acepta {'angulo': grados} o {'angulo': {'ideal': grados, 'tolerancia': grados}}"""
+    ideales = {}
+    for nombre, valor in (angulos_ideales or {}).items():
+        if nombre not in ANGULOS:
+            continue
+        if isinstance(valor, dict):
+            ideales[nombre] = (float(valor['ideal']), float(valor.get('tolerancia', TOLERANCIA_ANGULO)))
+        else:
+            ideales[nombre] = (float(valor), float(TOLERANCIA_ANGULO))
+    return ideales
+
+
+class ObjetivosPostura:
+    """Ángulos ideales de un modelo compilados a arreglos, listos para puntuar"""
+
+    def __init__(self, angulos_ideales):
+        ideales = normalizar_ideales(angulos_ideales)
+        if not ideales:
+            raise ValueError("El modelo no define ángulos ideales reconocibles")
+        self.nombres = list(ideales)
+        self.columnas = np.array([NOMBRES_ANGULOS.index(nombre) for nombre in ideales])
+        self.ideal = np.array([valor[0] for valor in ideales.values()])
+        self.tolerancia = np.array([valor[1] for valor in ideales.values()])
+        # Puntos clave que intervienen en algún ángulo (para la precisión)
+        self.puntos_usados = np.unique(np.concatenate(
+            [_EXTREMO_A[:, self.columnas], _VERTICE[:, self.columnas], _EXTREMO_C[:, self.columnas]], axis=None
+        ))
+
+
+def medir_angulos(frames, objetivos):
+    """Ángulo medido por frame (promedio de ambos lados según su confianza) con forma (frames, ángulos).
+
+    NaN donde ningún lado supera la confianza mínima.
+    """
+    angulos, confianza = calcular_angulos(frames)
+    angulos, confianza = angulos[..., objetivos.columnas], confianza[..., objetivos.columnas]
+    peso = np.where(confianza >= CONFIANZA_MINIMA, confianza, 0)
+    total_peso = peso.sum(axis=1)
+    return np.divide(
+        (angulos * peso).sum(axis=1), total_peso,
+        out=np.full(total_peso.shape, np.nan, dtype=np.float64), where=total_peso > 0
+    )
+
+
+class PuntuacionIncremental:
+    """Puntuación de una serie que llega por partes, con memoria constante.
+
+    Los ángulos se puntúan juntos en cada frame y la serie vale lo que su mejor frame: la
+    postura ideal tiene que alcanzarse con todas las articulaciones a la vez (un barrido que
+    pasa por cada ángulo ideal en momentos distintos no puntúa alto). Conserva solo el mejor
+    frame, así que agregar la serie por partes da el mismo resultado que puntuarla completa.
+    """
+
+    def __init__(self, angulos_ideales, umbral_precision=0.8):
+        if isinstance(angulos_ideales, ObjetivosPostura):
+            self.objetivos = angulos_ideales
+        else:
+            self.objetivos = ObjetivosPostura(angulos_ideales)
+        self.umbral_precision = float(umbral_precision)
+        cantidad = len(self.objetivos.nombres)
+        self.frames = 0
+        self.suma_confianza = 0.0
+        self.mejor_puntuacion = -1.0
+        self.mejor_frame = 0
+        self.mejor_medido = np.full(cantidad, np.nan)
+        self.mejor_puntuaciones = np.zeros(cantidad)
+        self.fotograma_clave = np.zeros((1, len(PUNTOS_CLAVE), 3), dtype=np.float32)
+
+    def agregar(self, puntos):
+        """Incorpora nuevos frames (cualquier formato que acepte a_arreglo)"""
+        frames = a_arreglo(puntos)
+        medidos = medir_angulos(frames, self.objetivos)
+        errores = np.abs(medidos - self.objetivos.ideal)
+        # Un ángulo no visible en el frame puntúa 0 en ese frame
+        puntuaciones = np.where(
+            np.isnan(errores), 0,
+            np.clip(1 - np.maximum(errores - self.objetivos.tolerancia, 0) / RANGO_PENALIZACION, 0, 1)
+        )
+        conjunta = puntuaciones.mean(axis=1)
+        indice = int(np.argmax(conjunta))
+        # Solo una mejora estricta reemplaza al mejor frame: ante empates gana el primero
+        if conjunta[indice] > self.mejor_puntuacion:
+            self.mejor_puntuacion = float(conjunta[indice])
+            self.mejor_frame = self.frames + indice
+            self.mejor_medido = medidos[indice]
+            self.mejor_puntuaciones = puntuaciones[indice]
+            self.fotograma_clave = frames[indice:indice + 1].copy()
+        self.suma_confianza += float(frames[:, self.objetivos.puntos_usados, 2].sum(dtype=np.float64))
+        self.frames += len(frames)
+        return self
+
+    def resultado(self):
+        """Mismo formato que puntuar_postura para todos los frames agregados"""
+        if not self.frames:
+            raise ValueError("No se recibieron frames")
+        ideal, tolerancia = self.objetivos.ideal, self.objetivos.tolerancia
+        visibles = ~np.isnan(self.mejor_medido)
+        errores = np.abs(self.mejor_medido - ideal)
+        precision = self.suma_confianza / (self.frames * len(self.objetivos.puntos_usados))
+
+        return {
+            'puntuacion_tecnica': int(round(100 * self.mejor_puntuaciones.mean())),
+            'precision_deteccion': round(precision, 2),
+            'es_confiable': precision >= self.umbral_precision,
+            'frames': self.frames,
+            'angulos': {
+                nombre: {
+                    'ideal': float(ideal[i]),
+                    'tolerancia': float(tolerancia[i]),
+                    'medido': round(float(self.mejor_medido[i]), 1) if visibles[i] else None,
+                    'error': round(float(errores[i]), 1) if visibles[i] else None,
+                    'frame': self.mejor_frame if visibles[i] else None,
+                    'puntuacion': round(float(self.mejor_puntuaciones[i]), 3),
+                }
+                for i, nombre in enumerate(self.objetivos.nombres)
+            },
+        }
+
+
+def puntuar_postura(puntos, angulos_ideales, umbral_precision=0.8):
+    """Puntúa una ráfaga de frames contra los ángulos ideales de un modelo.
+
+    `angulos_ideales` puede ser el JSON del modelo o un ObjetivosPostura ya compilado. Cada
+    frame se puntúa con todos sus ángulos (ambos lados promediados según su confianza) y se
+    toma el mejor frame (el punto clave del movimiento). Retorna la puntuación técnica (0-100),
+    la precisión de la detección (confianza media de los puntos usados) y el detalle por ángulo
+    en ese frame.
+    """
+    return PuntuacionIncremental(angulos_ideales, umbral_precision).agregar(puntos).resultado()
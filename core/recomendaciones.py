@@ -0,0 +1,218 @@
+import numpy as np
+
+from .models import (
+    AsignacionRutina, Ejercicio, PerfilSalud, Rutina, RutinaEjercicio, Usuario
+)
+from .versiones import CacheProceso
+
+# Clave de caché compartida entre procesos para invalidar la matriz
+CLAVE_VERSION_RUTINAS = 'recomendaciones:version_rutinas'
+
+NIVELES = [clave for clave, _ in Rutina.NIVEL_DIFICULTAD_CHOICES]
+GRUPOS_MUSCULARES = [clave for clave, _ in Ejercicio.GRUPO_MUSCULAR_CHOICES]
+INDICE_GRUPOS = {grupo: i for i, grupo in enumerate(GRUPOS_MUSCULARES)}
+TIPOS_RUTINA = [clave for clave, _ in Rutina.TIPO_EJERCICIO_CHOICES]
+
+NIVEL_ACTIVIDAD_INTENSIDAD = {
+    'sedentario': 0.0,
+    'ligero': 0.25,
+    'moderado': 0.5,
+    'activo': 0.75,
+    'muy_activo': 1.0,
+}
+
+# Palabras clave de restricciones_ejercicio -> grupos musculares a evitar
+RESTRICCIONES_GRUPOS = {
+    'hombro': ['hombros'],
+    'espalda': ['espalda'],
+    'lumbar': ['espalda'],
+    'rodilla': ['piernas'],
+    'tobillo': ['piernas'],
+    'cadera': ['piernas', 'gluteos'],
+    'muñeca': ['brazos'],
+    'codo': ['brazos'],
+    'impacto': ['cardiovascular', 'full_body'],
+    'cardiaco': ['cardiovascular'],
+    'cardíaco': ['cardiovascular'],
+}
+
+# Pesos de la puntuación
+PESO_NIVEL = 0.45
+PESO_INTENSIDAD = 0.2
+PESO_VARIEDAD = 0.2
+PESO_TIPO = 0.15
+PENALIZACION_RESTRICCION = 0.6
+PENALIZACION_PENDIENTE = 0.3
+
+
+class MatrizRutinas:
+    """Matriz de características de las rutinas activas precalculada con NumPy"""
+
+    def __init__(self):
+        rutinas = list(
+            Rutina.objects.filter(esta_activa=True)
+            .order_by('id')
+            .values_list(
+                'id', 'nivel_dificultad', 'tipo_ejercicio', 'duracion_minutos',
+                'calorias_estimadas', 'es_publica', 'creador_id'
+            )
+        )
+        n = len(rutinas)
+        self.ids = np.fromiter((r[0] for r in rutinas), dtype=np.int64, count=n)
+        self.nivel = np.fromiter(
+            (NIVELES.index(r[1]) if r[1] in NIVELES else 0 for r in rutinas),
+            dtype=np.float32, count=n
+        )
+        self.tipo = np.fromiter(
+            (TIPOS_RUTINA.index(r[2]) if r[2] in TIPOS_RUTINA else 0 for r in rutinas),
+            dtype=np.int64, count=n
+        )
+        duracion = np.fromiter((r[3] or 0 for r in rutinas), dtype=np.float32, count=n)
+        calorias = np.fromiter((r[4] or 0 for r in rutinas), dtype=np.float32, count=n)
+        self.es_publica = np.fromiter((r[5] for r in rutinas), dtype=bool, count=n)
+        self.creador = np.fromiter((r[6] for r in rutinas), dtype=np.int64, count=n)
+
+        # Intensidad (calorías por minuto) normalizada a [0, 1]
+        intensidad = np.divide(
+            calorias, duracion, out=np.zeros(n, dtype=np.float32), where=duracion > 0
+        )
+        maximo = intensidad.max() if n else 0
+        self.intensidad = intensidad / maximo if maximo > 0 else intensidad
+
+        # Cobertura de grupos musculares: fracción de ejercicios por grupo
+        self.cobertura = np.zeros((n, len(GRUPOS_MUSCULARES)), dtype=np.float32)
+        pares = list(
+            RutinaEjercicio.objects.filter(
+                # Solo grupos conocidos: el campo admite vacío y valores fuera de las opciones
+                rutina__esta_activa=True, ejercicio__grupo_muscular__in=GRUPOS_MUSCULARES
+            ).values_list('rutina_id', 'ejercicio__grupo_muscular')
+        )
+        if n and pares:
+            rutina_ids = np.fromiter((p[0] for p in pares), dtype=np.int64, count=len(pares))
+            filas = np.clip(np.searchsorted(self.ids, rutina_ids), 0, n - 1)
+            columnas = np.fromiter(
+                (INDICE_GRUPOS[p[1]] for p in pares), dtype=np.int64, count=len(pares)
+            )
+            # Descarta pares de rutinas activadas entre ambas consultas (no tienen fila propia)
+            validos = self.ids[filas] == rutina_ids
+            np.add.at(self.cobertura, (filas[validos], columnas[validos]), 1)
+            totales = self.cobertura.sum(axis=1, keepdims=True)
+            np.divide(self.cobertura, totales, out=self.cobertura, where=totales > 0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def filas(self, rutina_ids):
+        """Convierte ids de rutina en índices de fila (ignora los inexistentes)"""
+        rutina_ids = np.asarray(list(rutina_ids), dtype=np.int64)
+        if not len(self.ids) or not len(rutina_ids):
+            return np.empty(0, dtype=np.int64)
+        posiciones = np.searchsorted(self.ids, rutina_ids)
+        posiciones = np.clip(posiciones, 0, len(self.ids) - 1)
+        return posiciones[self.ids[posiciones] == rutina_ids]
+
+    def puntuar(self, perfil):
+        """Puntúa todas las rutinas para un perfil de usuario; -inf si no es visible"""
+        nivel_objetivo = np.clip(perfil['nivel'] + perfil['ajuste_nivel'], 0, len(NIVELES) - 1)
+        afinidad_nivel = 1 - np.abs(self.nivel - nivel_objetivo) / (len(NIVELES) - 1)
+        afinidad_intensidad = 1 - np.abs(self.intensidad - perfil['intensidad'])
+        variedad = 1 - self.cobertura @ perfil['historial_grupos']
+        afinidad_tipo = perfil['preferencia_tipos'][self.tipo]
+        restriccion = self.cobertura @ perfil['grupos_restringidos']
+
+        puntuacion = (
+            PESO_NIVEL * afinidad_nivel
+            + PESO_INTENSIDAD * afinidad_intensidad
+            + PESO_VARIEDAD * variedad
+            + PESO_TIPO * afinidad_tipo
+            - PENALIZACION_RESTRICCION * restriccion
+        )
+        puntuacion[self.filas(perfil['pendientes'])] -= PENALIZACION_PENDIENTE
+
+        visible = self.es_publica | (self.creador == perfil['usuario_id'])
+        return np.where(visible, puntuacion, -np.inf)
+
+    def mejores(self, perfil, limite=10):
+        """Retorna [(rutina_id, puntuacion)] de las rutinas mejor puntuadas"""
+        puntuacion = self.puntuar(perfil)
+        visibles = int(np.isfinite(puntuacion).sum())
+        limite = min(limite, visibles)
+        if limite <= 0:
+            return []
+        candidatos = np.argpartition(-puntuacion, limite - 1)[:limite]
+        candidatos = candidatos[np.argsort(-puntuacion[candidatos])]
+        return [(int(self.ids[i]), float(puntuacion[i])) for i in candidatos]
+
+
+_matriz = CacheProceso(CLAVE_VERSION_RUTINAS, MatrizRutinas)
+
+
+def obtener_matriz_rutinas():
+    """Retorna la matriz de rutinas del proceso, reconstruyéndola si cambió la versión"""
+    return _matriz.obtener()
+
+
+def invalidar_matriz_rutinas():
+    """Fuerza la reconstrucción de la matriz en todos los procesos"""
+    _matriz.invalidar()
+
+
+def construir_perfil(usuario, matriz):
+    """Construye el vector de preferencias del usuario a partir de su historial"""
+    nivel_usuario = usuario.nivel_fisico_actual
+    perfil = {
+        'usuario_id': usuario.id,
+        'nivel': float(NIVELES.index(nivel_usuario)) if nivel_usuario in NIVELES else 0.0,
+        'ajuste_nivel': 0.0,
+        'intensidad': NIVEL_ACTIVIDAD_INTENSIDAD['moderado'],
+        'historial_grupos': np.zeros(len(GRUPOS_MUSCULARES), dtype=np.float32),
+        'grupos_restringidos': np.zeros(len(GRUPOS_MUSCULARES), dtype=np.float32),
+        'preferencia_tipos': np.full(len(TIPOS_RUTINA), 0.5, dtype=np.float32),
+        'pendientes': [],
+    }
+
+    try:
+        perfil_salud = usuario.perfil_salud
+    except PerfilSalud.DoesNotExist:
+        perfil_salud = None
+    if perfil_salud:
+        perfil['intensidad'] = NIVEL_ACTIVIDAD_INTENSIDAD.get(
+            perfil_salud.nivel_actividad, perfil['intensidad']
+        )
+        restricciones = (perfil_salud.restricciones_ejercicio or '').lower()
+        for palabra, grupos in RESTRICCIONES_GRUPOS.items():
+            if palabra in restricciones:
+                for grupo in grupos:
+                    perfil['grupos_restringidos'][GRUPOS_MUSCULARES.index(grupo)] = 1
+
+    asignaciones = list(
+        AsignacionRutina.objects.filter(usuario=usuario)
+        .values_list('rutina_id', 'completada', 'calificacion_dificultad')
+    )
+    completadas = [a[0] for a in asignaciones if a[1]]
+    perfil['pendientes'] = [a[0] for a in asignaciones if not a[1]]
+
+    # Calificaciones altas (difícil) bajan el nivel objetivo; bajas lo suben
+    calificaciones = [a[2] for a in asignaciones if a[2]]
+    if calificaciones:
+        perfil['ajuste_nivel'] = (3 - float(np.mean(calificaciones))) / 2
+
+    filas = matriz.filas(completadas)
+    if len(filas):
+        historial = matriz.cobertura[filas].sum(axis=0)
+        total = historial.sum()
+        if total > 0:
+            perfil['historial_grupos'] = historial / total
+        tipos = np.bincount(matriz.tipo[filas], minlength=len(TIPOS_RUTINA)).astype(np.float32)
+        perfil['preferencia_tipos'] = 0.5 + 0.5 * tipos / tipos.max()
+
+    return perfil
+
+
+def recomendar_rutinas(usuario, limite=10):
+    """Retorna [(rutina_id, puntuacion)] recomendadas para el usuario"""
+    if not isinstance(usuario, Usuario):
+        usuario = Usuario.objects.get(pk=usuario)
+    matriz = obtener_matriz_rutinas()
+    perfil = construir_perfil(usuario, matriz)
+    return matriz.mejores(perfil, limite)
@@ -0,0 +1,156 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Ejercicio, RetroalimentacionEjecucion
+from .posturas import TOLERANCIA_ANGULO
+from .versiones import CacheProceso
+
+CLAVE_VERSION_EJERCICIOS = 'retroalimentacion:version_ejercicios'
+
+# Ángulo -> corrección, grupos musculares a reforzar (en orden de preferencia), tipos de ejercicio
+# preferidos y mensajes según el ángulo medido quede por encima o por debajo del ideal
+REGLAS_CORRECCION = {
+    'angulo_rodilla': {
+        'tipo_correccion': 'rango_movimiento',
+        'grupos': ['piernas', 'gluteos'],
+        'tipos': ['fuerza', 'flexibilidad'],
+        'mayor': "Flexiona más las rodillas para completar el rango de movimiento",
+        'menor': "No flexiones tanto las rodillas; controla la bajada",
+        'sugerencia': "Trabaja la movilidad de tobillo y cadera y baja de forma controlada",
+    },
+    'angulo_cadera': {
+        'tipo_correccion': 'postura',
+        'grupos': ['gluteos', 'abdomen', 'espalda'],
+        'tipos': ['fuerza', 'flexibilidad'],
+        'mayor': "Lleva la cadera más atrás e inclina ligeramente el torso",
+        'menor': "Mantén el torso más erguido; estás cerrando demasiado la cadera",
+        'sugerencia': "Activa el abdomen y mantén la espalda neutra durante todo el movimiento",
+    },
+    'angulo_codo': {
+        'tipo_correccion': 'rango_movimiento',
+        'grupos': ['brazos', 'pecho'],
+        'tipos': ['fuerza'],
+        'mayor': "Flexiona más los codos para completar cada repetición",
+        'menor': "No cierres tanto los codos; extiende más los brazos",
+        'sugerencia': "Reduce la velocidad y completa el recorrido en cada repetición",
+    },
+    'angulo_hombro': {
+        'tipo_correccion': 'alineacion',
+        'grupos': ['hombros', 'espalda'],
+        'tipos': ['flexibilidad', 'fuerza'],
+        'mayor': "Acerca los brazos al cuerpo; los hombros están demasiado abiertos",
+        'menor': "Separa más los brazos del torso para alinear los hombros",
+        'sugerencia': "Mantén los hombros alejados de las orejas y las escápulas estables",
+    },
+}
+
+# Grados de error fuera de la tolerancia -> nivel de gravedad (de mayor a menor)
+UMBRALES_GRAVEDAD = [(30, 'critico'), (20, 'grave'), (10, 'moderado'), (0, 'leve')]
+
+EJERCICIOS_POR_CORRECCION = 2
+
+
+def construir_indice_ejercicios():
+    """Indexa los ejercicios por grupo muscular como [(id, tipo)]"""
+    indice = defaultdict(list)
+    for ejercicio_id, grupo, tipo in Ejercicio.objects.exclude(grupo_muscular__isnull=True).order_by(
+        'id'
+    ).values_list('id', 'grupo_muscular', 'tipo'):
+        indice[grupo].append((ejercicio_id, tipo))
+    return dict(indice)
+
+
+_indice = CacheProceso(CLAVE_VERSION_EJERCICIOS, construir_indice_ejercicios)
+
+
+def invalidar_indice_ejercicios():
+    """Fuerza la reconstrucción del índice de ejercicios por grupo muscular en todos los procesos"""
+    _indice.invalidar()
+
+
+def calcular_gravedad(exceso):
+    """Nivel de gravedad para un error de `exceso` grados fuera de la tolerancia (None si no hay)"""
+    if exceso <= 0:
+        return None
+    for minimo, gravedad in UMBRALES_GRAVEDAD:
+        if exceso >= minimo:
+            return gravedad
+
+
+def elegir_complementarios(regla, excluir, indice):
+    """Ids de ejercicios de los grupos de la regla, priorizando sus tipos preferidos"""
+    candidatos = [
+        (ejercicio_id, tipo) for grupo in regla['grupos'] for ejercicio_id, tipo in indice.get(grupo, [])
+        if ejercicio_id != excluir
+    ]
+    preferencia = {tipo: posicion for posicion, tipo in enumerate(regla['tipos'])}
+    candidatos.sort(key=lambda candidato: preferencia.get(candidato[1], len(preferencia)))
+    return [ejercicio_id for ejercicio_id, _ in candidatos[:EJERCICIOS_POR_CORRECCION]]
+
+
+def evaluar_desviacion(nombre, detalle):
+    """Corrección para el detalle de un ángulo de puntuar_postura (None si no hay que corregir).
+
+    Retorna (regla, gravedad, mensaje, exceso); no consulta la base de datos.
+    """
+    regla = REGLAS_CORRECCION.get(nombre)
+    if regla is None or detalle.get('medido') is None:
+        return None
+    tolerancia = detalle.get('tolerancia', TOLERANCIA_ANGULO)
+    exceso = abs(detalle['medido'] - detalle['ideal']) - tolerancia
+    gravedad = calcular_gravedad(exceso)
+    if gravedad is None:
+        return None
+    mensaje = regla['mayor'] if detalle['medido'] > detalle['ideal'] else regla['menor']
+    return regla, gravedad, mensaje, exceso
+
+
+def correcciones_para(deteccion, indice):
+    """[(retroalimentación sin guardar, ids complementarios)] según las desviaciones de una detección"""
+    correcciones = []
+    for nombre, detalle in ((deteccion.metadata_analisis or {}).get('angulos') or {}).items():
+        desviacion = evaluar_desviacion(nombre, detalle)
+        if desviacion is None:
+            continue
+        regla, gravedad, mensaje, exceso = desviacion
+        tolerancia = detalle.get('tolerancia', TOLERANCIA_ANGULO)
+        correcciones.append((
+            RetroalimentacionEjecucion(
+                deteccion=deteccion,
+                tipo_correccion=regla['tipo_correccion'],
+                nivel_gravedad=gravedad,
+                mensaje_usuario=mensaje,
+                descripcion_tecnica=(
+                    f"{nombre}: medido {detalle['medido']}°, ideal {detalle['ideal']}° (±{tolerancia}°); "
+                    f"{exceso:.1f}° fuera de tolerancia"
+                ),
+                sugerencias_mejora=regla['sugerencia'],
+            ),
+            elegir_complementarios(regla, deteccion.ejercicio_id, indice),
+        ))
+    return correcciones
+
+
+def generar_retroalimentacion(detecciones):
+    """Crea la retroalimentación de una o varias detecciones ya evaluadas y guardadas.
+
+    Escribe todas las filas con un INSERT y todos los ejercicios complementarios con otro,
+    sin importar cuántas detecciones o correcciones haya. Retorna las retroalimentaciones creadas.
+    """
+    indice = _indice.obtener()
+    correcciones = [correccion for deteccion in detecciones for correccion in correcciones_para(deteccion, indice)]
+    if not correcciones:
+        return []
+
+    Complementario = RetroalimentacionEjecucion.ejercicios_complementarios.through
+    with transaction.atomic():
+        retroalimentaciones = RetroalimentacionEjecucion.objects.bulk_create(
+            [retroalimentacion for retroalimentacion, _ in correcciones]
+        )
+        Complementario.objects.bulk_create([
+            Complementario(retroalimentacionejecucion_id=retroalimentacion.pk, ejercicio_id=ejercicio_id)
+            for retroalimentacion, ejercicios in correcciones
+            for ejercicio_id in ejercicios
+        ])
+    return retroalimentaciones
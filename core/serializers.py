@@ -1,9 +1,15 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db import transaction
+from django.utils import timezone
+from datetime import datetime
+import os
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .models import *
+from .analisis_video import EXTENSIONES_VIDEO, MAXIMO_BYTES_VIDEO
+from .modelos_ia import es_modelo_vigente
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -169,6 +175,8 @@ class EjercicioSerializer(serializers.ModelSerializer):
 
 
 class RutinaEjercicioSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    ejercicio = serializers.IntegerField(source='ejercicio_id')
     ejercicio_nombre = serializers.CharField(source='ejercicio.nombre', read_only=True)
     ejercicio_tipo = serializers.CharField(source='ejercicio.tipo', read_only=True)
     ejercicio_imagen = serializers.CharField(source='ejercicio.imagen_url', read_only=True)
@@ -181,6 +189,7 @@ class RutinaEjercicioSerializer(serializers.ModelSerializer):
             'orden', 'series', 'repeticiones', 'descanso_segundos', 'peso_sugerido', 'notas',
             'duracion_estimada_minutos'
         ]
+        read_only_fields = ['orden']
 
 
 class RutinaSerializer(serializers.ModelSerializer):
@@ -189,7 +198,7 @@ class RutinaSerializer(serializers.ModelSerializer):
     creador_nombre = serializers.CharField(source='creador.nombre_usuario', read_only=True)
     total_ejercicios = serializers.IntegerField(read_only=True)
     grupos_musculares = serializers.ListField(read_only=True)
-    ejercicios = RutinaEjercicioSerializer(source='rutina_ejercicios', many=True, read_only=True)
+    ejercicios = RutinaEjercicioSerializer(source='rutina_ejercicios', many=True, required=False)
 
     class Meta:
         model = Rutina
@@ -199,7 +208,46 @@ class RutinaSerializer(serializers.ModelSerializer):
             'es_publica', 'creador', 'creador_nombre', 'fecha_creacion', 'esta_activa',
             'total_ejercicios', 'grupos_musculares', 'ejercicios'
         ]
-        read_only_fields = ['fecha_creacion']
+        read_only_fields = ['fecha_creacion', 'duracion_minutos', 'calorias_estimadas']
+
+    def validate_ejercicios(self, value):
+        filas = [datos['id'] for datos in value if datos.get('id')]
+        repetidas = {fila for fila in filas if filas.count(fila) > 1}
+        if repetidas:
+            raise serializers.ValidationError(f"Filas repetidas en la lista: {sorted(repetidas)}")
+        ids = {datos['ejercicio_id'] for datos in value}
+        encontrados = set(Ejercicio.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if ids - encontrados:
+            raise serializers.ValidationError(f"Ejercicios inexistentes: {sorted(ids - encontrados)}")
+        return value
+
+    def create(self, validated_data):
+        ejercicios = validated_data.pop('rutina_ejercicios', [])
+        with transaction.atomic():
+            rutina = super().create(validated_data)
+            if ejercicios:
+                try:
+                    rutina.sincronizar_ejercicios(ejercicios)
+                except ValueError as e:
+                    raise serializers.ValidationError({'ejercicios': [str(e)]})
+        return self._recargar(rutina)
+
+    def update(self, instance, validated_data):
+        ejercicios = validated_data.pop('rutina_ejercicios', None)
+        with transaction.atomic():
+            rutina = super().update(instance, validated_data)
+            if ejercicios is not None:
+                try:
+                    rutina.sincronizar_ejercicios(ejercicios)
+                except ValueError as e:
+                    raise serializers.ValidationError({'ejercicios': [str(e)]})
+        return self._recargar(rutina)
+
+    def _recargar(self, rutina):
+        # Instancia nueva con los ejercicios precargados para la respuesta
+        return Rutina.objects.select_related('creador').prefetch_related(
+            'rutina_ejercicios__ejercicio'
+        ).get(pk=rutina.pk)
 
 
 class AsignacionRutinaSerializer(serializers.ModelSerializer):
@@ -209,15 +257,36 @@ class AsignacionRutinaSerializer(serializers.ModelSerializer):
     usuario_nombre = serializers.CharField(source='usuario.nombre_usuario', read_only=True)
     calificacion_dificultad_display = serializers.CharField(source='get_calificacion_dificultad_display', read_only=True)
     esta_vencida = serializers.BooleanField(read_only=True)
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
 
     class Meta:
         model = AsignacionRutina
         fields = [
             'id', 'usuario', 'usuario_nombre', 'rutina', 'rutina_nombre', 'rutina_nivel_dificultad', 'rutina_duracion',
-            'fecha_asignacion', 'fecha_vencimiento', 'completada', 'fecha_completacion',
+            'fecha_asignacion', 'fecha_vencimiento', 'completada', 'estado', 'estado_display', 'fecha_completacion',
             'calificacion_dificultad', 'calificacion_dificultad_display', 'notas_usuario', 'esta_vencida'
         ]
-        read_only_fields = ['id', 'fecha_completacion']
+        read_only_fields = ['id', 'estado', 'fecha_completacion']
+
+
+class AsignacionSegmentoSerializer(serializers.Serializer):
+    nivel_fisico_actual = serializers.ChoiceField(choices=Usuario.NIVEL_FISICO_CHOICES, required=False)
+    rango_actual = serializers.PrimaryKeyRelatedField(queryset=Rango.objects.all(), required=False)
+    activo_desde = serializers.DateField(required=False, help_text="Último acceso desde esta fecha")
+    fecha_vencimiento = serializers.DateField(required=False)
+
+    def obtener_usuarios(self):
+        """Construye el queryset del segmento de usuarios a partir de los filtros"""
+        filtros = self.validated_data
+        usuarios = Usuario.objects.filter(tipo_usuario='usuario_final', is_active=True)
+        if 'nivel_fisico_actual' in filtros:
+            usuarios = usuarios.filter(nivel_fisico_actual=filtros['nivel_fisico_actual'])
+        if 'rango_actual' in filtros:
+            usuarios = usuarios.filter(rango_actual=filtros['rango_actual'])
+        if 'activo_desde' in filtros:
+            desde = timezone.make_aware(datetime.combine(filtros['activo_desde'], datetime.min.time()))
+            usuarios = usuarios.filter(ultimo_acceso__gte=desde)
+        return usuarios
 
 
 # ========== SERIALIZERS DE GAMIFICACIÓN ==========
@@ -267,9 +336,13 @@ class ProgresoMisionSerializer(serializers.ModelSerializer):
             'id', 'usuario', 'usuario_nombre', 'mision', 'mision_titulo', 'mision_tipo',
             'mision_objetivo', 'mision_recompensa_xp', 'mision_recompensa_cristales',
             'progreso_actual', 'completada', 'fecha_completacion', 'fecha_asignacion',
-            'fecha_actualizacion', 'porcentaje_completado'
+            'fecha_actualizacion', 'periodo', 'porcentaje_completado'
+        ]
+        # El progreso solo lo modifica el servidor (eventos de dominio o ajustes de un administrador)
+        read_only_fields = [
+            'id', 'usuario', 'mision', 'progreso_actual', 'completada', 'fecha_completacion',
+            'fecha_asignacion', 'fecha_actualizacion', 'periodo'
         ]
-        read_only_fields = ['id', 'fecha_completacion', 'fecha_actualizacion']
 
 
 class RankingSerializer(serializers.ModelSerializer):
@@ -281,9 +354,22 @@ class RankingSerializer(serializers.ModelSerializer):
         model = Ranking
         fields = [
             'id', 'usuario', 'usuario_nombre', 'usuario_rango', 'tipo_ranking', 'tipo_ranking_display',
-            'posicion', 'puntuacion', 'periodo', 'fecha_actualizacion'
+            'posicion', 'puntuacion', 'periodo', 'fecha_actualizacion',
+            'rango', 'nivel_fisico', 'posicion_liga'
         ]
-        read_only_fields = ['id', 'fecha_actualizacion']
+        read_only_fields = ['id', 'fecha_actualizacion', 'rango', 'nivel_fisico', 'posicion_liga']
+
+
+class RankingHistoricoSerializer(serializers.ModelSerializer):
+    tipo_ranking_display = serializers.CharField(source='get_tipo_ranking_display', read_only=True)
+
+    class Meta:
+        model = RankingHistorico
+        fields = [
+            'id', 'tipo_ranking', 'tipo_ranking_display', 'periodo', 'total_participantes',
+            'puntuacion_maxima', 'puntuacion_media', 'histograma', 'fecha_cierre'
+        ]
+        read_only_fields = fields
 
 
 # ========== SERIALIZERS DE RECOMPENSAS Y COLECCIONABLES ==========
@@ -372,8 +458,38 @@ class ModeloIASerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['fecha_creacion']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['puntos_referencia'] = instance.obtener_puntos_referencia()
+        return data
+
+
+class RelacionCacheadaField(serializers.PrimaryKeyRelatedField):
+    """Resuelve cada pk una sola vez por serializador; con many=True evita una consulta por elemento"""
+
+    def to_internal_value(self, data):
+        if not isinstance(data, (int, str)):
+            return super().to_internal_value(data)
+        resueltos = self.__dict__.setdefault('_resueltos', {})
+        if data not in resueltos:
+            resueltos[data] = super().to_internal_value(data)
+        return resueltos[data]
+
+
+class PuntosCorporalesField(serializers.JSONField):
+    """Los puntos ya decodificados por el parser JSON no se vuelven a serializar para validarlos
+    (su forma se valida al evaluar la postura)"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, (dict, list)):
+            return data
+        return super().to_internal_value(data)
+
 
 class DeteccionPosturaSerializer(serializers.ModelSerializer):
+    ejercicio = RelacionCacheadaField(queryset=Ejercicio.objects.all())
+    modelo_ia = RelacionCacheadaField(queryset=ModeloIA.objects.all())
+    puntos_corporales_detectados = PuntosCorporalesField()
     ejercicio_nombre = serializers.CharField(source='ejercicio.nombre', read_only=True)
     usuario_nombre = serializers.CharField(source='usuario.nombre_usuario', read_only=True)
     modelo_nombre = serializers.CharField(source='modelo_ia.nombre_modelo', read_only=True)
@@ -390,7 +506,96 @@ class DeteccionPosturaSerializer(serializers.ModelSerializer):
             'duracion_analisis_segundos', 'metadata_analisis', 'es_confiable', 'nivel_calificacion',
             'recompensa_puntos'
         ]
-        read_only_fields = ['id', 'fecha_deteccion']
+        # La puntuación y la precisión se calculan en el servidor a partir de los puntos
+        read_only_fields = ['id', 'fecha_deteccion', 'puntuacion_tecnica', 'precision_deteccion']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Los puntos empaquetados se devuelven en el mismo JSON que se recibió
+        data['puntos_corporales_detectados'] = instance.obtener_puntos()
+        return data
+
+    def validate_modelo_ia(self, value):
+        # Solo se puntúa contra el modelo activo del tipo de ejercicio (no uno elegido por el cliente);
+        # en un lote cada modelo se comprueba una vez, como en RelacionCacheadaField
+        vigentes = self.__dict__.setdefault('_modelos_vigentes', {})
+        if value.pk not in vigentes:
+            vigentes[value.pk] = es_modelo_vigente(value)
+        if not vigentes[value.pk]:
+            raise serializers.ValidationError("Solo se admite el modelo de IA activo de su tipo de ejercicio")
+        return value
+
+    def validate_metadata_analisis(self, value):
+        if value is not None and not isinstance(value, dict):
+            raise serializers.ValidationError("La metadata del análisis debe ser un objeto")
+        return value
+
+    def _evaluar(self, deteccion):
+        try:
+            deteccion.evaluar_postura()
+        except ValueError as e:
+            raise serializers.ValidationError({'puntos_corporales_detectados': [str(e)]})
+
+    def create(self, validated_data):
+        deteccion = DeteccionPostura(**validated_data)
+        self._evaluar(deteccion)
+        deteccion.save()
+        return deteccion
+
+    def update(self, instance, validated_data):
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        self._evaluar(instance)
+        instance.save()
+        return instance
+
+
+class TendenciaTecnicaSerializer(serializers.ModelSerializer):
+    ejercicio_nombre = serializers.CharField(source='ejercicio.nombre', read_only=True)
+    media = serializers.FloatField(read_only=True)
+    mejorando = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = TendenciaTecnica
+        fields = [
+            'id', 'ejercicio', 'ejercicio_nombre', 'total_detecciones', 'media', 'mejor_puntuacion',
+            'ultima_puntuacion', 'media_movil_corta', 'media_movil_larga', 'mejorando', 'ultimas',
+            'histograma', 'fecha_primera', 'fecha_ultima'
+        ]
+        read_only_fields = fields
+
+
+class TrabajoAnalisisVideoSerializer(serializers.ModelSerializer):
+    ejercicio_nombre = serializers.CharField(source='ejercicio.nombre', read_only=True)
+    archivo = serializers.FileField(write_only=True)
+
+    class Meta:
+        model = TrabajoAnalisisVideo
+        fields = [
+            'id', 'ejercicio', 'ejercicio_nombre', 'modelo_ia', 'archivo', 'estado', 'intentos',
+            'max_intentos', 'error', 'resultado', 'fecha_creacion', 'fecha_inicio', 'fecha_fin',
+            'espera_segundos', 'analisis_segundos'
+        ]
+        read_only_fields = [
+            'id', 'estado', 'intentos', 'max_intentos', 'error', 'resultado', 'fecha_creacion',
+            'fecha_inicio', 'fecha_fin', 'espera_segundos', 'analisis_segundos'
+        ]
+
+    def validate_modelo_ia(self, value):
+        # Solo se puntúa contra el modelo activo del tipo de ejercicio (no uno elegido por el cliente)
+        if not es_modelo_vigente(value):
+            raise serializers.ValidationError("Solo se admite el modelo de IA activo de su tipo de ejercicio")
+        return value
+
+    def validate_archivo(self, value):
+        extension = os.path.splitext(value.name)[1].lower()
+        if extension not in EXTENSIONES_VIDEO:
+            raise serializers.ValidationError(
+                f"Formato no soportado; se admite {', '.join(sorted(EXTENSIONES_VIDEO))}"
+            )
+        if value.size > MAXIMO_BYTES_VIDEO:
+            raise serializers.ValidationError("El archivo supera el tamaño máximo permitido")
+        return value
 
 
 class RetroalimentacionEjecucionSerializer(serializers.ModelSerializer):
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .colecciones import invalidar_resumen, invalidar_resumenes
+from .misiones import invalidar_disponibles, invalidar_indice_misiones
+from .modelos_ia import invalidar_registro_modelos
+from .models import (
+    CartaEjercicio, ColeccionCarta, Ejercicio, Mision, ModeloIA, ProgresoMision, Rutina, RutinaEjercicio
+)
+from .recomendaciones import invalidar_matriz_rutinas
+from .retroalimentacion import invalidar_indice_ejercicios
+from .sobres import invalidar_tablas_sobres
+
+
+# ========== INVALIDACIÓN DE RECOMENDACIONES ==========
+
+@receiver([post_save, post_delete], sender=Rutina)
+@receiver([post_save, post_delete], sender=RutinaEjercicio)
+@receiver([post_save, post_delete], sender=Ejercicio)
+def invalidar_recomendaciones(sender, **kwargs):
+    """Las rutinas cambiaron: la matriz de recomendaciones debe reconstruirse"""
+    invalidar_matriz_rutinas()
+
+
+@receiver([post_save, post_delete], sender=Ejercicio)
+def invalidar_ejercicios_complementarios(sender, **kwargs):
+    """Los ejercicios cambiaron: el índice por grupo muscular de la retroalimentación debe reconstruirse"""
+    invalidar_indice_ejercicios()
+
+
+# ========== TOTALES DERIVADOS DE LAS RUTINAS ==========
+
+@receiver(pre_delete, sender=Ejercicio)
+def anotar_rutinas_del_ejercicio(sender, instance, **kwargs):
+    """Guarda las rutinas que usan el ejercicio antes de que la cascada borre sus filas"""
+    instance._rutinas_afectadas = list(
+        RutinaEjercicio.objects.filter(ejercicio=instance).values_list('rutina_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Ejercicio)
+def recalcular_totales_rutinas(sender, instance, **kwargs):
+    """La cascada no pasa por RutinaEjercicio.delete(): recalcular aquí, en la misma transacción"""
+    rutinas = getattr(instance, '_rutinas_afectadas', None)
+    if rutinas:
+        Rutina.recalcular_totales(rutinas)
+
+
+# ========== INVALIDACIÓN DEL ÍNDICE DE MISIONES ==========
+
+@receiver([post_save, post_delete], sender=Mision)
+def invalidar_misiones(sender, **kwargs):
+    """El catálogo de misiones activas cambió"""
+    invalidar_indice_misiones()
+
+
+@receiver([post_save, post_delete], sender=ProgresoMision)
+def invalidar_misiones_disponibles(sender, instance, **kwargs):
+    """El progreso del usuario cambió: sus misiones disponibles deben recalcularse"""
+    usuario_id = instance.usuario_id
+    transaction.on_commit(lambda: invalidar_disponibles(usuario_id))
+
+
+# ========== INVALIDACIÓN DE LAS TABLAS DE SOBRES ==========
+
+@receiver([post_save, post_delete], sender=CartaEjercicio)
+def invalidar_sobres(sender, **kwargs):
+    """El conjunto de cartas activas cambió: las tablas de sorteo y los resúmenes deben reconstruirse"""
+    invalidar_tablas_sobres()
+    invalidar_resumenes()
+
+
+# ========== INVALIDACIÓN DEL RESUMEN DE COLECCIÓN ==========
+
+@receiver([post_save, post_delete], sender=ColeccionCarta)
+def invalidar_resumen_coleccion(sender, instance, **kwargs):
+    """La colección del usuario cambió"""
+    usuario_id = instance.usuario_id
+    transaction.on_commit(lambda: invalidar_resumen(usuario_id))
+
+
+# ========== RECARGA DEL REGISTRO DE MODELOS DE IA ==========
+
+@receiver([post_save, post_delete], sender=ModeloIA)
+def recargar_registro_modelos(sender, **kwargs):
+    """Los modelos de IA cambiaron: los procesos recargan su registro tras el commit"""
+    transaction.on_commit(invalidar_registro_modelos)
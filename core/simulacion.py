@@ -0,0 +1,136 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .models import CartaEjercicio
+
+# Reglas del duelo:
+#   vida  = VIDA_BASE + VIDA_POR_RESISTENCIA * resistencia
+#   daño  = fuerza * (1 + BONO_FLEXIBILIDAD * (flex_propia - flex_rival) / (flex_propia + flex_rival)) * tirada
+#   turnos para ganar = ceil(vida_rival / daño); gana quien necesita menos turnos.
+#   Con los mismos turnos ataca primero la carta más flexible; empate total = media victoria.
+VIDA_BASE = 10
+VIDA_POR_RESISTENCIA = 10
+BONO_FLEXIBILIDAD = 0.5
+VARIACION_TIRADA = 0.2
+
+RAREZAS = [clave for clave, _ in CartaEjercicio.RAREZA_CHOICES]
+
+
+def cargar_cartas():
+    """Carga las cartas activas como arreglos de NumPy"""
+    filas = list(
+        CartaEjercicio.objects.filter(esta_activa=True).order_by('id').values_list(
+            'id', 'nombre', 'rareza', 'atributo_fuerza', 'atributo_resistencia', 'atributo_flexibilidad'
+        )
+    )
+    return {
+        'ids': np.array([fila[0] for fila in filas], dtype=np.int64),
+        'nombres': [fila[1] for fila in filas],
+        'rareza': np.array([RAREZAS.index(fila[2]) for fila in filas], dtype=np.int64),
+        'fuerza': np.array([fila[3] for fila in filas], dtype=np.float32),
+        'resistencia': np.array([fila[4] for fila in filas], dtype=np.float32),
+        'flexibilidad': np.array([fila[5] for fila in filas], dtype=np.float32),
+    }
+
+
+def cartas_sinteticas(cantidad, semilla=None):
+    """Genera cartas aleatorias (para medir rendimiento sin tocar la base de datos)"""
+    rng = np.random.default_rng(semilla)
+    rareza = rng.integers(0, len(RAREZAS), size=cantidad)
+    escala = 1 + rareza.astype(np.float32)
+    return {
+        'ids': np.arange(1, cantidad + 1, dtype=np.int64),
+        'nombres': [f"Sintética {i}" for i in range(1, cantidad + 1)],
+        'rareza': rareza,
+        'fuerza': (rng.integers(1, 10, size=cantidad) * escala).astype(np.float32),
+        'resistencia': (rng.integers(1, 10, size=cantidad) * escala).astype(np.float32),
+        'flexibilidad': (rng.integers(1, 10, size=cantidad) * escala).astype(np.float32),
+    }
+
+
+def simular_bloque(cartas, inicio, fin, ensayos, semilla):
+    """Tasa de victoria de las cartas [inicio, fin) contra todas, promediando `ensayos` duelos"""
+    rng = np.random.default_rng(semilla)
+    fuerza, resistencia, flex = cartas['fuerza'], cartas['resistencia'], cartas['flexibilidad']
+    f_a, x_a = fuerza[inicio:fin, None], flex[inicio:fin, None]
+    vida_a = VIDA_BASE + VIDA_POR_RESISTENCIA * resistencia[inicio:fin, None]
+    vida_b = VIDA_BASE + VIDA_POR_RESISTENCIA * resistencia[None, :]
+
+    ventaja = BONO_FLEXIBILIDAD * (x_a - flex[None, :]) / np.maximum(x_a + flex[None, :], 1)
+    dano_a = np.maximum(f_a * (1 + ventaja), 1e-3)
+    dano_b = np.maximum(fuerza[None, :] * (1 - ventaja), 1e-3)
+    iniciativa = np.sign(x_a - flex[None, :])
+
+    victorias = np.zeros(dano_a.shape, dtype=np.float32)
+    for _ in range(ensayos):
+        tirada_a = rng.uniform(1 - VARIACION_TIRADA, 1 + VARIACION_TIRADA, size=dano_a.shape).astype(np.float32)
+        tirada_b = rng.uniform(1 - VARIACION_TIRADA, 1 + VARIACION_TIRADA, size=dano_a.shape).astype(np.float32)
+        diferencia = np.ceil(vida_a / (dano_b * tirada_b)) - np.ceil(vida_b / (dano_a * tirada_a))
+        # diferencia > 0: A necesita menos turnos; en empate decide la iniciativa
+        victorias += np.where(diferencia != 0, diferencia > 0, 0.5 + 0.5 * iniciativa)
+    return inicio, victorias / ensayos
+
+
+def matriz_victorias(cartas, ensayos=16, tamano_bloque=256, procesos=1, semilla=None):
+    """Matriz N x N con la tasa de victoria de cada carta (fila) contra cada rival (columna)"""
+    n = len(cartas['ids'])
+    matriz = np.empty((n, n), dtype=np.float32)
+    bloques = [(inicio, min(inicio + tamano_bloque, n)) for inicio in range(0, n, tamano_bloque)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(bloques))
+    argumentos = [
+        (cartas, inicio, fin, ensayos, semilla_bloque)
+        for (inicio, fin), semilla_bloque in zip(bloques, semillas)
+    ]
+
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = pool.map(simular_bloque, *zip(*argumentos))
+            for inicio, bloque in resultados:
+                matriz[inicio:inicio + len(bloque)] = bloque
+    else:
+        for args in argumentos:
+            inicio, bloque = simular_bloque(*args)
+            matriz[inicio:inicio + len(bloque)] = bloque
+
+    np.fill_diagonal(matriz, 0.5)
+    return matriz
+
+
+def tasa_media(matriz):
+    """Tasa de victoria media de cada carta contra las demás (sin contarse a sí misma)"""
+    n = len(matriz)
+    if n < 2:
+        return np.full(n, 0.5, dtype=np.float32)
+    return (matriz.sum(axis=1, dtype=np.float64) - 0.5) / (n - 1)
+
+
+def simular_mazos(matriz, cantidad_mazos=20000, tamano_mazo=5, semilla=None):
+    """Enfrenta mazos aleatorios carta a carta y retorna la tasa de victoria media de los mazos de cada carta"""
+    n = len(matriz)
+    rng = np.random.default_rng(semilla)
+    mazos_a = rng.integers(0, n, size=(cantidad_mazos, tamano_mazo))
+    mazos_b = rng.integers(0, n, size=(cantidad_mazos, tamano_mazo))
+    gana_a = (matriz[mazos_a, mazos_b].mean(axis=1) > 0.5).astype(np.float64)
+
+    partidas = np.bincount(mazos_a.ravel(), minlength=n) + np.bincount(mazos_b.ravel(), minlength=n)
+    ganadas = (
+        np.bincount(mazos_a.ravel(), weights=np.repeat(gana_a, tamano_mazo), minlength=n)
+        + np.bincount(mazos_b.ravel(), weights=np.repeat(1 - gana_a, tamano_mazo), minlength=n)
+    )
+    return np.divide(ganadas, partidas, out=np.full(n, np.nan), where=partidas > 0)
+
+
+def detectar_atipicos(tasas, rareza, umbral=2.0):
+    """Índices de cartas cuya tasa se aleja más de `umbral` desviaciones de la media de su rareza"""
+    atipicos = []
+    for nivel in np.unique(rareza):
+        indices = np.flatnonzero(rareza == nivel)
+        valores = tasas[indices]
+        desviacion = valores.std()
+        if len(indices) < 3 or desviacion == 0:
+            continue
+        z = (valores - valores.mean()) / desviacion
+        for i in np.flatnonzero(np.abs(z) > umbral):
+            atipicos.append((int(indices[i]), float(z[i])))
+    return atipicos
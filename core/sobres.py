@@ -0,0 +1,159 @@
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .colecciones import invalidar_resumen
+from .consultas import insertar_acumulando
+from .models import CartaEjercicio, ColeccionCarta, LogActividad, Usuario
+from .versiones import CacheProceso
+
+CLAVE_VERSION_CARTAS = 'sobres:version_cartas'
+
+RAREZAS = [clave for clave, _ in CartaEjercicio.RAREZA_CHOICES]
+
+# Peso relativo de cada nivel de rareza al abrir un sobre
+PESOS_RAREZA = {
+    'comun': 60,
+    'rara': 25,
+    'epica': 10,
+    'legendaria': 4,
+    'mitica': 1,
+}
+
+SOBRES = {
+    'estandar': {'cartas': 5, 'precio': 100},
+    'grande': {'cartas': 10, 'precio': 180},
+}
+
+
+class TablaAlias:
+    """Tabla de alias de Vose: muestrea una distribución discreta en O(1) por extracción"""
+
+    def __init__(self, pesos):
+        pesos = np.asarray(pesos, dtype=np.float64)
+        n = len(pesos)
+        escalados = pesos * n / pesos.sum()
+        self.probabilidad = np.ones(n, dtype=np.float64)
+        self.alias = np.arange(n, dtype=np.int64)
+
+        pequenos = [i for i in range(n) if escalados[i] < 1]
+        grandes = [i for i in range(n) if escalados[i] >= 1]
+        while pequenos and grandes:
+            menor, mayor = pequenos.pop(), grandes.pop()
+            self.probabilidad[menor] = escalados[menor]
+            self.alias[menor] = mayor
+            escalados[mayor] += escalados[menor] - 1
+            (pequenos if escalados[mayor] < 1 else grandes).append(mayor)
+        # Lo que queda tiene probabilidad 1 (salvo error de redondeo)
+        for i in pequenos + grandes:
+            self.probabilidad[i] = 1
+
+    def __len__(self):
+        return len(self.probabilidad)
+
+    def muestrear(self, rng, cantidad):
+        """Retorna `cantidad` índices extraídos según los pesos"""
+        columnas = rng.integers(0, len(self), size=cantidad)
+        return np.where(rng.random(cantidad) < self.probabilidad[columnas], columnas, self.alias[columnas])
+
+
+class TablasSobres:
+    """Tablas de alias precalculadas sobre las cartas activas: una por rareza y otra entre rarezas"""
+
+    def __init__(self):
+        cartas = list(
+            CartaEjercicio.objects.filter(esta_activa=True).order_by('id').values(
+                'id', 'nombre', 'rareza', 'imagen_url', 'poder_total'
+            )
+        )
+        self.cartas = {carta['id']: carta for carta in cartas}
+
+        self.ids_por_rareza = {}
+        for rareza in RAREZAS:
+            ids = [carta['id'] for carta in cartas if carta['rareza'] == rareza]
+            if ids:
+                self.ids_por_rareza[rareza] = np.asarray(ids, dtype=np.int64)
+        self.rarezas = list(self.ids_por_rareza)
+
+        self.tabla_rarezas = TablaAlias([PESOS_RAREZA[rareza] for rareza in self.rarezas]) if self.rarezas else None
+        self.tablas_cartas = {
+            rareza: TablaAlias(np.ones(len(ids))) for rareza, ids in self.ids_por_rareza.items()
+        }
+
+    def __len__(self):
+        return len(self.cartas)
+
+    def sortear(self, cantidad, rng=None):
+        """Retorna un arreglo con los ids de `cantidad` cartas sorteadas"""
+        rng = rng or np.random.default_rng()
+        niveles = self.tabla_rarezas.muestrear(rng, cantidad)
+        sorteadas = np.empty(cantidad, dtype=np.int64)
+        for nivel, rareza in enumerate(self.rarezas):
+            posiciones = niveles == nivel
+            total = int(posiciones.sum())
+            if total:
+                indices = self.tablas_cartas[rareza].muestrear(rng, total)
+                sorteadas[posiciones] = self.ids_por_rareza[rareza][indices]
+        return sorteadas
+
+
+_tablas = CacheProceso(CLAVE_VERSION_CARTAS, TablasSobres)
+
+
+def obtener_tablas_sobres():
+    """Retorna las tablas de sorteo del proceso, reconstruyéndolas si cambió la versión"""
+    return _tablas.obtener()
+
+
+def invalidar_tablas_sobres():
+    """Fuerza la reconstrucción de las tablas de sorteo en todos los procesos"""
+    _tablas.invalidar()
+
+
+def abrir_sobre(usuario, tipo_sobre='estandar', rng=None):
+    """Cobra el sobre y agrega las cartas sorteadas a la colección del usuario.
+
+    Retorna la lista de cartas obtenidas (con repeticiones). Lanza ValueError si el sobre
+    no existe, no hay cartas activas o el saldo no alcanza.
+    """
+    if tipo_sobre not in SOBRES:
+        raise ValueError(f"Tipo de sobre inválido: {tipo_sobre}")
+    sobre = SOBRES[tipo_sobre]
+    tablas = obtener_tablas_sobres()
+    if not len(tablas):
+        raise ValueError("No hay cartas disponibles")
+
+    sorteadas = tablas.sortear(sobre['cartas'], rng)
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Débito condicional: nunca deja el saldo en negativo
+        debitado = Usuario.objects.filter(
+            pk=usuario.pk, cristales_magicos__gte=sobre['precio']
+        ).update(cristales_magicos=F('cristales_magicos') - sobre['precio'])
+        if not debitado:
+            raise ValueError("Cristales insuficientes")
+
+        insertar_acumulando(
+            ColeccionCarta,
+            ['usuario', 'carta', 'cantidad', 'fecha_obtencion', 'fecha_ultima_actualizacion', 'es_favorita'],
+            [
+                (usuario.pk, carta_id, cantidad, ahora, ahora, False)
+                for carta_id, cantidad in sorted(Counter(sorteadas.tolist()).items())
+            ],
+            conflicto=['usuario', 'carta'],
+            acumular=['cantidad'],
+            reemplazar=['fecha_ultima_actualizacion'],
+        )
+        LogActividad.objects.create(
+            usuario=usuario,
+            tipo_actividad='otro',
+            descripcion=f"Abrió un sobre {tipo_sobre} ({sobre['cartas']} cartas)",
+            cristales_ganados=-sobre['precio']
+        )
+        transaction.on_commit(lambda: invalidar_resumen(usuario.pk))
+    usuario.cristales_magicos -= sobre['precio']
+
+    return [tablas.cartas[carta_id] for carta_id in sorteadas.tolist()]
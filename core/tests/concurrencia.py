@@ -0,0 +1,39 @@
+import threading
+import time
+
+from django.db import connection
+
+
+def ejecutar_en_paralelo(funcion, argumentos, hilos=None):
+    """Ejecuta funcion(*args) por cada elemento de `argumentos` en hilos que arrancan a la vez.
+
+    Con `hilos` menor que la cantidad de llamadas, cada hilo atiende varias (el límite evita
+    agotar las conexiones de la base de datos: cada hilo abre la suya y la cierra al terminar).
+    Retorna (resultados en el orden de `argumentos`, segundos transcurridos); si alguna llamada
+    falla, relanza la primera excepción.
+    """
+    hilos = min(hilos or len(argumentos), len(argumentos))
+    barrera = threading.Barrier(hilos)
+    resultados = [None] * len(argumentos)
+    errores = []
+
+    def trabajar(primero):
+        try:
+            barrera.wait()
+            for indice in range(primero, len(argumentos), hilos):
+                resultados[indice] = funcion(*argumentos[indice])
+        except Exception as e:  # Se relanza en el hilo principal
+            errores.append(e)
+        finally:
+            connection.close()
+
+    trabajadores = [threading.Thread(target=trabajar, args=(primero,)) for primero in range(hilos)]
+    inicio = time.perf_counter()
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    duracion = time.perf_counter() - inicio
+    if errores:
+        raise errores[0]
+    return resultados, duracion
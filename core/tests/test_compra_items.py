@@ -0,0 +1,73 @@
+from django.test import TransactionTestCase
+
+from core.models import InventarioUsuario, ItemColeccionable, LogActividad, Usuario
+
+from .concurrencia import ejecutar_en_paralelo
+
+COMPRADORES = 100
+# Por debajo del max_connections por defecto de PostgreSQL (100)
+HILOS = 50
+PRECIO = 30
+
+
+class CompraConcurrenteTests(TransactionTestCase):
+    """InventarioUsuario.comprar con 100 compradores en paralelo: nunca se gasta de más"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            email='comprador@example.com', nombre_usuario='comprador', password='clave-segura'
+        )
+
+    def crear_item(self, tipo_item):
+        return ItemColeccionable.objects.create(
+            nombre=f'Item {tipo_item}', tipo_item=tipo_item, rareza='comun', precio_cristales=PRECIO
+        )
+
+    def asignar_saldo(self, cristales):
+        Usuario.objects.filter(pk=self.usuario.pk).update(cristales_magicos=cristales)
+
+    def comprar(self, item_id, clave=None):
+        """Comprador: instancias propias del usuario y del item; None si la compra se rechaza"""
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        item = ItemColeccionable.objects.get(pk=item_id)
+        try:
+            inventario, _ = InventarioUsuario.comprar(usuario, item, clave_idempotencia=clave)
+        except ValueError:
+            return None
+        return inventario.pk
+
+    def test_saldo_nunca_negativo(self):
+        item = self.crear_item('consumible')
+        # Sin fila previa: las primeras compras compiten por crearla y las demás suman usos
+        self.asignar_saldo(PRECIO * 10)
+
+        resultados, _ = ejecutar_en_paralelo(self.comprar, [(item.pk,)] * COMPRADORES, hilos=HILOS)
+        exitosas = [resultado for resultado in resultados if resultado]
+        self.usuario.refresh_from_db()
+        inventario = InventarioUsuario.objects.get(usuario=self.usuario, item=item)
+        self.assertEqual(len(exitosas), 10)
+        self.assertEqual(self.usuario.cristales_magicos, 0)
+        self.assertEqual(inventario.usos_restantes, 10)
+        self.assertEqual(LogActividad.objects.filter(usuario=self.usuario, cristales_ganados=-PRECIO).count(), 10)
+
+    def test_item_unico_se_cobra_una_vez(self):
+        item = self.crear_item('avatar')
+        self.asignar_saldo(PRECIO * COMPRADORES)
+
+        resultados, _ = ejecutar_en_paralelo(self.comprar, [(item.pk,)] * COMPRADORES, hilos=HILOS)
+        self.usuario.refresh_from_db()
+        self.assertEqual(len([resultado for resultado in resultados if resultado]), 1)
+        self.assertEqual(self.usuario.cristales_magicos, PRECIO * (COMPRADORES - 1))
+        self.assertEqual(InventarioUsuario.objects.filter(usuario=self.usuario, item=item).count(), 1)
+
+    def test_reintentos_idempotentes(self):
+        item = self.crear_item('consumible')
+        self.asignar_saldo(PRECIO * COMPRADORES)
+
+        resultados, _ = ejecutar_en_paralelo(self.comprar, [(item.pk, 'compra-1')] * COMPRADORES, hilos=HILOS)
+        self.usuario.refresh_from_db()
+        # Todos los reintentos reciben la misma compra y solo se cobra una vez
+        self.assertEqual(len(set(resultados)), 1)
+        self.assertIsNotNone(resultados[0])
+        self.assertEqual(self.usuario.cristales_magicos, PRECIO * (COMPRADORES - 1))
+        self.assertEqual(InventarioUsuario.objects.get(pk=resultados[0]).usos_restantes, 1)
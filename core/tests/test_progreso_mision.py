@@ -0,0 +1,72 @@
+from django.test import TransactionTestCase
+
+from core.models import LogActividad, Mision, ProgresoMision, Usuario
+
+from .concurrencia import ejecutar_en_paralelo
+
+ESCRITORES = 16
+INCREMENTOS_POR_ESCRITOR = 25
+
+
+class ProgresoMisionConcurrenteTests(TransactionTestCase):
+    """Prueba de carga de ProgresoMision.actualizar_progreso con escritores concurrentes"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            email='carga@example.com', nombre_usuario='carga', password='clave-segura'
+        )
+
+    def crear_progreso(self, objetivo):
+        mision = Mision.objects.create(
+            titulo='Misión de carga', descripcion='Prueba de concurrencia', tipo_mision='ejercicio',
+            objetivo=objetivo, unidad_objetivo='veces', recompensa_xp=100, recompensa_cristales=10
+        )
+        return ProgresoMision.objects.create(usuario=self.usuario, mision=mision)
+
+    def incrementar(self, progreso_id, veces, clave=None):
+        """Escritor: su propia instancia del progreso, `veces` incrementos de 1"""
+        completadas = 0
+        for _ in range(veces):
+            progreso = ProgresoMision.objects.select_related('mision', 'usuario').get(pk=progreso_id)
+            completadas += progreso.actualizar_progreso(1, clave_idempotencia=clave)
+        return completadas
+
+    def test_no_pierde_incrementos_concurrentes(self):
+        progreso = self.crear_progreso(objetivo=10_000)
+        _, duracion = ejecutar_en_paralelo(
+            self.incrementar, [(progreso.pk, INCREMENTOS_POR_ESCRITOR)] * ESCRITORES
+        )
+        total = ESCRITORES * INCREMENTOS_POR_ESCRITOR
+        progreso.refresh_from_db()
+        self.assertEqual(progreso.progreso_actual, total)
+        self.assertFalse(progreso.completada)
+        print(
+            f"\nactualizar_progreso: {total} incrementos de {ESCRITORES} escritores en {duracion:.2f}s "
+            f"({total / duracion:.0f} por segundo)"
+        )
+
+    def test_completa_y_paga_una_sola_vez(self):
+        progreso = self.crear_progreso(objetivo=50)
+        resultados, _ = ejecutar_en_paralelo(
+            self.incrementar, [(progreso.pk, INCREMENTOS_POR_ESCRITOR)] * ESCRITORES
+        )
+        progreso.refresh_from_db()
+        self.usuario.refresh_from_db()
+        self.assertEqual(sum(resultados), 1)
+        self.assertTrue(progreso.completada)
+        self.assertEqual(progreso.progreso_actual, 50)
+        self.assertEqual(self.usuario.puntos_experiencia, 100)
+        self.assertEqual(self.usuario.cristales_magicos, 10)
+        self.assertEqual(LogActividad.objects.filter(tipo_actividad='mision_completada').count(), 1)
+
+    def test_reintentos_con_la_misma_clave_suman_una_vez(self):
+        progreso = self.crear_progreso(objetivo=1)
+        resultados, _ = ejecutar_en_paralelo(
+            self.incrementar, [(progreso.pk, 1, 'reintento-1')] * ESCRITORES
+        )
+        progreso.refresh_from_db()
+        self.usuario.refresh_from_db()
+        # Todos los reintentos reciben el resultado original: la misión se completó
+        self.assertEqual(resultados, [1] * ESCRITORES)
+        self.assertEqual(progreso.progreso_actual, 1)
+        self.assertEqual(self.usuario.puntos_experiencia, 100)
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import time
+from decimal import Decimal
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .analisis_video import FRAMES_POR_VENTANA
+from .misiones import registrar_evento
+from .modelos_ia import es_modelo_vigente, modelo_activo, modelo_compilado
+from .models import DeteccionPostura, Ejercicio
+from .posturas import (
+    PUNTOS_CLAVE, PuntuacionIncremental, a_arreglo, empaquetar_puntos, puntos_a_json, puntuar_postura
+)
+from .retroalimentacion import evaluar_desviacion, generar_retroalimentacion
+
+RUTA_WEBSOCKET_POSTURAS = '/ws/posturas/'
+
+# Límites por sesión: los mensajes recibidos esperan en una cola acotada; si se llena se deja de
+# leer del socket y el control de flujo de TCP frena al cliente
+MENSAJES_EN_COLA = 8
+MAXIMO_FRAMES_MENSAJE = 120
+MAXIMO_FRAMES_SERIE = 30 * 60 * 10
+FRAMES_POR_RETROALIMENTACION = 15
+ESPERA_INICIO_SEGUNDOS = 10
+ESPERA_INACTIVIDAD_SEGUNDOS = 60
+
+# Códigos de cierre del WebSocket
+CIERRE_NO_AUTORIZADO = 4001
+CIERRE_INACTIVIDAD = 4008
+CIERRE_RUTA_DESCONOCIDA = 4004
+
+
+def en_hilo_bd(funcion):
+    """Ejecuta `funcion` en el pool de hilos (no en un único hilo compartido por todas las sesiones),
+    cerrando conexiones caducadas como en una petición"""
+    def envoltura(*args, **kwargs):
+        close_old_connections()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(envoltura, thread_sensitive=False)
+
+
+@en_hilo_bd
+def autenticar(token):
+    """Usuario del token JWT de acceso; lanza ValueError si no es válido"""
+    autenticacion = JWTAuthentication()
+    try:
+        return autenticacion.get_user(autenticacion.get_validated_token(str(token).encode()))
+    except AuthenticationFailed:
+        raise ValueError("Token inválido o expirado")
+
+
+@en_hilo_bd
+def preparar_serie(datos):
+    """Valida el ejercicio y elige el modelo (por id o el activo de un tipo). Retorna (ejercicio_id, modelo)"""
+    try:
+        ejercicio_id = int(datos.get('ejercicio'))
+    except (TypeError, ValueError):
+        raise ValueError("Se requiere el id del ejercicio")
+    if not Ejercicio.objects.filter(pk=ejercicio_id).exists():
+        raise ValueError("El ejercicio no existe")
+
+    if datos.get('modelo_ia') is not None:
+        try:
+            modelo = modelo_compilado(int(datos['modelo_ia']))
+        except (TypeError, ValueError):
+            raise ValueError("El id del modelo de IA no es válido")
+    else:
+        modelo = modelo_activo(datos.get('tipo_ejercicio'))
+    if modelo is None or not modelo.esta_activo:
+        raise ValueError("No hay un modelo de IA activo para la serie")
+    if not es_modelo_vigente(modelo):
+        raise ValueError("Solo se admite el modelo de IA activo de su tipo de ejercicio")
+    if modelo.objetivos is None:
+        raise ValueError("El modelo de IA no define ángulos ideales reconocibles")
+    return ejercicio_id, modelo
+
+
+@en_hilo_bd
+def guardar_serie(usuario, ejercicio_id, modelo, puntuacion, segundos):
+    """Guarda la serie como una sola detección con su fotograma clave y retorna el resumen para el cliente"""
+    resultado = puntuacion.resultado()
+    # El mejor frame basta para volver a puntuar la serie con el mismo resultado
+    clave = puntuacion.fotograma_clave
+
+    tipo_binario = getattr(settings, 'PUNTOS_POSTURA_TIPO_BINARIO', None)
+    datos = empaquetar_puntos({'frames': clave}, tipo_binario or 'float32')
+    deteccion = DeteccionPostura(
+        ejercicio_id=ejercicio_id,
+        modelo_ia_id=modelo.id,
+        puntos_binarios=datos if tipo_binario else None,
+        puntos_corporales_detectados=[] if tipo_binario else puntos_a_json(datos),
+        puntuacion_tecnica=resultado['puntuacion_tecnica'],
+        precision_deteccion=Decimal(str(resultado['precision_deteccion'])),
+        duracion_analisis_segundos=min(Decimal(str(round(segundos, 2))), Decimal('999.99')),
+        metadata_analisis={
+            'frames': resultado['frames'],
+            'angulos': resultado['angulos'],
+            'tiempo_real': True,
+        },
+    )
+    with transaction.atomic():
+        _, puntos, cristales = DeteccionPostura.registrar_lote(usuario, [deteccion], evaluar=False)
+        retroalimentaciones = generar_retroalimentacion([deteccion])
+    registrar_evento(usuario, 'deteccion', deteccion=deteccion)
+    return {
+        'tipo': 'resultado',
+        'deteccion': deteccion.pk,
+        'puntuacion_tecnica': resultado['puntuacion_tecnica'],
+        'precision_deteccion': resultado['precision_deteccion'],
+        'es_confiable': resultado['es_confiable'],
+        'frames': resultado['frames'],
+        'puntos_ganados': puntos,
+        'cristales_ganados': cristales,
+        'retroalimentaciones': len(retroalimentaciones),
+    }
+
+
+def correcciones(resultado):
+    """Mensajes de corrección (sin guardar) para el detalle por ángulo de una puntuación"""
+    mensajes = []
+    for nombre, detalle in resultado['angulos'].items():
+        desviacion = evaluar_desviacion(nombre, detalle)
+        if desviacion is not None:
+            regla, gravedad, mensaje, _ = desviacion
+            mensajes.append({
+                'angulo': nombre,
+                'tipo_correccion': regla['tipo_correccion'],
+                'nivel_gravedad': gravedad,
+                'mensaje': mensaje,
+            })
+    return mensajes
+
+
+class SesionPosturas:
+    """Una conexión WebSocket: se autentica una vez y puntúa series de frames en tiempo real.
+
+    Mensajes del cliente (JSON): {'tipo': 'iniciar', 'token', 'ejercicio', 'modelo_ia' | 'tipo_ejercicio'},
+    {'tipo': 'frames', 'frames': [...]} (o un mensaje binario con el formato de core.posturas) y
+    {'tipo': 'fin'}. El token solo se exige en el primer 'iniciar'; tras 'fin' se puede iniciar
+    otra serie. Una serie sin 'fin' se descarta al desconectarse.
+    """
+
+    def __init__(self, send):
+        self.send = send
+        self.cola = asyncio.Queue(MENSAJES_EN_COLA)
+        self.usuario = None
+        self.serie = None
+
+    async def enviar(self, datos):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(datos)})
+
+    async def cerrar(self, codigo):
+        await self.send({'type': 'websocket.close', 'code': codigo})
+
+    async def leer(self, receive):
+        """Pasa los mensajes del socket a la cola; se bloquea (sin leer más) mientras está llena"""
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'websocket.disconnect':
+                await self.cola.put(None)
+                return
+            if mensaje['type'] == 'websocket.receive':
+                await self.cola.put(mensaje)
+
+    async def ejecutar(self, receive):
+        if (await receive())['type'] != 'websocket.connect':
+            return
+        await self.send({'type': 'websocket.accept'})
+        lector = asyncio.ensure_future(self.leer(receive))
+        try:
+            await self.atender()
+        finally:
+            lector.cancel()
+
+    async def atender(self):
+        while True:
+            espera = ESPERA_INACTIVIDAD_SEGUNDOS if self.usuario else ESPERA_INICIO_SEGUNDOS
+            try:
+                mensaje = await asyncio.wait_for(self.cola.get(), espera)
+            except asyncio.TimeoutError:
+                await self.cerrar(CIERRE_INACTIVIDAD)
+                return
+            if mensaje is None:
+                return
+
+            if mensaje.get('bytes') is not None:
+                datos = {'tipo': 'frames', 'frames': mensaje['bytes']}
+            else:
+                try:
+                    datos = json.loads(mensaje.get('text') or '')
+                except ValueError:
+                    datos = None
+                if not isinstance(datos, dict):
+                    await self.enviar({'tipo': 'error', 'detail': "Mensaje JSON inválido"})
+                    continue
+
+            if self.usuario is None and datos.get('tipo') != 'iniciar':
+                await self.cerrar(CIERRE_NO_AUTORIZADO)
+                return
+            try:
+                if datos.get('tipo') == 'iniciar':
+                    if not await self.iniciar(datos):
+                        await self.cerrar(CIERRE_NO_AUTORIZADO)
+                        return
+                elif datos.get('tipo') == 'frames':
+                    await self.agregar(datos.get('frames'))
+                elif datos.get('tipo') == 'fin':
+                    await self.finalizar()
+                else:
+                    raise ValueError("Tipo de mensaje desconocido")
+            except ValueError as e:
+                await self.enviar({'tipo': 'error', 'detail': str(e)})
+
+    async def iniciar(self, datos):
+        """Abre una serie; retorna False si la autenticación falla"""
+        if self.usuario is None:
+            try:
+                self.usuario = await autenticar(datos.get('token'))
+            except ValueError as e:
+                await self.enviar({'tipo': 'error', 'detail': str(e)})
+                return False
+        ejercicio_id, modelo = await preparar_serie(datos)
+        self.serie = {
+            'ejercicio_id': ejercicio_id,
+            'modelo': modelo,
+            'puntuacion': PuntuacionIncremental(modelo.objetivos, modelo.umbral_precision),
+            # Ventana circular de los últimos frames para la retroalimentación inmediata
+            'recientes': np.zeros((FRAMES_POR_VENTANA,) + (len(PUNTOS_CLAVE), 3), dtype=np.float32),
+            'pendientes': 0,
+            'segundos': 0.0,
+        }
+        await self.enviar({
+            'tipo': 'listo',
+            'modelo_ia': modelo.id,
+            'tipo_ejercicio': modelo.tipo_ejercicio,
+            'maximo_frames_mensaje': MAXIMO_FRAMES_MENSAJE,
+            'maximo_frames_serie': MAXIMO_FRAMES_SERIE,
+        })
+        return True
+
+    async def agregar(self, puntos):
+        serie = self.serie
+        if serie is None:
+            raise ValueError("No hay una serie iniciada")
+        frames = a_arreglo(puntos)
+        if len(frames) > MAXIMO_FRAMES_MENSAJE:
+            raise ValueError(f"Cada mensaje admite como máximo {MAXIMO_FRAMES_MENSAJE} frames")
+        puntuacion = serie['puntuacion']
+        if puntuacion.frames + len(frames) > MAXIMO_FRAMES_SERIE:
+            raise ValueError(f"La serie admite como máximo {MAXIMO_FRAMES_SERIE} frames; envía 'fin'")
+
+        inicio = time.perf_counter()
+        puntuacion.agregar(frames)
+        recientes = serie['recientes']
+        posiciones = np.arange(puntuacion.frames - len(frames), puntuacion.frames) % len(recientes)
+        recientes[posiciones[-len(recientes):]] = frames[-len(recientes):]
+        serie['pendientes'] += len(frames)
+        if serie['pendientes'] >= FRAMES_POR_RETROALIMENTACION:
+            serie['pendientes'] = 0
+            reciente = puntuar_postura(
+                recientes[:min(puntuacion.frames, len(recientes))], puntuacion.objetivos,
+                puntuacion.umbral_precision
+            )
+            mensaje = {
+                'tipo': 'retroalimentacion',
+                'frames': puntuacion.frames,
+                'puntuacion_reciente': reciente['puntuacion_tecnica'],
+                'puntuacion_serie': puntuacion.resultado()['puntuacion_tecnica'],
+                'precision_reciente': reciente['precision_deteccion'],
+                'correcciones': correcciones(reciente),
+            }
+        else:
+            mensaje = None
+        serie['segundos'] += time.perf_counter() - inicio
+        if mensaje:
+            await self.enviar(mensaje)
+
+    async def finalizar(self):
+        serie, self.serie = self.serie, None
+        if serie is None or not serie['puntuacion'].frames:
+            raise ValueError("No hay frames en la serie")
+        await self.enviar(await guardar_serie(
+            self.usuario, serie['ejercicio_id'], serie['modelo'], serie['puntuacion'], serie['segundos']
+        ))
+
+
+async def aplicacion_websocket(scope, receive, send):
+    """Aplicación ASGI para las conexiones WebSocket"""
+    if scope['path'] != RUTA_WEBSOCKET_POSTURAS:
+        await receive()
+        await send({'type': 'websocket.close', 'code': CIERRE_RUTA_DESCONOCIDA})
+        return
+    await SesionPosturas(send).ejecutar(receive)
@@ -32,6 +32,8 @@ router.register(r'inventario', views.InventarioUsuarioViewSet, basename='inventa
 router.register(r'modelos-ia', views.ModeloIAViewSet, basename='modeloia')
 router.register(r'detecciones-postura', views.DeteccionPosturaViewSet, basename='deteccionpostura')
 router.register(r'retroalimentacion', views.RetroalimentacionEjecucionViewSet, basename='retroalimentacion')
+router.register(r'analisis-video', views.TrabajoAnalisisVideoViewSet, basename='analisisvideo')
+router.register(r'tendencias-tecnica', views.TendenciaTecnicaViewSet, basename='tendenciatecnica')
 
 urlpatterns = [
     path('', include(router.urls)),
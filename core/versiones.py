@@ -0,0 +1,48 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+
+# Las versiones viven en la caché compartida (settings.CACHES); con una caché local por proceso
+# un cambio en un worker o comando no llegaría a los demás procesos
+
+
+def version_actual(clave):
+    """Retorna la versión compartida (entre procesos) asociada a una clave"""
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, None)
+        version = cache.get(clave)
+    return version
+
+
+def invalidar_version(clave):
+    """Cambia la versión para que todos los procesos reconstruyan su copia.
+
+    Cada versión es un valor nuevo (no un contador): dos invalidaciones simultáneas nunca dejan
+    la versión igual a una anterior, aunque el backend no incremente de forma atómica.
+    """
+    cache.set(clave, uuid.uuid4().hex, None)
+
+
+class CacheProceso:
+    """Valor construido una vez por proceso y reconstruido cuando cambia su versión"""
+
+    def __init__(self, clave, construir):
+        self.clave = clave
+        self.construir = construir
+        self._valor = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def obtener(self):
+        version = version_actual(self.clave)
+        if self._valor is None or self._version != version:
+            with self._lock:
+                if self._valor is None or self._version != version:
+                    self._valor = self.construir()
+                    self._version = version
+        return self._valor
+
+    def invalidar(self):
+        invalidar_version(self.clave)
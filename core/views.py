@@ -2,15 +2,30 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Count, Sum, Avg, Q
+from django.core.cache import cache
+from django.db.models import Count, Sum, Avg, Q, F
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags, quote_etag
 from datetime import timedelta
+import hashlib
+import json
+import time
 
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import CustomTokenObtainPairSerializer
 
 from .models import *
 from .serializers import *
+from .colecciones import resumen_coleccion
+from .misiones import (
+    DURACION_CACHE_DISPONIBLES, clave_disponibles, misiones_disponibles, registrar_evento
+)
+from .permissions import EsAdministrador
+from .recomendaciones import recomendar_rutinas
+from .retroalimentacion import generar_retroalimentacion
+from .sobres import SOBRES, abrir_sobre
 
 # ========== VIEWSETS DE AUTENTICACIÓN Y USUARIOS ==========
 
@@ -186,12 +201,30 @@ class EjercicioViewSet(viewsets.ModelViewSet):
 class RutinaViewSet(viewsets.ModelViewSet):
     serializer_class = RutinaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = {
+        'nivel_dificultad': ['exact'],
+        'tipo_ejercicio': ['exact'],
+        'esta_activa': ['exact'],
+        'duracion_minutos': ['exact', 'lte', 'gte'],
+        'calorias_estimadas': ['exact', 'lte', 'gte'],
+        'total_ejercicios': ['exact', 'lte', 'gte'],
+    }
+    ordering_fields = ['nombre', 'duracion_minutos', 'calorias_estimadas', 'total_ejercicios', 'fecha_creacion']
 
     def get_queryset(self):
         user = self.request.user
         if user.tipo_usuario == 'administrador':
-            return Rutina.objects.all()
-        return Rutina.objects.filter(Q(es_publica=True) | Q(creador=user))
+            rutinas = Rutina.objects.all()
+        else:
+            rutinas = Rutina.objects.filter(Q(es_publica=True) | Q(creador=user))
+
+        # Filtro por grupo muscular sobre la máscara precalculada
+        grupo = self.request.query_params.get('grupo_muscular')
+        if grupo in dict(Ejercicio.GRUPO_MUSCULAR_CHOICES):
+            rutinas = rutinas.annotate(
+                grupo_bit=F('mascara_grupos_musculares').bitand(Rutina.bit_grupo_muscular(grupo))
+            ).exclude(grupo_bit=0)
+        return rutinas.select_related('creador').prefetch_related('rutina_ejercicios__ejercicio')
 
     def perform_create(self, serializer):
         serializer.save(creador=self.request.user)
@@ -215,6 +248,48 @@ class RutinaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_200_OK
             )
 
+    @action(detail=True, methods=['post'], permission_classes=[EsAdministrador])
+    def asignar_segmento(self, request, pk=None):
+        """Asigna la rutina a todos los usuarios finales que cumplen los filtros"""
+        rutina = self.get_object()
+        serializer = AsignacionSegmentoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        inicio = time.perf_counter()
+        resultado = AsignacionRutina.asignar_a_segmento(
+            rutina,
+            serializer.obtener_usuarios(),
+            fecha_vencimiento=serializer.validated_data.get('fecha_vencimiento')
+        )
+        resultado['duracion_segundos'] = round(time.perf_counter() - inicio, 3)
+        if resultado['asignaciones_creadas']:
+            return Response(resultado, status=status.HTTP_201_CREATED)
+        return Response(resultado, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def recomendadas(self, request):
+        """Obtiene las rutinas activas mejor puntuadas para el usuario"""
+        try:
+            limite = min(max(int(request.query_params.get('limite', 10)), 1), 50)
+        except ValueError:
+            return Response(
+                {'detail': 'Parámetro limite inválido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        recomendaciones = recomendar_rutinas(request.user, limite)
+        rutinas = Rutina.objects.select_related('creador').prefetch_related(
+            'rutina_ejercicios__ejercicio'
+        ).in_bulk([rutina_id for rutina_id, _ in recomendaciones])
+
+        data = []
+        for rutina_id, puntuacion in recomendaciones:
+            if rutina_id in rutinas:
+                rutina_data = self.get_serializer(rutinas[rutina_id]).data
+                rutina_data['puntuacion_recomendacion'] = round(puntuacion, 4)
+                data.append(rutina_data)
+        return Response(data)
+
 
 class AsignacionRutinaViewSet(viewsets.ModelViewSet):
     serializer_class = AsignacionRutinaSerializer
@@ -240,17 +315,30 @@ class AsignacionRutinaViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pendientes(self, request):
         """Obtiene las rutinas asignadas pendientes"""
-        pendientes = self.get_queryset().filter(completada=False)
+        pendientes = self.get_queryset().filter(estado='pendiente').exclude(
+            fecha_vencimiento__lt=timezone.now().date()
+        )
         serializer = self.get_serializer(pendientes, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def completadas(self, request):
         """Obtiene las rutinas asignadas completadas"""
-        completadas = self.get_queryset().filter(completada=True)
+        completadas = self.get_queryset().filter(estado='completada')
         serializer = self.get_serializer(completadas, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def vencidas(self, request):
+        """Obtiene las rutinas asignadas vencidas sin completar"""
+        # Incluye las pendientes que vencieron desde la última ejecución del comando
+        vencidas = self.get_queryset().filter(
+            Q(estado='vencida') |
+            Q(estado='pendiente', fecha_vencimiento__lt=timezone.now().date())
+        )
+        serializer = self.get_serializer(vencidas, many=True)
+        return Response(serializer.data)
+
 
 # ========== VIEWSETS DE GAMIFICACIÓN ==========
 
@@ -267,49 +355,64 @@ class MisionViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def disponibles(self, request):
-        """Obtiene misiones disponibles para el usuario"""
+        """Obtiene misiones disponibles para el usuario (con ETag para GET condicional)"""
         user = request.user
-        misiones_completadas = ProgresoMision.objects.filter(
-            usuario=user, completada=True
-        ).values_list('mision_id', flat=True)
-        
-        # Misiones activas y vigentes que el usuario no ha completado
-        misiones_disponibles = Mision.objects.filter(
-            esta_activa=True,
-            fecha_inicio__lte=timezone.now().date()
-        ).exclude(
-            Q(fecha_fin__lt=timezone.now().date()) | 
-            Q(id__in=misiones_completadas)
-        )
-        
-        serializer = self.get_serializer(misiones_disponibles, many=True)
-        return Response(serializer.data)
+        clave = clave_disponibles(user.pk)
+        cacheado = cache.get(clave)
+        if cacheado is None:
+            datos = self.get_serializer(misiones_disponibles(user), many=True).data
+            etag = quote_etag(hashlib.md5(
+                json.dumps(datos, sort_keys=True, default=str).encode()
+            ).hexdigest())
+            cacheado = (etag, datos)
+            cache.set(clave, cacheado, DURACION_CACHE_DISPONIBLES)
+
+        etag, datos = cacheado
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(datos)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
-class ProgresoMisionViewSet(viewsets.ModelViewSet):
+class ProgresoMisionViewSet(viewsets.ReadOnlyModelViewSet):
+    """Solo lectura: el progreso avanza en el servidor con los eventos de dominio (core.misiones)"""
     serializer_class = ProgresoMisionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        if self.action == 'actualizar_progreso':
+            # Ajuste manual de un administrador sobre el progreso de cualquier usuario
+            return ProgresoMision.objects.all()
         return ProgresoMision.objects.filter(usuario=self.request.user)
 
-    def perform_create(self, serializer):
-        serializer.save(usuario=self.request.user)
-
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[EsAdministrador])
     def actualizar_progreso(self, request, pk=None):
-        """Actualiza el progreso de una misión"""
+        """Ajusta el progreso de una misión; solo administradores (acepta el header Idempotency-Key)"""
         progreso = self.get_object()
-        incremento = request.data.get('incremento', 1)
-        
-        progreso.actualizar_progreso(incremento)
+        try:
+            incremento = int(request.data.get('incremento', 1))
+        except (TypeError, ValueError):
+            incremento = 0
+        if incremento < 1:
+            return Response(
+                {'detail': 'Parámetro incremento inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        clave = request.headers.get('Idempotency-Key') or request.data.get('clave_idempotencia')
+
+        completada_ahora = progreso.actualizar_progreso(incremento, clave_idempotencia=clave)
         serializer = self.get_serializer(progreso)
-        return Response(serializer.data)
+        return Response({**serializer.data, 'completada_ahora': completada_ahora})
 
     @action(detail=False, methods=['get'])
     def activas(self, request):
         """Obtiene misiones en progreso (no completadas)"""
-        activas = self.get_queryset().filter(completada=False)
+        activas = self.get_queryset().filter(
+            ProgresoMision.filtro_periodo_actual(), completada=False
+        )
         serializer = self.get_serializer(activas, many=True)
         return Response(serializer.data)
 
@@ -348,6 +451,97 @@ class RankingViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(top_semanal, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def liga(self, request):
+        """Tablero de la liga (rango + nivel físico) del usuario en el período vigente.
+
+        Acepta `tipo` (semanal por defecto), `rango`/`nivel` para consultar otra liga
+        y paginación por posición con `desde` y `limite`.
+        """
+        user = request.user
+        tipo_ranking = request.query_params.get('tipo', 'semanal')
+        if tipo_ranking not in dict(Ranking.TIPO_RANKING_CHOICES):
+            return Response(
+                {'detail': 'Parámetro tipo inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+            desde = max(int(request.query_params.get('desde', 0)), 0)
+            rango = request.query_params.get('rango', user.rango_actual_id)
+            rango = int(rango) if rango not in (None, '') else None
+        except ValueError:
+            return Response(
+                {'detail': 'Parámetros de paginación inválidos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        nivel = request.query_params.get('nivel', user.nivel_fisico_actual)
+        if nivel not in dict(Usuario.NIVEL_FISICO_CHOICES):
+            return Response(
+                {'detail': 'Parámetro nivel inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        periodo = Ranking.periodo_vigente(tipo_ranking)
+        liga = Ranking.objects.filter(
+            tipo_ranking=tipo_ranking, periodo=periodo, nivel_fisico=nivel, rango=rango
+        )
+
+        posiciones = liga.filter(posicion_liga__gt=desde).select_related(
+            'usuario__rango_actual'
+        ).order_by('posicion_liga')[:limite]
+        propio = liga.filter(usuario=user).first()
+        return Response({
+            'tipo_ranking': tipo_ranking,
+            'periodo': periodo,
+            'rango': rango,
+            'nivel_fisico': nivel,
+            'posiciones': self.get_serializer(posiciones, many=True).data,
+            'mi_posicion': self.get_serializer(propio).data if propio else None,
+        })
+
+    @action(detail=False, methods=['get'])
+    def historico(self, request):
+        """Tableros de períodos cerrados servidos desde los snapshots.
+
+        Sin `periodo` lista las temporadas (paginadas con `antes`); con `periodo`
+        retorna una página del tablero congelado (paginada con `desde`).
+        """
+        tipo_ranking = request.query_params.get('tipo')
+        if tipo_ranking not in dict(Ranking.TIPO_RANKING_CHOICES):
+            return Response(
+                {'detail': 'Parámetro tipo requerido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+            desde = max(int(request.query_params.get('desde', 0)), 0)
+            periodo = parse_date(request.query_params.get('periodo', ''))
+            antes = parse_date(request.query_params.get('antes', ''))
+        except ValueError:
+            return Response(
+                {'detail': 'Parámetros de paginación inválidos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        snapshots = RankingHistorico.objects.filter(tipo_ranking=tipo_ranking)
+        if periodo is None:
+            if antes:
+                snapshots = snapshots.filter(periodo__lt=antes)
+            temporadas = snapshots.defer('top').order_by('-periodo')[:limite]
+            serializer = RankingHistoricoSerializer(temporadas, many=True)
+            return Response(serializer.data)
+
+        snapshot = snapshots.filter(periodo=periodo).first()
+        if snapshot is None:
+            return Response(
+                {'detail': 'Período no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        data = RankingHistoricoSerializer(snapshot).data
+        data['posiciones'] = snapshot.pagina(desde, limite)
+        return Response(data)
+
 
 # ========== VIEWSETS DE RECOMPENSAS Y COLECCIONABLES ==========
 
@@ -376,6 +570,38 @@ class ColeccionCartaViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(coleccion)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def resumen(self, request):
+        """Completitud por rareza, duplicados y poder total de la colección del usuario"""
+        return Response(resumen_coleccion(request.user))
+
+    @action(detail=False, methods=['post'])
+    def abrir_sobre(self, request):
+        """Compra y abre un sobre de cartas (tipo: estandar | grande)"""
+        tipo_sobre = request.data.get('tipo', 'estandar')
+        if not isinstance(tipo_sobre, str):
+            return Response({'detail': 'Parámetro tipo inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cartas = abrir_sobre(request.user, tipo_sobre)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'tipo': tipo_sobre,
+            'precio': SOBRES[tipo_sobre]['precio'],
+            'cristales_restantes': request.user.cristales_magicos,
+            'cartas': [
+                {
+                    'carta': carta['id'],
+                    'nombre': carta['nombre'],
+                    'rareza': carta['rareza'],
+                    'imagen_url': carta['imagen_url'],
+                    'poder_total': carta['poder_total'],
+                }
+                for carta in cartas
+            ],
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get'])
     def favoritas(self, request):
         """Obtiene las cartas favoritas del usuario"""
@@ -397,17 +623,65 @@ class InventarioUsuarioViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return InventarioUsuario.objects.filter(usuario=self.request.user)
 
+    def get_permissions(self):
+        # Los usuarios obtienen items comprándolos; la escritura directa queda para administradores
+        if self.action in ('create', 'update', 'partial_update'):
+            return [EsAdministrador()]
+        return super().get_permissions()
+
     def perform_create(self, serializer):
         serializer.save(usuario=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def comprar(self, request):
+        """Compra un item de la tienda (acepta el header Idempotency-Key)"""
+        try:
+            item = ItemColeccionable.objects.get(pk=request.data.get('item'))
+        except (ItemColeccionable.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {'detail': 'Parámetro item inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        clave = request.headers.get('Idempotency-Key') or request.data.get('clave_idempotencia')
+
+        try:
+            inventario, es_nueva = InventarioUsuario.comprar(request.user, item, clave_idempotencia=clave)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = self.get_serializer(inventario).data
+        data['cristales_restantes'] = Usuario.objects.values_list(
+            'cristales_magicos', flat=True
+        ).get(pk=request.user.pk)
+        return Response(data, status=status.HTTP_201_CREATED if es_nueva else status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def equipar(self, request, pk=None):
         """Equipa un item del inventario"""
         inventario = self.get_object()
-        inventario.equipar()
+        try:
+            inventario.equipar()
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         serializer = self.get_serializer(inventario)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def equipar_conjunto(self, request):
+        """Equipa varios items en una sola llamada (uno por tipo de item)"""
+        inventario_ids = request.data.get('inventario')
+        if not isinstance(inventario_ids, list) or not inventario_ids:
+            return Response(
+                {'detail': 'Parámetro inventario requerido (lista de ids)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            equipados = InventarioUsuario.equipar_conjunto(request.user, inventario_ids)
+        except (ValueError, TypeError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(equipados, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def desequipar(self, request, pk=None):
         """Desequipa un item del inventario"""
@@ -471,6 +745,55 @@ class DeteccionPosturaViewSet(viewsets.ModelViewSet):
         deteccion = serializer.save(usuario=self.request.user)
         # Procesar recompensas automáticamente
         deteccion.procesar_recompensas()
+        TendenciaTecnica.registrar([deteccion])
+        generar_retroalimentacion([deteccion])
+        registrar_evento(self.request.user, 'deteccion', deteccion=deteccion)
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """Registra las detecciones de una serie en una sola operación con recompensas agregadas"""
+        datos = request.data.get('detecciones') if isinstance(request.data, dict) else request.data
+        if not isinstance(datos, list):
+            return Response({'detail': 'Se espera una lista de detecciones'}, status=status.HTTP_400_BAD_REQUEST)
+        # El tamaño se valida antes de deserializar para no procesar lotes que se van a rechazar
+        if not datos:
+            return Response({'detail': 'El lote no contiene detecciones'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(datos) > DeteccionPostura.TAMANO_MAXIMO_LOTE:
+            return Response(
+                {'detail': f"El lote admite como máximo {DeteccionPostura.TAMANO_MAXIMO_LOTE} detecciones"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=datos, many=True)
+        serializer.is_valid(raise_exception=True)
+        try:
+            # Detecciones, retroalimentación y misiones se guardan juntas o no se guarda nada
+            with transaction.atomic():
+                detecciones, puntos, cristales = DeteccionPostura.registrar_lote(
+                    request.user,
+                    [DeteccionPostura(**validados) for validados in serializer.validated_data]
+                )
+                retroalimentaciones = generar_retroalimentacion(detecciones)
+                misiones_completadas = registrar_evento(request.user, 'deteccion', detecciones=detecciones)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'detecciones': [
+                {
+                    'id': deteccion.id,
+                    'puntuacion_tecnica': deteccion.puntuacion_tecnica,
+                    'precision_deteccion': str(deteccion.precision_deteccion),
+                    'es_confiable': deteccion.es_confiable,
+                    'nivel_calificacion': deteccion.nivel_calificacion,
+                }
+                for deteccion in detecciones
+            ],
+            'puntos_ganados': puntos,
+            'cristales_ganados': cristales,
+            'retroalimentaciones_generadas': len(retroalimentaciones),
+            'misiones_completadas': misiones_completadas,
+        }, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
     def recientes(self, request):
@@ -490,6 +813,37 @@ class DeteccionPosturaViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class TendenciaTecnicaViewSet(viewsets.ReadOnlyModelViewSet):
+    """Evolución de la técnica por ejercicio, servida desde la tabla agregada (sin leer detecciones)"""
+    serializer_class = TendenciaTecnicaSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = TendenciaTecnica.objects.filter(usuario=self.request.user).select_related('ejercicio')
+        ejercicio = self.request.query_params.get('ejercicio')
+        if ejercicio:
+            queryset = queryset.filter(ejercicio_id=ejercicio)
+        return queryset
+
+
+class TrabajoAnalisisVideoViewSet(viewsets.ModelViewSet):
+    """Encola videos para el worker de análisis; el cliente consulta el estado por id"""
+    serializer_class = TrabajoAnalisisVideoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'post', 'head', 'options']
+
+    def get_queryset(self):
+        return TrabajoAnalisisVideo.objects.filter(usuario=self.request.user).select_related('ejercicio')
+
+    def perform_create(self, serializer):
+        serializer.save(usuario=self.request.user)
+
+    @action(detail=False, methods=['get'], permission_classes=[EsAdministrador])
+    def metricas(self, request):
+        """Métricas de la cola: trabajos por estado, espera en cola y duración del análisis"""
+        return Response(TrabajoAnalisisVideo.metricas())
+
+
 class RetroalimentacionEjecucionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RetroalimentacionEjecucionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -526,6 +880,8 @@ class LoginView(APIView):
             # Agregar claims personalizados
             refresh['tipo_usuario'] = user.tipo_usuario
             refresh['nombre_usuario'] = user.nombre_usuario
+
+            registrar_evento(user, 'login')
             
             return Response({
                 'user': user_data,
@@ -629,7 +985,7 @@ class DashboardView(APIView):
         
         # Misiones activas
         misiones_activas = ProgresoMision.objects.filter(
-            usuario=user, completada=False
+            ProgresoMision.filtro_periodo_actual(), usuario=user, completada=False
         )[:5]
         misiones_serializer = ProgresoMisionSerializer(
             misiones_activas, many=True
@@ -2,6 +2,8 @@
 ASGI config for fitness_gamificado_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Las conexiones WebSocket (puntuación de posturas en tiempo real) se atienden en
+core.tiempo_real; el resto de peticiones, en la aplicación de Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitness_gamificado_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importar después de configurar Django (carga los modelos)
+from core.tiempo_real import aplicacion_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await aplicacion_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -114,6 +114,19 @@ DATABASES = {
     }
 }
 
+# Caché compartida por todos los procesos (workers web, worker de análisis de video y comandos):
+# core.versiones guarda aquí las versiones que invalidan las cachés de cada proceso.
+# La tabla la crea la migración core 0015 (equivale a `python manage.py createcachetable`).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_compartida',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    }
+}
+
 # Configuración del modelo de usuario personalizado
 AUTH_USER_MODEL = 'core.Usuario'
 
@@ -156,11 +169,18 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos subidos (p. ej. los puntos clave de los videos a analizar)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Puntos corporales de las detecciones guardados en binario ('float32', 'float16' o None para JSON)
+PUNTOS_POSTURA_TIPO_BINARIO = 'float32'
+
 # Configuración de REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -195,6 +215,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -225,7 +246,7 @@ class CorsMiddleware:
         response = self.get_response(request)
         response['Access-Control-Allow-Origin'] = 'https://smart-sales-frontend-six.vercel.app'
         response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS, PUT, DELETE'
-        response['Access-Control-Allow-Headers'] = 'Authorization, Content-Type, X-CSRFToken'
+        response['Access-Control-Allow-Headers'] = 'Authorization, Content-Type, X-CSRFToken, Idempotency-Key'
         response['Access-Control-Allow-Credentials'] = 'true'
         return response
 